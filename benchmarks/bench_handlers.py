@@ -0,0 +1,274 @@
+"""
+Throughput and latency of the scheduler's command handlers.
+
+For each table size the benchmark seeds a fresh SQLite database with
+synthetic patients, caregivers, availabilities and appointments, then
+runs every operation through Scheduler.run_command, the same path as
+the prompt, --script and --serve. It reports ops/sec, p50/p99 latency,
+database round-trips (statement executions) per operation and the peak
+RSS of the process. Run from the repository root:
+
+    python benchmarks/bench_handlers.py --rows 1000 10000 100000 --json baseline.json
+    python benchmarks/bench_handlers.py --rows 1000 10000 100000 --baseline baseline.json
+
+With --baseline the run is compared with a previous --json result and
+exits with status 1 if an operation got slower than the tolerance or
+needs more round-trips.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'scheduler'))
+
+import Scheduler
+from db.Backend import Cursor
+from db.ConnectionManager import ConnectionManager
+from db.SQLiteBackend import SQLiteBackend
+from model.Caregiver import Caregiver
+from model.DoseAllocator import DoseAllocator
+from model.Patient import Patient
+from model.Vaccine import Vaccine
+from util.CredentialCache import CredentialCache
+from util.Dates import Dates
+from util.Util import Util
+
+
+PASSWORD = 'benchpw'
+VACCINE = 'benchvac'
+# seeded availabilities start here, seeded appointments before it
+AVAILABILITY_START = datetime.date(2030, 1, 1)
+APPOINTMENT_START = datetime.date(2000, 1, 1)
+UPLOAD_START = datetime.date(2040, 1, 1)
+
+# Text every successful run of an operation prints; runs without it
+# are counted as failures
+EXPECTED = {
+    'add_doses': "Doses updated!",
+    'upload_availability': "Availability uploaded!",
+    'create_patient': "Account created successfully",
+    'login_patient': "Patient logged in as",
+    'reserve': "Successfully created appointment!",
+    'show_appointments': "Appointments:",
+    'cancel': "successfully cancelled",
+}
+OPERATIONS = list(EXPECTED)
+
+
+class RoundTrips:
+    """
+    Counts statement executions by wrapping the Cursor methods that
+    every execute, executemany, run and run_many goes through.
+    """
+
+    def __init__(self):
+        self.count = 0
+        execute = Cursor._execute
+        executemany = Cursor._executemany
+
+        def counted_execute(cursor, *args):
+            self.count += 1
+            return execute(cursor, *args)
+
+        def counted_executemany(cursor, *args):
+            self.count += 1
+            return executemany(cursor, *args)
+
+        Cursor._execute = counted_execute
+        Cursor._executemany = counted_executemany
+
+
+def caregivers_for(rows):
+    return max(10, rows // 1000)
+
+
+def seed(rows):
+    """
+    Fills the database with rows patients, rows availabilities and
+    rows appointments shared by rows // 1000 (at least 10) caregivers.
+    """
+    caregivers = caregivers_for(rows)
+    salt = Util.generate_salt()
+    hash = Util.generate_hash(PASSWORD, salt)
+    version = Util.current_hash_version()
+    with ConnectionManager() as conn:
+        with conn.cursor() as cursor:
+            cursor.executemany("INSERT INTO Caregivers (Username, Salt, Hash, HashVersion) VALUES (%s, %s, %s, %d)",
+                               [(f"cg{c}", salt, hash, version) for c in range(caregivers)])
+            cursor.executemany("INSERT INTO Patients (Username, Salt, Hash, HashVersion) VALUES (%s, %s, %s, %d)",
+                               ((f"p{i}", salt, hash, version) for i in range(rows)))
+            cursor.execute("INSERT INTO Vaccines (Name, Doses) VALUES (%s, %d)", (VACCINE, 10 * rows))
+            cursor.executemany("INSERT INTO Availabilities (Time, Username) VALUES (%s, %s)",
+                               ((AVAILABILITY_START + datetime.timedelta(days=i // caregivers), f"cg{i % caregivers}")
+                                for i in range(rows)))
+            # every (date, caregiver) pair is used once, so cancelling
+            # can give the slot back
+            cursor.executemany("INSERT INTO Appointments (p_username, c_username, vac_name, Time) "
+                               "VALUES (%s, %s, %s, %s)",
+                               ((f"p{i}", f"cg{i % caregivers}", VACCINE,
+                                 APPOINTMENT_START + datetime.timedelta(days=i // caregivers))
+                                for i in range(rows)))
+        conn.commit()
+    DoseAllocator.shared().spread(VACCINE)
+
+
+def commands(operation, rows, ops):
+    """
+    Yields (session setup, command line) for ops runs of operation.
+    """
+    caregivers = caregivers_for(rows)
+    days = rows // caregivers
+    for i in range(ops):
+        if operation == 'add_doses':
+            yield ('caregiver', 'cg0'), f"add_doses {VACCINE} 1"
+        elif operation == 'upload_availability':
+            date = UPLOAD_START + datetime.timedelta(days=i)
+            yield ('caregiver', 'cg0'), f"upload_availability {Dates.format(date)}"
+        elif operation == 'create_patient':
+            yield None, f"create_patient new{i} {PASSWORD}"
+        elif operation == 'login_patient':
+            yield None, f"login_patient p{i % rows} {PASSWORD}"
+        elif operation == 'reserve':
+            date = AVAILABILITY_START + datetime.timedelta(days=i % days)
+            yield ('patient', f"p{i % rows}"), f"reserve {Dates.format(date)} {VACCINE}"
+        elif operation == 'show_appointments':
+            yield ('caregiver', f"cg{i % caregivers}"), "show_appointments --limit 50"
+        elif operation == 'cancel':
+            # seeded appointment ids start at 1
+            appointment_id = i * (rows // ops) + 1 if ops <= rows else i % rows + 1
+            yield ('caregiver', f"cg{(appointment_id - 1) % caregivers}"), f"cancel {appointment_id}"
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_operation(operation, rows, ops, trips):
+    latencies = []
+    failures = 0
+    start_trips = trips.count
+    for setup, line in commands(operation, rows, ops):
+        session = Scheduler.Session()
+        if setup is not None:
+            role, username = setup
+            if role == 'caregiver':
+                session.caregiver = Caregiver(username)
+            else:
+                session.patient = Patient(username)
+        Scheduler.set_session(session)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            Scheduler.run_command(line)
+            latencies.append(time.perf_counter() - start)
+        if EXPECTED[operation] not in output.getvalue():
+            failures += 1
+    latencies.sort()
+    return {
+        'rows': rows,
+        'operation': operation,
+        'ops': ops,
+        'failures': failures,
+        'ops_per_sec': ops / sum(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'round_trips_per_op': (trips.count - start_trips) / ops,
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scale(rows, ops, operations, trips):
+    with tempfile.TemporaryDirectory() as directory:
+        ConnectionManager.configure(SQLiteBackend(os.path.join(directory, 'bench.db')))
+        Vaccine.inventory.invalidate()
+        Patient.credential_cache = CredentialCache()
+        Caregiver.credential_cache = CredentialCache()
+        start = time.perf_counter()
+        seed(rows)
+        print(f"\n{rows} rows (seeded in {time.perf_counter() - start:.1f}s)")
+        print(f"{'operation':>20} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'trips/op':>9} {'failed':>7}")
+        results = []
+        for operation in operations:
+            result = run_operation(operation, rows, ops, trips)
+            result['peak_rss_mb'] = peak_rss_mb()
+            results.append(result)
+            print(f"{operation:>20} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>9.2f} "
+                  f"{result['p99_ms']:>9.2f} {result['round_trips_per_op']:>9.1f} {result['failures']:>7}")
+        print(f"peak RSS {peak_rss_mb():.1f} MB")
+        ConnectionManager.get_pool().close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the operations that regressed against baseline and returns
+    how many did.
+    """
+    previous = {(result['rows'], result['operation']): result for result in baseline['results']}
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        old = previous.get((result['rows'], result['operation']))
+        if old is None:
+            continue
+        ratio = result['ops_per_sec'] / old['ops_per_sec']
+        slower = ratio < 1 - tolerance
+        more_trips = result['round_trips_per_op'] > old['round_trips_per_op']
+        verdict = "REGRESSED" if slower or more_trips else "ok"
+        regressions += slower or more_trips
+        print(f"{result['rows']:>8} {result['operation']:>20} {ratio:>6.2f}x ops/sec, "
+              f"{old['round_trips_per_op']:.1f} -> {result['round_trips_per_op']:.1f} trips/op  {verdict}")
+    return regressions
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000],
+                        help="table sizes to seed, e.g. 1000 10000 100000 1000000")
+    parser.add_argument('--ops', type=int, default=100, help="runs of each operation per table size")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS,
+                        help="operations to run, in order")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="compare with the JSON results of an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="fraction of ops/sec an operation may lose against the baseline")
+    args = parser.parse_args(argv)
+
+    trips = RoundTrips()
+    results = []
+    for rows in args.rows:
+        results.extend(run_scale(rows, args.ops, args.operations, trips))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'handlers', 'commit': current_commit(), 'ops': args.ops,
+                       'python': sys.version.split()[0], 'results': results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Login hashing throughput versus HashService worker count.
+
+Each simulated login derives one key with Util.generate_hash through a
+HashService with the given number of worker processes. Run from the
+repository root:
+
+    python benchmarks/bench_hashing.py --logins 200 --workers 0 1 2 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'scheduler'))
+
+from util.HashService import HashService
+from util.Util import Util
+
+
+def run(workers, logins, version):
+    service = HashService(workers=workers)
+    items = [(f"password{i}", Util.generate_salt()) for i in range(logins)]
+    # start the worker processes before timing
+    service.map(items[:max(workers, 1)], version)
+    start = time.perf_counter()
+    service.map(items, version)
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+    return {'workers': workers, 'logins': logins, 'seconds': elapsed, 'logins_per_sec': logins / elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200, help="hashes per run")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({0, 1, 2, os.cpu_count() or 1}),
+                        help="worker counts to compare, 0 hashes inline")
+    parser.add_argument('--hash-version', type=int, default=None, help="hashing scheme, see Util.HASH_SCHEMES")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    version = args.hash_version or Util.current_hash_version()
+    results = []
+    print(f"{'workers':>8} {'logins/sec':>12} {'seconds':>9}")
+    for workers in args.workers:
+        result = run(workers, args.logins, version)
+        results.append(result)
+        print(f"{workers:>8} {result['logins_per_sec']:>12.1f} {result['seconds']:>9.2f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'hashing', 'hash_version': version, 'cpus': os.cpu_count(), 'results': results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,7 @@ CREATE TABLE Vaccines (
 
 -- Creating Appointments table
 CREATE TABLE Appointments (
-    appointment_id INT,
+    appointment_id INT IDENTITY(1, 1),
     p_username varchar(255) REFERENCES Patients(Username),
     c_username varchar(255) REFERENCES Caregivers(Username),
     vac_name varchar(255) REFERENCES Vaccines(Name),
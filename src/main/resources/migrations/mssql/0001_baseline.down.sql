@@ -0,0 +1,6 @@
+-- Drops the tables created by create.sql
+DROP TABLE Appointments;
+DROP TABLE Availabilities;
+DROP TABLE Vaccines;
+DROP TABLE Patients;
+DROP TABLE Caregivers;
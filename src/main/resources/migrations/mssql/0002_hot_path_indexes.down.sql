@@ -0,0 +1,3 @@
+DROP INDEX IX_Availabilities_Username ON Availabilities;
+DROP INDEX IX_Appointments_p_username ON Appointments;
+DROP INDEX IX_Appointments_c_username ON Appointments;
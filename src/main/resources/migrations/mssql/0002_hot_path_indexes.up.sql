@@ -0,0 +1,6 @@
+-- Covering indexes for the per-user appointment listings in show_appointments
+CREATE INDEX IX_Appointments_c_username ON Appointments (c_username) INCLUDE (p_username, vac_name, Time);
+CREATE INDEX IX_Appointments_p_username ON Appointments (p_username) INCLUDE (c_username, vac_name, Time);
+
+-- Availabilities by caregiver (availability checks, cancel's re-insert and the Caregivers foreign key)
+CREATE INDEX IX_Availabilities_Username ON Availabilities (Username, Time);
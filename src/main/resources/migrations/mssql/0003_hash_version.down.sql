@@ -0,0 +1,4 @@
+ALTER TABLE Patients DROP CONSTRAINT DF_Patients_HashVersion;
+ALTER TABLE Patients DROP COLUMN HashVersion;
+ALTER TABLE Caregivers DROP CONSTRAINT DF_Caregivers_HashVersion;
+ALTER TABLE Caregivers DROP COLUMN HashVersion;
@@ -0,0 +1,3 @@
+-- Hashing scheme version of each stored password hash (see Util.HASH_SCHEMES)
+ALTER TABLE Caregivers ADD HashVersion int NOT NULL CONSTRAINT DF_Caregivers_HashVersion DEFAULT 1;
+ALTER TABLE Patients ADD HashVersion int NOT NULL CONSTRAINT DF_Patients_HashVersion DEFAULT 1;
@@ -0,0 +1,8 @@
+-- Move the sharded stock back into the Vaccines rows
+UPDATE Vaccines
+    SET Doses = Doses + (SELECT SUM(s.Doses) FROM VaccineShards s WHERE s.Name = Vaccines.Name)
+    WHERE EXISTS (SELECT 1 FROM VaccineShards s WHERE s.Name = Vaccines.Name);
+GO
+DROP VIEW VaccineStock;
+GO
+DROP TABLE VaccineShards;
@@ -0,0 +1,3 @@
+DROP TRIGGER TR_Availabilities_Calendar;
+GO
+DROP TABLE AvailabilityCalendar;
@@ -0,0 +1,28 @@
+-- Number of open caregiver slots per date, kept up to date by the
+-- trigger below so listings read one row per day
+CREATE TABLE AvailabilityCalendar (
+    Time date,
+    Slots int NOT NULL,
+    PRIMARY KEY (Time)
+);
+GO
+INSERT INTO AvailabilityCalendar (Time, Slots)
+    SELECT Time, COUNT(*) FROM Availabilities GROUP BY Time;
+GO
+CREATE TRIGGER TR_Availabilities_Calendar ON Availabilities AFTER INSERT, UPDATE, DELETE AS
+BEGIN
+    SET NOCOUNT ON;
+    MERGE AvailabilityCalendar WITH (HOLDLOCK) AS c
+    USING (SELECT Time, SUM(delta) AS delta
+           FROM (SELECT Time, 1 AS delta FROM inserted
+                 UNION ALL
+                 SELECT Time, -1 AS delta FROM deleted) AS changes
+           GROUP BY Time) AS d
+    ON c.Time = d.Time
+    WHEN MATCHED AND d.delta <> 0 THEN
+        UPDATE SET Slots = c.Slots + d.delta
+    WHEN NOT MATCHED AND d.delta > 0 THEN
+        INSERT (Time, Slots) VALUES (d.Time, d.delta);
+    DELETE FROM AvailabilityCalendar WHERE Slots <= 0 AND Time IN (SELECT Time FROM deleted);
+END
+GO
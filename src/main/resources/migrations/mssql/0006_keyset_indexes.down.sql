@@ -0,0 +1 @@
+-- Nothing to undo, see 0006_keyset_indexes.up.sql
@@ -0,0 +1,4 @@
+-- Nothing to do: the clustered key appointment_id is already the last
+-- key column of IX_Appointments_c_username and IX_Appointments_p_username,
+-- so the keyset pages of show_appointments are read in order. The
+-- version is kept in step with the SQLite migrations.
@@ -0,0 +1,3 @@
+DROP TRIGGER TR_Appointments_CaregiverLoad;
+GO
+DROP TABLE CaregiverLoad;
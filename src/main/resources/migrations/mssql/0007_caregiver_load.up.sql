@@ -0,0 +1,28 @@
+-- Number of appointments of each caregiver, kept up to date by the
+-- trigger below, used by the least_loaded caregiver assignment
+CREATE TABLE CaregiverLoad (
+    Username varchar(255) REFERENCES Caregivers,
+    Appointments int NOT NULL,
+    PRIMARY KEY (Username)
+);
+GO
+INSERT INTO CaregiverLoad (Username, Appointments)
+    SELECT c_username, COUNT(*) FROM Appointments WHERE c_username IS NOT NULL GROUP BY c_username;
+GO
+CREATE TRIGGER TR_Appointments_CaregiverLoad ON Appointments AFTER INSERT, UPDATE, DELETE AS
+BEGIN
+    SET NOCOUNT ON;
+    MERGE CaregiverLoad WITH (HOLDLOCK) AS l
+    USING (SELECT c_username, SUM(delta) AS delta
+           FROM (SELECT c_username, 1 AS delta FROM inserted
+                 UNION ALL
+                 SELECT c_username, -1 AS delta FROM deleted) AS changes
+           WHERE c_username IS NOT NULL
+           GROUP BY c_username) AS d
+    ON l.Username = d.c_username
+    WHEN MATCHED AND d.delta <> 0 THEN
+        UPDATE SET Appointments = l.Appointments + d.delta
+    WHEN NOT MATCHED AND d.delta > 0 THEN
+        INSERT (Username, Appointments) VALUES (d.c_username, d.delta);
+END
+GO
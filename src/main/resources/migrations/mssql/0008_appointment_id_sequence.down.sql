@@ -0,0 +1,6 @@
+IF OBJECT_ID('DF_Appointments_appointment_id', 'D') IS NOT NULL
+    ALTER TABLE Appointments DROP CONSTRAINT DF_Appointments_appointment_id;
+GO
+IF OBJECT_ID('AppointmentIds', 'SO') IS NOT NULL
+    DROP SEQUENCE AppointmentIds;
+GO
@@ -0,0 +1,15 @@
+-- Databases created from create.sql before appointment ids were
+-- generated by the database have a plain INT appointment_id, which
+-- the scheduler no longer fills in. Give it a default from a sequence
+-- that continues after the highest existing id. Databases whose
+-- column is already an IDENTITY are left alone.
+IF COLUMNPROPERTY(OBJECT_ID('Appointments'), 'appointment_id', 'IsIdentity') = 0
+   AND OBJECT_ID('AppointmentIds', 'SO') IS NULL
+BEGIN
+    DECLARE @start int = (SELECT ISNULL(MAX(appointment_id), 0) + 1 FROM Appointments WITH (TABLOCKX, HOLDLOCK));
+    DECLARE @create nvarchar(200) = N'CREATE SEQUENCE AppointmentIds AS int START WITH ' + CAST(@start AS nvarchar(11));
+    EXEC sp_executesql @create;
+    ALTER TABLE Appointments ADD CONSTRAINT DF_Appointments_appointment_id
+        DEFAULT (NEXT VALUE FOR AppointmentIds) FOR appointment_id;
+END
+GO
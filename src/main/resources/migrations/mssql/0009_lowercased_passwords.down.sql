@@ -0,0 +1,4 @@
+ALTER TABLE Patients DROP CONSTRAINT DF_Patients_LowercasedPassword;
+ALTER TABLE Patients DROP COLUMN LowercasedPassword;
+ALTER TABLE Caregivers DROP CONSTRAINT DF_Caregivers_LowercasedPassword;
+ALTER TABLE Caregivers DROP COLUMN LowercasedPassword;
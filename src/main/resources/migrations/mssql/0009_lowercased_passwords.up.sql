@@ -0,0 +1,9 @@
+-- Passwords used to be lowercased before they were hashed. The hashes
+-- stored until then are marked so only those accounts accept the
+-- password in any case; new accounts get case-sensitive passwords.
+ALTER TABLE Caregivers ADD LowercasedPassword int NOT NULL CONSTRAINT DF_Caregivers_LowercasedPassword DEFAULT 0;
+ALTER TABLE Patients ADD LowercasedPassword int NOT NULL CONSTRAINT DF_Patients_LowercasedPassword DEFAULT 0;
+GO
+UPDATE Caregivers SET LowercasedPassword = 1;
+UPDATE Patients SET LowercasedPassword = 1;
+GO
@@ -0,0 +1,3 @@
+DROP INDEX IX_Availabilities_Username;
+DROP INDEX IX_Appointments_p_username;
+DROP INDEX IX_Appointments_c_username;
@@ -0,0 +1,7 @@
+-- Covering indexes for the per-user appointment listings in show_appointments
+-- (appointment_id is the rowid and is part of every index)
+CREATE INDEX IX_Appointments_c_username ON Appointments (c_username, p_username, vac_name, Time);
+CREATE INDEX IX_Appointments_p_username ON Appointments (p_username, c_username, vac_name, Time);
+
+-- Availabilities by caregiver (availability checks, cancel's re-insert and the Caregivers foreign key)
+CREATE INDEX IX_Availabilities_Username ON Availabilities (Username, Time);
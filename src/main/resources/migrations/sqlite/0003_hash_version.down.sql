@@ -0,0 +1,2 @@
+ALTER TABLE Patients DROP COLUMN HashVersion;
+ALTER TABLE Caregivers DROP COLUMN HashVersion;
@@ -0,0 +1,3 @@
+-- Hashing scheme version of each stored password hash (see Util.HASH_SCHEMES)
+ALTER TABLE Caregivers ADD COLUMN HashVersion int NOT NULL DEFAULT 1;
+ALTER TABLE Patients ADD COLUMN HashVersion int NOT NULL DEFAULT 1;
@@ -0,0 +1,6 @@
+-- Move the sharded stock back into the Vaccines rows
+UPDATE Vaccines
+    SET Doses = Doses + (SELECT SUM(s.Doses) FROM VaccineShards s WHERE s.Name = Vaccines.Name)
+    WHERE EXISTS (SELECT 1 FROM VaccineShards s WHERE s.Name = Vaccines.Name);
+DROP VIEW VaccineStock;
+DROP TABLE VaccineShards;
@@ -0,0 +1,15 @@
+-- Each vaccine's stock is split between its Vaccines row and up to
+-- DoseShards sub-counters, so concurrent reservations update
+-- different rows (see model/DoseAllocator.py)
+CREATE TABLE VaccineShards (
+    Name varchar(255) REFERENCES Vaccines,
+    Shard int,
+    Doses int NOT NULL CHECK (Doses >= 0),
+    PRIMARY KEY (Name, Shard)
+);
+
+-- Total stock of each vaccine
+CREATE VIEW VaccineStock AS
+    SELECT v.Name,
+           v.Doses + COALESCE((SELECT SUM(s.Doses) FROM VaccineShards s WHERE s.Name = v.Name), 0) AS Doses
+    FROM Vaccines v;
@@ -0,0 +1,4 @@
+DROP TRIGGER TR_Availabilities_Calendar_Update;
+DROP TRIGGER TR_Availabilities_Calendar_Delete;
+DROP TRIGGER TR_Availabilities_Calendar_Insert;
+DROP TABLE AvailabilityCalendar;
@@ -0,0 +1,30 @@
+-- Number of open caregiver slots per date, kept up to date by the
+-- triggers below so listings read one row per day
+CREATE TABLE AvailabilityCalendar (
+    Time date,
+    Slots int NOT NULL,
+    PRIMARY KEY (Time)
+);
+
+INSERT INTO AvailabilityCalendar (Time, Slots)
+    SELECT Time, COUNT(*) FROM Availabilities GROUP BY Time;
+
+CREATE TRIGGER TR_Availabilities_Calendar_Insert AFTER INSERT ON Availabilities
+BEGIN
+    INSERT OR IGNORE INTO AvailabilityCalendar (Time, Slots) VALUES (NEW.Time, 0);
+    UPDATE AvailabilityCalendar SET Slots = Slots + 1 WHERE Time = NEW.Time;
+END;
+
+CREATE TRIGGER TR_Availabilities_Calendar_Delete AFTER DELETE ON Availabilities
+BEGIN
+    UPDATE AvailabilityCalendar SET Slots = Slots - 1 WHERE Time = OLD.Time;
+    DELETE FROM AvailabilityCalendar WHERE Time = OLD.Time AND Slots <= 0;
+END;
+
+CREATE TRIGGER TR_Availabilities_Calendar_Update AFTER UPDATE OF Time ON Availabilities
+BEGIN
+    UPDATE AvailabilityCalendar SET Slots = Slots - 1 WHERE Time = OLD.Time;
+    DELETE FROM AvailabilityCalendar WHERE Time = OLD.Time AND Slots <= 0;
+    INSERT OR IGNORE INTO AvailabilityCalendar (Time, Slots) VALUES (NEW.Time, 0);
+    UPDATE AvailabilityCalendar SET Slots = Slots + 1 WHERE Time = NEW.Time;
+END;
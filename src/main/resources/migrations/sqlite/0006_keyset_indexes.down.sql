@@ -0,0 +1,4 @@
+DROP INDEX IX_Appointments_c_username;
+DROP INDEX IX_Appointments_p_username;
+CREATE INDEX IX_Appointments_c_username ON Appointments (c_username, p_username, vac_name, Time);
+CREATE INDEX IX_Appointments_p_username ON Appointments (p_username, c_username, vac_name, Time);
@@ -0,0 +1,6 @@
+-- Order each user's appointments by id inside the covering indexes so
+-- the keyset pages of show_appointments are read without a sort
+DROP INDEX IX_Appointments_c_username;
+DROP INDEX IX_Appointments_p_username;
+CREATE INDEX IX_Appointments_c_username ON Appointments (c_username, appointment_id, p_username, vac_name, Time);
+CREATE INDEX IX_Appointments_p_username ON Appointments (p_username, appointment_id, c_username, vac_name, Time);
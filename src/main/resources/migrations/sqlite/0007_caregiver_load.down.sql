@@ -0,0 +1,4 @@
+DROP TRIGGER TR_Appointments_CaregiverLoad_Update;
+DROP TRIGGER TR_Appointments_CaregiverLoad_Delete;
+DROP TRIGGER TR_Appointments_CaregiverLoad_Insert;
+DROP TABLE CaregiverLoad;
@@ -0,0 +1,31 @@
+-- Number of appointments of each caregiver, kept up to date by the
+-- triggers below, used by the least_loaded caregiver assignment
+CREATE TABLE CaregiverLoad (
+    Username varchar(255) REFERENCES Caregivers,
+    Appointments int NOT NULL,
+    PRIMARY KEY (Username)
+);
+
+INSERT INTO CaregiverLoad (Username, Appointments)
+    SELECT c_username, COUNT(*) FROM Appointments WHERE c_username IS NOT NULL GROUP BY c_username;
+
+CREATE TRIGGER TR_Appointments_CaregiverLoad_Insert AFTER INSERT ON Appointments
+WHEN NEW.c_username IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO CaregiverLoad (Username, Appointments) VALUES (NEW.c_username, 0);
+    UPDATE CaregiverLoad SET Appointments = Appointments + 1 WHERE Username = NEW.c_username;
+END;
+
+CREATE TRIGGER TR_Appointments_CaregiverLoad_Delete AFTER DELETE ON Appointments
+WHEN OLD.c_username IS NOT NULL
+BEGIN
+    UPDATE CaregiverLoad SET Appointments = Appointments - 1 WHERE Username = OLD.c_username;
+END;
+
+CREATE TRIGGER TR_Appointments_CaregiverLoad_Update AFTER UPDATE OF c_username ON Appointments
+BEGIN
+    UPDATE CaregiverLoad SET Appointments = Appointments - 1 WHERE Username = OLD.c_username;
+    INSERT OR IGNORE INTO CaregiverLoad (Username, Appointments)
+        SELECT NEW.c_username, 0 WHERE NEW.c_username IS NOT NULL;
+    UPDATE CaregiverLoad SET Appointments = Appointments + 1 WHERE Username = NEW.c_username;
+END;
@@ -0,0 +1 @@
+-- Nothing to undo, see 0008_appointment_id_sequence.up.sql
@@ -0,0 +1,2 @@
+-- Nothing to do, appointment_id is an INTEGER PRIMARY KEY and always
+-- generated by SQLite. See the SQL Server migration.
@@ -0,0 +1,2 @@
+ALTER TABLE Patients DROP COLUMN LowercasedPassword;
+ALTER TABLE Caregivers DROP COLUMN LowercasedPassword;
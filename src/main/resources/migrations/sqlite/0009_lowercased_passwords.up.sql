@@ -0,0 +1,7 @@
+-- Passwords used to be lowercased before they were hashed. The hashes
+-- stored until then are marked so only those accounts accept the
+-- password in any case; new accounts get case-sensitive passwords.
+ALTER TABLE Caregivers ADD COLUMN LowercasedPassword int NOT NULL DEFAULT 0;
+ALTER TABLE Patients ADD COLUMN LowercasedPassword int NOT NULL DEFAULT 0;
+UPDATE Caregivers SET LowercasedPassword = 1;
+UPDATE Patients SET LowercasedPassword = 1;
@@ -0,0 +1,174 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import Scheduler
+from db.ConnectionManager import ConnectionManager
+from db.Backend import DBError
+from model.Vaccine import Vaccine
+
+
+# Operations whose consecutive runs are executed in one transaction.
+# Logins and logouts change the session and reads need no
+# transaction, so they always run on their own.
+BATCHED_OPERATIONS = {
+    'create_patient', 'create_caregiver', 'upload_availability',
+    'add_doses', 'reserve', 'cancel',
+}
+
+
+class BatchRunner:
+    """
+    Runs a stream of scheduler commands without the interactive
+    prompt, e.g. a clinic's month of availability:
+
+        login_caregiver clinic1 secret
+        upload_availability 06-01-2022
+        upload_availability 06-02-2022
+        ...
+
+    Blank lines and lines starting with '#' are skipped and 'quit'
+    stops the run. Consecutive commands of the same operation listed
+    in BATCHED_OPERATIONS share one transaction of up to batch_size
+    commands; a command that fails is undone on its own while the rest
+    of its batch is kept. Each command produces one JSON line with its
+    line number, operation, printed output and error, if any.
+
+    Parameters
+    ----------
+    out : file, optional
+        Where the JSON lines are written, by default sys.stdout.
+    batch_size : int, optional
+        Maximum number of commands per transaction. Defaults to the
+        BatchSize environment variable, or 500.
+    """
+
+    def __init__(self, out=None, batch_size=None):
+        self.out = out or sys.stdout
+        self.batch_size = batch_size or int(os.getenv("BatchSize", 500))
+        self.commands = 0
+        self.transactions = 0
+        self.errors = 0
+
+    def parse(self, lines):
+        """
+        Yields (line number, operation, line) for each command in lines.
+        """
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield number, line.split()[0].lower(), line
+
+    def groups(self, commands):
+        """
+        Splits parsed commands into the lists that run together.
+        """
+        group = []
+        for command in commands:
+            operation = command[1]
+            if group and (operation != group[0][1] or operation not in BATCHED_OPERATIONS
+                          or len(group) >= self.batch_size):
+                yield group
+                group = []
+            group.append(command)
+        if group:
+            yield group
+
+    def run_line(self, number, operation, line):
+        """
+        Runs one command line, capturing what it prints.
+
+        Returns
+        -------
+        dict
+            The command's result record.
+        bool
+            False if the command was 'quit'.
+        """
+        buffer = io.StringIO()
+        error = None
+        keep_going = True
+        with contextlib.redirect_stdout(buffer):
+            try:
+                status = Scheduler.run_command(line)
+                error, keep_going = status.error, status.keep_going
+            except Exception as err:
+                error = str(err)
+        result = {
+            'line': number,
+            'operation': operation,
+            'output': buffer.getvalue().splitlines(),
+            'error': error,
+        }
+        return result, keep_going
+
+    def run_group(self, group):
+        results = []
+        keep_going = True
+        if len(group) == 1:
+            result, keep_going = self.run_line(*group[0])
+            return [result], keep_going
+        try:
+            with ConnectionManager.transaction():
+                for command in group:
+                    result, keep_going = self.run_line(*command)
+                    results.append(result)
+                    if not keep_going:
+                        break
+            self.transactions += 1
+        except DBError as db_err:
+            if not results:
+                # no connection for the batch, let each command report it
+                for command in group:
+                    result, keep_going = self.run_line(*command)
+                    results.append(result)
+            else:
+                # the cache saw the rolled back writes
+                Vaccine.inventory.invalidate()
+                for result in results:
+                    result['error'] = f"Batch transaction failed: {db_err.args[0] if db_err.args else db_err}"
+        return results, keep_going
+
+    def run(self, lines):
+        """
+        Runs every command in lines, writing one JSON line per command.
+
+        Returns
+        -------
+        int
+            The number of commands that failed, raised or whose
+            transaction failed.
+        """
+        keep_going = True
+        for group in self.groups(self.parse(lines)):
+            results, keep_going = self.run_group(group)
+            for result in results:
+                self.commands += 1
+                if result['error'] is not None:
+                    self.errors += 1
+                self.out.write(json.dumps(result) + "\n")
+            if not keep_going:
+                break
+        self.out.flush()
+        return self.errors
+
+
+def run_script(path, batch_size=None):
+    """
+    Runs the commands in the file at path, or standard input if path
+    is '-', printing a JSON line per command and a summary on stderr.
+    """
+    runner = BatchRunner(batch_size=batch_size)
+    start = time.perf_counter()
+    if path == '-':
+        errors = runner.run(sys.stdin)
+    else:
+        with open(path) as f:
+            errors = runner.run(f)
+    elapsed = time.perf_counter() - start
+    print(f"{runner.commands} commands, {runner.transactions} batched transactions, "
+          f"{errors} errors in {elapsed:.2f}s", file=sys.stderr)
+    return errors
@@ -0,0 +1,194 @@
+import csv
+import json
+import os
+import sys
+import time
+from db.Backend import DBError
+from model.Caregiver import Caregiver
+from model.Patient import Patient
+from util.HashService import HashService
+from util.Util import Util
+
+
+# Account types by their --account-type name
+ACCOUNT_TYPES = {
+    'patient': Patient,
+    'caregiver': Caregiver,
+}
+
+
+class AccountImporter:
+    """
+    Creates accounts in bulk from a file of usernames and passwords,
+    e.g. a clinic's staff or a pre-registered patient cohort.
+
+    Rows are read in batches. For each batch the usernames that are
+    already taken are looked up in one query and skipped, the
+    passwords of the others are hashed in parallel by the HashService
+    worker processes and the accounts are written with multi-row
+    inserts in one transaction (see Account.save_all). Every row that
+    is not imported produces one JSON line with its line number,
+    username and error, written in line order after its batch.
+
+    Parameters
+    ----------
+    account_type : type
+        Patient or Caregiver.
+    out : file, optional
+        Where the JSON lines are written, by default sys.stdout.
+    batch_size : int, optional
+        Number of rows per batch. Defaults to the BatchSize
+        environment variable, or 500.
+    """
+
+    def __init__(self, account_type, out=None, batch_size=None):
+        self.account_type = account_type
+        self.out = out or sys.stdout
+        self.batch_size = batch_size or int(os.getenv("BatchSize", 500))
+        self.rows = 0
+        self.created = 0
+        self.conflicts = 0
+        self.errors = 0
+        # (line number, JSON line) of the current batch's reports
+        self.reports = []
+
+    @staticmethod
+    def read_csv(lines):
+        """
+        Yields (line number, username, password, error) for each row
+        of a CSV file with 'username' and 'password' columns. error is
+        always None.
+        """
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None or not {'username', 'password'} <= set(reader.fieldnames):
+            raise ValueError("CSV header must have 'username' and 'password' columns")
+        for row in reader:
+            yield reader.line_num, row['username'], row['password'], None
+
+    @staticmethod
+    def read_jsonl(lines):
+        """
+        Yields (line number, username, password, error) for each line
+        of a JSON lines file of {"username": ..., "password": ...}
+        objects. error describes a line that is not valid JSON, and is
+        None otherwise. Blank lines are skipped.
+        """
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as err:
+                yield number, None, None, f"Invalid JSON on line {number}, column {err.colno}: {err.msg}"
+                continue
+            if not isinstance(row, dict):
+                row = {}
+            yield number, row.get('username'), row.get('password'), None
+
+    def report(self, number, username, error, conflict=False):
+        if conflict:
+            self.conflicts += 1
+        else:
+            self.errors += 1
+        self.reports.append((number, json.dumps({'line': number, 'username': username, 'error': error})))
+
+    def write_reports(self):
+        """
+        Writes the reports of the batch in line order.
+        """
+        self.reports.sort(key=lambda report: report[0])
+        for _, line in self.reports:
+            self.out.write(line + "\n")
+        self.reports = []
+
+    def import_batch(self, batch, seen):
+        """
+        Imports one batch of (line number, username, password, error)
+        rows. seen holds the usernames of the file imported so far.
+        """
+        rows = []
+        for number, username, password, error in batch:
+            self.rows += 1
+            if error is not None:
+                self.report(number, username, error)
+            elif not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+                self.report(number, username, "Username and password must be non-empty strings")
+            elif username in seen:
+                self.report(number, username, "Duplicate username in file", conflict=True)
+            else:
+                seen.add(username)
+                rows.append((number, username, password))
+        if not rows:
+            return
+        try:
+            taken = self.account_type.taken(username for _, username, _ in rows)
+            # taken usernames are skipped before their passwords are hashed
+            for number, username, _ in rows:
+                if username in taken:
+                    self.report(number, username, "Username taken", conflict=True)
+            rows = [row for row in rows if row[1] not in taken]
+            salts = [Util.generate_salt() for _ in rows]
+            version = Util.current_hash_version()
+            hashes = HashService.shared().map([(password, salt) for (_, _, password), salt in zip(rows, salts)],
+                                              version)
+            accounts = [self.account_type(username, salt=salt, hash=hash, hash_version=version)
+                        for (_, username, _), salt, hash in zip(rows, salts, hashes)]
+            created = self.account_type.save_all(accounts)
+        except DBError as db_err:
+            for number, username, _ in rows:
+                self.report(number, username, f"Import failed: {db_err.args[0] if db_err.args else db_err}")
+            return
+        self.created += len(created)
+        for number, username, _ in rows:
+            if username not in created:
+                self.report(number, username, "Username taken", conflict=True)
+
+    def run(self, rows):
+        """
+        Imports every (line number, username, password, error) row.
+
+        Returns
+        -------
+        int
+            The number of rows that were not imported.
+        """
+        seen = set()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, seen)
+                self.write_reports()
+                batch = []
+        if batch:
+            self.import_batch(batch, seen)
+            self.write_reports()
+        self.out.flush()
+        return self.conflicts + self.errors
+
+
+def run_import(path, account_type, file_format=None, batch_size=None):
+    """
+    Imports the accounts in the file at path, or standard input if
+    path is '-', printing a JSON line per row not imported and a
+    summary on stderr. The format is 'csv' or 'jsonl', by default
+    guessed from the file extension.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    importer = AccountImporter(ACCOUNT_TYPES[account_type], batch_size=batch_size)
+    read = importer.read_jsonl if file_format == 'jsonl' else importer.read_csv
+    start = time.perf_counter()
+    try:
+        if path == '-':
+            failed = importer.run(read(sys.stdin))
+        else:
+            with open(path, newline='') as f:
+                failed = importer.run(read(f))
+    except (OSError, ValueError) as err:
+        print(f"Could not import {path}: {err}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"{importer.rows} rows, {importer.created} accounts created, {importer.conflicts} conflicts, "
+          f"{importer.errors} errors in {elapsed:.2f}s", file=sys.stderr)
+    return failed
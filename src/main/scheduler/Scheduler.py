@@ -1,114 +1,73 @@
 import sys
-from numpy.lib.function_base import insert, select
 from model.Vaccine import Vaccine
 from model.Caregiver import Caregiver
 from model.Patient import Patient
+from model.Appointment import Appointment
+from model.DoseAllocator import DoseAllocator
 from util.Util import Util
+from util.HashService import HashService
+from util.TableWriter import TableWriter
+from util.CommandRouter import CommandRouter, CommandStatus
+from util.CommandMetrics import CommandMetrics
+from util.QueryProfiler import QueryProfiler
+from util.Dates import Dates
 from db.ConnectionManager import ConnectionManager
-import numpy as np
-import pymssql
+from db.Backend import DBError
+import contextvars
 import datetime
-from tabulate import tabulate
 
 
-'''
-objects to keep track of the currently logged-in user
-Note: it is always true that at most one of currentCaregiver and currentPatient is not null
-        since only one user can be logged-in at a time
-'''
-current_patient = None
+class Session:
+    '''
+    object to keep track of the currently logged-in user
+    Note: it is always true that at most one of caregiver and patient is not null
+            since only one user can be logged-in at a time per session
+    '''
+    def __init__(self):
+        self.patient = None
+        self.caregiver = None
 
-current_caregiver = None
 
+# The session of the current command. The interactive loop uses the
+# default session; server mode runs each connection's commands with
+# its own session set.
+_session = contextvars.ContextVar('session')
+_default_session = Session()
 
-def create_patient(tokens):
-    """
-    Takes the command line input 'create_patient <username> <password>'
-    and creates a patient in the Patients table. Checks if the username
-    already exists in the database and generates a hashed password to 
-    store in the database.
 
-    Parameters
-    ----------
-    tokens : list
-        A list of the command line inputs of the form:
-            ['create_patient', '<username>', '<password>']
+def get_session():
+    """
+    Returns the session the current command runs in.
     """
-    # check 1: the length for tokens need to be exactly 3 to include all information (with the operation name)
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-    # Extracting inputs
-    username = tokens[1]
-    password = tokens[2]
-    # check 2: check if the username has been taken already
-    if user_name_exists_patients(username):
-        print("Username taken, try again!")
-        return
+    return _session.get(_default_session)
 
-    # Generating random salt and hash based off of password and salt.
-    salt = Util.generate_salt()
-    hash = Util.generate_hash(password, salt)
 
-    # create the patient
-    try:
-        patient = Patient(username, salt=salt, hash=hash)
-        # save to patient information to our database
-        try:
-            patient.save_to_db()
-        except:
-            print("Create failed, Cannot save")
-            return
-        print(" *** Account created successfully *** ")
-    except pymssql.Error:
-        print("Create failed")
-        return
-    
-        
+def set_session(session):
+    """
+    Makes session the session of the current context.
+    """
+    _session.set(session)
 
 
-def user_name_exists_patients(username):
+def create_patient(tokens):
     """
-    Checking whether the desired username
-    already exists in the Patients table
+    Takes the command line input 'create_patient <username> <password>'
+    and creates a patient in the Patients table, see create_account().
 
     Parameters
     ----------
-    username : str
-        The desired username for the patient
-
-    Returns
-    -------
-    bool
-        Returns True if the username already exists in the 
-        Patients table. False if the username is not taken.
+    tokens : list
+        A list of the command line inputs of the form:
+            ['create_patient', '<username>', '<password>']
     """
-    # Creating connection
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-
-    # Selecting patients where Username matches username given
-    select_username = "SELECT * FROM Patients WHERE Username = %s"
-    try:
-        cursor = conn.cursor(as_dict=True)
-        cursor.execute(select_username, username)
-        #  returns false if the cursor is not before the first record or if there are no rows in the ResultSet.
-        for row in cursor:
-            return row['Username'] is not None
-    except pymssql.Error:
-        print("Error occurred when checking username")
-        cm.close_connection()
-    cm.close_connection()
-    return False
+    return create_account(Patient, tokens[1], tokens[2])
 
 
 def create_caregiver(tokens):
     """
     Takes the command line input 'create_caregiver <username> <password>'
-    and creates a caregiver in the Caregivers table. Checks if the username
-    already exists in the database and generates a hashed password to 
-    store in the database.
+    and creates a caregiver in the Caregivers table, see
+    create_account().
 
     Parameters
     ----------
@@ -116,101 +75,41 @@ def create_caregiver(tokens):
         A list of the command line inputs of the form:
             ['create_caregiver', '<username>', '<password>']
     """
-    # create_caregiver <username> <password>
-    # check 1: the length for tokens need to be exactly 3 to include all information (with the operation name)
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
-    username = tokens[1]
-    password = tokens[2]
-    # check 2: check if the username has been taken already
-    if username_exists_caregiver(username):
-        print("Username taken, try again!")
-        return
-
-    salt = Util.generate_salt()
-    hash = Util.generate_hash(password, salt)
-    # create the caregiver
-    try:
-        caregiver = Caregiver(username, salt=salt, hash=hash)
-        # save to caregiver information to our database
-        try:
-            caregiver.save_to_db()
-        except:
-            print("Create failed, Cannot save")
-            return
-        print(" *** Account created successfully *** ")
-    except pymssql.Error:
-        print("Create failed")
-        return
+    return create_account(Caregiver, tokens[1], tokens[2])
 
 
-def username_exists_caregiver(username):
+def create_account(account_type, username, password):
     """
-    Checking whether the desired username
-    already exists in the Caregivers table
+    Generates a hashed password and stores the account, unless the
+    username has been taken already. The check is part of the insert,
+    so this is one round-trip to the database.
 
     Parameters
     ----------
+    account_type : type
+        Patient or Caregiver.
     username : str
-        The desired username for the caregivers
+        The desired username.
+    password : str
+        The password to hash.
 
     Returns
     -------
-    bool
-        Returns True if the username already exists in the 
-        Caregivers table. False if the username is not taken.
+    CommandStatus
+        The failure, or None if the account was created.
     """
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-
-    select_username = "SELECT * FROM Caregivers WHERE Username = %s"
-    try:
-        cursor = conn.cursor(as_dict=True)
-        cursor.execute(select_username, username)
-        #  returns false if the cursor is not before the first record or if there are no rows in the ResultSet.
-        for row in cursor:
-            return row['Username'] is not None
-    except pymssql.Error:
-        print("Error occurred when checking username")
-        cm.close_connection()
-    cm.close_connection()
-    return False
+    # Generating random salt and hash based off of password and salt.
+    salt = Util.generate_salt()
+    hash = HashService.shared().generate_hash(password, salt)
 
-def check_login(user, current_patient, current_caregiver):
-    """
-    Checks if the current user is logged
-    in as a patient, caregiver or either.
-    Returns a True if they are logged in, 
-    else returns False.
+    # create the account and save it to our database
+    created = account_type(username, salt=salt, hash=hash).save_to_db()
+    if created is None:
+        return CommandStatus.failed("Create failed")
+    if not created:
+        return CommandStatus.failed("Username taken, try again!")
+    print(" *** Account created successfully *** ")
 
-    Parameters
-    ----------
-    user : str
-        The type of user to check if logged in.
-        Possible values include 'patient', 'caregiver',
-        'any'.
-    
-    Returns
-    -------
-    status : bool
-        returns true if the given user is logged in.
-    """
-    # global current_caregiver
-    # global current_patient
-    possible_inputs = ['patient', 'caregiver', 'any']
-    if user in possible_inputs:
-        if user == 'patient':
-            return current_patient is not None
-        elif user == 'caregiver':
-            return current_caregiver is not None
-        elif user == 'any':
-            return current_patient is not None or current_caregiver is not None
-    else:
-        print("User type not defined")
-        return
 
 def login_patient(tokens):
     """
@@ -223,40 +122,11 @@ def login_patient(tokens):
         A list of strings of the user input:
              ['login_patient',  '<username>',  '<password>']
     """
-    # login_caregiver <username> <password>
-    # check 1: if someone's already logged-in, they need to log out first
-    global current_caregiver
-    global current_patient
-    if check_login('any', current_patient, current_caregiver):
-        print("Already logged-in!")
-        return
-
-    # check 2: the length for tokens need to be exactly 3 to include all information (with the operation name)
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
-    username = tokens[1]
-    password = tokens[2]
-
-    patient = None
-    try:
-        try:
-            patient = Patient(username, password=password).get()
-        except:
-            print("Get Failed")
-            return
-    except pymssql.Error:
-        print("Error occurred when logging in")
-
-    # check if the login was successful
-    if patient is None:
-        print("Invalid username or password")
-        print("Please try again!")
-    else:
-        print("Patient logged in as: " + username)
-        current_patient = patient
+    patient = login_account(Patient, tokens[1], tokens[2])
+    if isinstance(patient, CommandStatus):
+        return patient
+    print("Patient logged in as: " + patient.username)
+    get_session().patient = patient
 
 
 def login_caregiver(tokens):
@@ -270,40 +140,40 @@ def login_caregiver(tokens):
         A list of strings of the user input:
              ['login_caregiver',  '<username>',  '<password>']
     """
-    # login_caregiver <username> <password>
-    # check 1: if someone's already logged-in, they need to log out first
-    global current_caregiver
-    global current_patient
-    if check_login('any', current_patient, current_caregiver):
-        print("Already logged-in!")
-        return
-
-    # check 2: the length for tokens need to be exactly 3 to include all information (with the operation name)
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
-    username = tokens[1]
-    password = tokens[2]
-
-    caregiver = None
+    caregiver = login_account(Caregiver, tokens[1], tokens[2])
+    if isinstance(caregiver, CommandStatus):
+        return caregiver
+    print("Caregiver logged in as: " + caregiver.username)
+    get_session().caregiver = caregiver
+
+
+def login_account(account_type, username, password):
+    """
+    Fetches the account and verifies the password in one lookup.
+
+    Parameters
+    ----------
+    account_type : type
+        Patient or Caregiver.
+    username : str
+        The account's username.
+    password : str
+        The password to verify.
+
+    Returns
+    -------
+    Account or CommandStatus
+        The account, or the failure if the login failed.
+    """
     try:
-        try:
-            caregiver = Caregiver(username, password=password).get()
-        except:
-            print("Get Failed")
-            return
-    except pymssql.Error:
-        print("Error occurred when logging in")
+        account = account_type(username, password=password).get()
+    except Exception:
+        return CommandStatus.failed("Get Failed")
 
     # check if the login was successful
-    if caregiver is None:
-        print("Invalid username or password")
-        print("Please try again!")
-    else:
-        print("Caregiver logged in as: " + username)
-        current_caregiver = caregiver
+    if account is None:
+        return CommandStatus.failed("Invalid username or password", "Please try again!")
+    return account
 
 
 def search_caregiver_schedule(tokens):
@@ -316,182 +186,120 @@ def search_caregiver_schedule(tokens):
     ----------
     tokens : list
         A list of length 2 of the inputs from the command line.
-        ['search_caregiver_schedule', '<mm-dd-yyyy>']
+        ['search_caregiver_schedule', <date>], the date parsed by
+        the command router.
     """
-    # Check 1: make sure the user is logged in as either a patient
-    # or a caregiver
-    global current_caregiver
-    global current_patient
-    if not check_login('any', current_patient, current_caregiver):
-        print("Please login first!")
-        return
-    # Check 2: make sure the length of tokens matches the desired parameter
-    #   length
-    if len(tokens) != 2:
-        print(f"Expected 2 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
     # Extracting information from token
     date = tokens[1]
-    # Check 3: make sure the date string is in the correct format 'mm-dd-yyyy'
-    if check_date_format(date) is False:
-        return
-
-    # reformating date to 'yyyy-mm-dd'
-    re_date = reformat_date(date)
     # Retrieve availability results on 'mm-dd-yyyy'
     # Prints a list of the caregivers
-    # create connection
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-
     # Get availabilities
-    select_caregivers = "SELECT * FROM Availabilities WHERE Time=%s"
     try:
-        cursor = conn.cursor(as_dict=True)
-        cursor.execute(select_caregivers, re_date)
-        caregivers = cursor.fetchall()
+        with ConnectionManager() as conn:
+            cursor = conn.cursor(as_dict=True)
+            cursor.run('caregivers_on_date', date)
+            caregivers = cursor.fetchall()
         if len(caregivers) == 0:
-            print(f"No caregivers available on {date}")
-            return
+            print(f"No caregivers available on {Dates.format(date)}")
         else:
-            print(f"Caregivers available on {date}:")
+            print(f"Caregivers available on {Dates.format(date)}:")
             for row in caregivers:
                 print('-', row['Username'])
             print()
-    except pymssql.Error:
-        print("Error occurred when selecting caregivers")
-        cm.close_connection()
-    cm.close_connection()
+    except DBError:
+        return CommandStatus.failed("Error occurred when selecting caregivers")
     # Showing the available doses
-    show_doses()
+    return show_doses()
 
-def show_availabilities():
+def positive_int(value):
     """
-    Shows the unique availabilites for appointments.
-    You must be logged in as either a patient or a caregiver
+    Converts a count, such as a page size or a number of doses, to a
+    positive int.
     """
-    # Check 1: make sure the user is logged in as either a patient
-    # or a caregiver
-    global current_caregiver
-    global current_patient
-    if not check_login('any', current_patient, current_caregiver):
-        print("Please login first!")
-        return
-
-    # Create a connection
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-
-    # Get unique availabilities (dates)
-    select_availabilities = "SELECT DISTINCT Time FROM Availabilities ORDER BY Time ASC"
     try:
-        cursor = conn.cursor(as_dict=True)
-        cursor.execute(select_availabilities)
-        print('Availabilities:')
-        for date in cursor.fetchall():
-            ref_date = reformat_date(str(date['Time']), inverse=True)
-            print(ref_date)
-    except pymssql.Error:
-        print("Error occurred when selecting availabilities")
-        cm.close_connection()
-    cm.close_connection()
-
-def reformat_date(date_string, inverse=False):
-    """
-    Reformats the datestring from 
-    'mm-dd-yyyy' to 'yyyy-mm-dd'
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise ValueError(f"Expected a positive integer, received '{value}'")
+    return number
 
-    Parameters
-    ----------
-    date_string : str
-        A string containing date information
-    inverse : bool
-        If inverse is True, it converts from
-        'yyyy-mm-dd to mm-dd-yyyy'
+
+def appointment_id(value):
     """
-    if inverse is False:
-        return date_string[6:] + '-' + date_string[0:5]
-    else:
-        return date_string[5:] + '-' + date_string[0:4]
+    Converts an appointment id argument to an int.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("appointment id must be an integer") from None
 
-def check_date_format(date_string):
+
+# rows fetched by listings without --limit, the largest int parameter
+MAX_ROWS = 2 ** 31 - 1
+
+
+def show_availabilities(tokens):
     """
-    Returns False if the format of the date
-    string is not in the format 'mm-dd-yyyy'.
-    Or if the date is invalid.
+    Shows the dates with open appointment slots and how many
+    caregivers are available on each, read from the
+    AvailabilityCalendar summary (one row per date).
+    You must be logged in as either a patient or a caregiver
 
     Parameters
     ----------
-    date_string : str
-        A string containing date information
-    """
-    date_list = date_string.split('-')
-    if len(date_list) != 3:
-        print("Invalid date")
-        print("Please use format 'mm-dd-yyy'")
-        return False
-    if len(date_list[0]) != 2 or len(date_list[1]) != 2:
-        print("Invalid date")
-        print("Please use format 'mm-dd-yyy'")
-        return False
-    if len(date_list[2]) != 4:
-        print("Invalid date")
-        print("Please use format 'mm-dd-yyy'")
-        return False
-
-    # Testing the values
-    for i, val in enumerate(date_list):
-        try:
-            date_val = int(val)
-            if i == 0 and (date_val > 12 or date_val == 0):
-                print("Months out of range")
-                return False
-            if i == 1 and (date_val > 31 or date_val == 0):
-                print("Days are out of range")
-                return False
-
-        except:
-            print("Invalid date format")
-            return False
-    return True
+    tokens : list
+        ['show_availabilities', <options>] where options holds the
+        parsed values of the optional '--from <date> --to <date>
+        --limit <n>' arguments: only dates from 'from' to 'to'
+        (inclusive, 'mm-dd-yyyy') are shown, at most 'limit' of them.
+    """
+    options = tokens[1]
+    # Get the dates with open slots, in the requested window. Missing
+    # options are open bounds so every listing runs the same statement.
+    first = options.get('from', datetime.date.min)
+    last = options.get('to', datetime.date.max)
+    limit = options.get('limit')
+    # one extra row tells whether there is a next page
+    rows = MAX_ROWS if limit is None else limit + 1
+    try:
+        with ConnectionManager() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                cursor.run('availability_calendar', (first, last, rows))
+                print('Availabilities:')
+                shown = 0
+                for date in cursor:
+                    if shown == limit:
+                        next_page = f"--from {Dates.format(date['Time'])} --limit {limit}"
+                        if 'to' in options:
+                            next_page = f"--to {Dates.format(options['to'])} " + next_page
+                        print(f"More dates: show_availabilities {next_page}")
+                        break
+                    print(f"{Dates.format(date['Time'])} ({date['Slots']} available)")
+                    shown += 1
+    except DBError:
+        return CommandStatus.failed("Error occurred when selecting availabilities")
 
 def show_doses():
     """
     Outputs the current vaccines that are
     available along with the number of available doses.
-    """
-    # Create connection
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-
-    select_doses = "SELECT * FROM Vaccines"
-    try:
-        cursor = conn.cursor(as_dict=True)
-        cursor.execute(select_doses)
-        # outputing the vaccine name along with doses available
-        print("Available Vaccines:")
-        headers = ['NAME', 'DOSES']
-        cols = ['Name', 'Doses']
-        table = []
-        for vaccine in cursor:
-            row = []
-            for colname in cols:
-                val = str(vaccine[colname])
-                row.append(val)
-            table.append(row)
-        print(tabulate(table, headers, tablefmt="pretty"))
-    except pymssql.Error:
-        print("Error occurred when getting current doses")
-        cm.close_connection()
-        return
-    cm.close_connection()
+    The listing is served from the vaccine inventory cache
+    when it is fresh.
+    """
+    vaccines = Vaccine.get_all()
+    if vaccines is None:
+        return CommandStatus.failed("Error occurred when getting current doses")
+    # outputing the vaccine name along with doses available
+    print("Available Vaccines:")
+    with TableWriter(['NAME', 'DOSES']) as table:
+        for vaccine in vaccines:
+            table.write([vaccine.get_vaccine_name(), vaccine.get_available_doses()])
 
 def reserve(tokens):
     """
     Patients can perform this operation to reserve an appointment.
-    They are randomly assigned a caregiver for the reservation 
+    They are assigned the first free caregiver for the reservation 
     on that date, the output will be the assigned caregiver and 
     the appointment ID for the reservation.
 
@@ -499,186 +307,137 @@ def reserve(tokens):
     ----------
     tokens: list
         list of length 3 of the following format:
-        ['reserve', '<mm-dd-yyyy>', '<vaccine name>']
+        ['reserve', <date>, '<vaccine name>'], the date parsed by
+        the command router.
     
     Returns
     -------
     None
     """
-    # basic functionality
-    # Check 1: make sure the user is logged in as either a patient
-    # or a caregiver
-    global current_caregiver
-    global current_patient
-    if not check_login('patient', current_patient, current_caregiver):
-        print("Please login as a patient")
-        return
-    # Check 2: make sure the length of tokens matches the desired parameter
-    #   length
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
+    current_patient = get_session().patient
     # Extracting information from token
     date = tokens[1]
     vac_name = tokens[2]
-    # Check 3: make sure the date string is in the correct format 'mm-dd-yyyy'
-    if check_date_format(date) is False:
-        return
-
-    # reformating date to 'yyyy-mm-dd'
-    re_date = reformat_date(date)
 
-    # create connection
-    cm = ConnectionManager()
-    conn = cm.create_connection()
+    # Claim a caregiver slot, take a dose and insert the appointment
+    # in a single transaction
+    appointment = Appointment(current_patient.username, date, vac_name)
     try:
-        # Get Available Caregivers
-        try:
-            # Check 1: Make sure there is a caregiver available
-            select_caregivers = "SELECT Username FROM Availabilities WHERE Time=%s"
-            with conn.cursor(as_dict=True) as cursor:
-                cursor.execute(select_caregivers, re_date)
-                available_caregivers = cursor.fetchall() # list of dict
-            if len(available_caregivers) == 0:
-                print(f"No caregivers available on {date}")
-                return
-            # Retrieve a random caregiver
-            else:
-                rand_caregiver = available_caregivers[np.random.randint(0, len(available_caregivers))]['Username']
-        except pymssql.Error:
-            print("Error occured while checking caregiver availability")
-        # Update vaccine doses (removes one dose from vaccine table)
-        try:
-            remove_dose(vac_name)
-        except:
-            print("Error in updating vaccine doses")
-            return
-        # Insert the appointment
-        try:
-            insert_appointment = "INSERT INTO Appointments VALUES(%d, %s, %s, %s, %s)"
-            app_id = get_appointment_id()
-            with conn.cursor(as_dict=True) as cursor:
-                cursor.execute(insert_appointment, (app_id, current_patient.username, rand_caregiver, vac_name, re_date))
-        except pymssql.Error:
-            print("Error occured when trying to insert appointment")
-            conn.rollback()
-            cm.close_connection()
-            return
-        # Remove availability from caregiver
-        try:
-            remove_availability = "DELETE FROM Availabilities WHERE Username = %s AND Time = %s"
-            with conn.cursor(as_dict=True) as cursor:
-                cursor.execute(remove_availability, (rand_caregiver, re_date))
-        except pymssql.Error:
-            print("Error occured when updating caregiver availabilities")
-            conn.rollback()
-            cm.close_connection()
-            return
-        print("Successfully created appointment!")
-        print("Your appointment details:")
-        headers = ["Appointment ID", "Date", "Caregiver", "Vaccine"]
-        table = [[app_id, date, rand_caregiver, vac_name]]
-        print(tabulate(table, headers, tablefmt="pretty"))
-    except pymssql.Error:
-        print("Error occurred when reserving appointment")
-        conn.rollback()
-        cm.close_connection()
-        return
-    conn.commit()
-    cm.close_connection()
-
-
-def get_appointment_id():
+        status = appointment.reserve()
+    except DBError:
+        return CommandStatus.failed("Error occurred when reserving appointment")
+    if status == Appointment.NO_CAREGIVER:
+        return CommandStatus.failed(f"No caregivers available on {Dates.format(date)}")
+    elif status == Appointment.NO_VACCINE:
+        failure = CommandStatus.failed(f"Vaccine {vac_name} does not exist")
+        show_doses()
+        return failure
+    elif status == Appointment.NO_DOSES:
+        return CommandStatus.failed(f"Not enough available doses of {vac_name}")
+    print("Successfully created appointment!")
+    print("Your appointment details:")
+    with TableWriter(["Appointment ID", "Date", "Caregiver", "Vaccine"]) as table:
+        table.write([appointment.appointment_id, Dates.format(date), appointment.caregiver, vac_name])
+
+
+# Day selections accepted by upload_availability, by weekday number
+RECURRENCE_RULES = {
+    'daily': {0, 1, 2, 3, 4, 5, 6},
+    'weekdays': {0, 1, 2, 3, 4},
+    'weekends': {5, 6},
+}
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+# Longest date range upload_availability accepts, in days
+MAX_AVAILABILITY_DAYS = 366
+
+
+def recurrence_days(rule):
+    """
+    Returns the weekday numbers selected by a day selection of
+    upload_availability: 'daily', 'weekdays', 'weekends' or a comma
+    separated list of day names, full or abbreviated to three letters
+    ('mon,wednesday,FRI'). Case is ignored.
+
+    Raises
+    ------
+    ValueError
+        If the selection names an unknown day.
+    """
+    rule = rule.lower()
+    if rule in RECURRENCE_RULES:
+        return RECURRENCE_RULES[rule]
+    days = set()
+    for name in rule.split(','):
+        for number, day in enumerate(WEEKDAYS):
+            if name == day or name == day[:3]:
+                days.add(number)
+                break
+        else:
+            raise ValueError(f"Unknown day '{name}'")
+    return days
+
+
+def availability_dates(tokens):
     """
-    Queries into the Appointments table,
-    Finds the max appointment ID and returns
-    a new unique appointment ID.
-    Generates a unique appointment id:
-    gets the list of appoinment ids
+    Expands the arguments of upload_availability into the dates they
+    cover.
 
     Parameters
     ----------
-    None
+    tokens : list
+        The arguments parsed by the command router:
+        ['upload_availability', <start>, <end>, <days>]
+            - start: first date
+            - end: optional last date, by default start
+            - days: optional weekday numbers (see recurrence_days),
+              by default every day
 
     Returns
     -------
-    int : Unique appointment id
-    """
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-    # Get max appoinment ID
-    select_max_app_id = "SELECT MAX(appointment_id) FROM Appointments"
-    try:
-        cursor = conn.cursor()
-        try:
-            cursor.execute(select_max_app_id)
-            max_id = cursor.fetchall()[0][0]
-            if max_id is None:
-                return 1
-            else:
-                return max_id + 1
-        except:
-            print("Failed to create appointment id")
-    except pymssql.Error:
-        print("Error occurred when generating appoinment id")
-
-
+    list of datetime.date
+        The selected dates from start to end inclusive.
+
+    Raises
+    ------
+    ValueError
+        If the range is reversed or too long.
+    """
+    start = tokens[1]
+    end = tokens[2] if len(tokens) > 2 else start
+    days = tokens[3] if len(tokens) > 3 else RECURRENCE_RULES['daily']
+    if end < start:
+        raise ValueError("The end date is before the start date")
+    if (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise ValueError(f"Date ranges are limited to {MAX_AVAILABILITY_DAYS} days")
+    dates = []
+    d = start
+    while d <= end:
+        if d.weekday() in days:
+            dates.append(d)
+        d += datetime.timedelta(days=1)
+    return dates
 
 
 def upload_availability(tokens):
     #  upload_availability <date>
-    #  check 1: check if the current logged-in user is a caregiver
-    global current_caregiver
-    global current_patient
-    if not check_login('caregiver', current_patient, current_caregiver):
-        print("Please login as caregiver first!")
-        return
-
-    # check 2: the length for tokens need to be exactly 2 to include all information (with the operation name)
-    if len(tokens) != 2:
-        print("Please try again!")
-        return
-
-    date = tokens[1]
-    # assume input is hyphenated in the format mm-dd-yyyy
-    date_tokens = date.split("-")
-    month = int(date_tokens[0])
-    day = int(date_tokens[1])
-    year = int(date_tokens[2])
+    #  upload_availability <start> <end> [daily|weekdays|weekends|mon,wed,...]
+    current_caregiver = get_session().caregiver
     try:
-        d = datetime.datetime(year, month, day)
-        # Check if availability already there
-        try:
-            cm = ConnectionManager()
-            conn = cm.create_connection()
-        except:
-            print("Failed to create connection")
-            return
-        try:
-            select_availability = 'SELECT * FROM Availabilities WHERE Time=%s AND Username=%s'
-            with conn.cursor() as cursor:
-                cursor.execute(select_availability, (d, current_caregiver.username))
-                rows = cursor.fetchall()
-            if len(rows) == 1:
-                print("Availability already in system, upload new availability")
-                cm.close_connection()
-                return
-        except:
-            print("Failed to check availability")
-            cm.close_connection
-            return
-        try:
-            current_caregiver.upload_availability(d)
-        except:
-            print("Upload Availability Failed")
-            return
+        dates = availability_dates(tokens)
+    except ValueError as err:
+        return CommandStatus.failed(err, "Please enter a valid date!")
+    if len(dates) == 0:
+        return CommandStatus.failed("No dates in the range match the selected days")
+
+    added = current_caregiver.upload_availabilities(dates)
+    if added is None:
+        return CommandStatus.failed("Upload Availability Failed")
+    elif len(tokens) == 2:
+        if added == 0:
+            return CommandStatus.failed("Availability already in system, upload new availability")
         print("Availability uploaded!")
-    except ValueError:
-        print("Please enter a valid date!")
-    except pymssql.Error as db_err:
-        print("Error occurred when uploading availability")
+    else:
+        print(f"{added} availabilities uploaded, {len(dates) - added} already in system")
 
 
 def cancel(tokens):
@@ -692,125 +451,49 @@ def cancel(tokens):
     ----------
     tokens : list
         A list of length 2 of format:
-        ['cancel', '<appointment_id>']
+        ['cancel', <appointment_id>], the id parsed by the command
+        router.
     """
-    # Check 1: check the token length
-    if len(tokens) != 2:
-        print(f"Expected 2 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-    
-    # Check 2: Check to make sure appointment id can be made into an integer
-    try:
-        appointment_id = int(tokens[1])
-    except:
-        print("Invalid appointment id type")
-        print("appointment id must be an integer")
-        return
-    # Check 3: Make sure the user is logged in as a Caregiver or Patient
-    global current_caregiver
-    global current_patient
-    if current_caregiver is None and current_patient is None:
-        print("Please login first!")
-        return
-    elif current_caregiver is not None:
-        condition = f"c_username='{current_caregiver.username}'"
+    appointment_id = tokens[1]
+    session = get_session()
+    current_patient = session.patient
+    current_caregiver = session.caregiver
+    if current_caregiver is not None:
+        select_appointment = 'caregiver_appointment'
+        username = current_caregiver.username
     else:
-        condition = f"p_username='{current_patient.username}'"
+        select_appointment = 'patient_appointment'
+        username = current_patient.username
     
     # Get the caregiver's username
-    cm = ConnectionManager()
-    conn = cm.create_connection()
     try:
-        try:
-            select_caregiver = f"""SELECT c_username, Time, vac_name 
-                                    FROM Appointments 
-                                WHERE appointment_id=%s AND
-                                        {condition}"""
+        with ConnectionManager() as conn:
             with conn.cursor(as_dict=True) as cursor:
-                cursor.execute(select_caregiver, appointment_id)
+                cursor.run(select_appointment, (appointment_id, username))
                 app = cursor.fetchone()
-                caregiver = app['c_username']
-                date = app['Time']
-                vaccine = app['vac_name']
-        except:
-            print("Failed to retrieve appointment")
-            return
-        if caregiver is None:
-            print("Appointment does not exist")
-            return
-        else:
-            # Delete the appointment
-            delete_appointment = "DELETE FROM Appointments WHERE appointment_id=%s"
-            with conn.cursor(as_dict=True) as cursor:
-                cursor.execute(delete_appointment, appointment_id)
-            # Add back availability
-            try:
-                try:
-                    insert_availability = """INSERT INTO Availabilities VALUES(%s, %s)"""
-                    with conn.cursor() as cursor:
-                        cursor.execute(insert_availability, (date.strftime("%Y-%m-%d"), caregiver))
-                except:
-                    print("Update Availability Failed")
-                    conn.rollback()
-                    cm.close_connection()
-                    return
-            except pymssql.Error as db_err:
-                print("Error occurred when uploading availability")
-            # Update vaccine doses
-            try:
-                add_doses(['add_doses', vaccine, 1], override=True)
-            except:
-                print("Failed to update doses!")
-                conn.rollback()
-                cm.close_connection()
-                return
-    except pymssql.Error:
-        print("Error while trying to retrieve appointment")
-        cm.close_connection()
-        return
+            if app is None:
+                return CommandStatus.failed("Appointment does not exist")
+            caregiver = app['c_username']
+            date = app['Time']
+            vaccine = app['vac_name']
+            with conn.cursor() as cursor:
+                # Delete the appointment
+                cursor.run('delete_appointment', appointment_id)
+                # Add back availability
+                cursor.run('insert_availability', (date, caregiver))
+            # Update vaccine doses in the same transaction, a second
+            # connection would block on the rows this one has locked
+            Vaccine.change_doses([(vaccine, 1)], conn)
+            # Cancel the appointment
+            conn.commit()
+    except (DBError, ValueError):
+        # the connection is rolled back when it is released
+        return CommandStatus.failed("Error occurred when cancelling the appointment")
+    Vaccine.inventory.invalidate(vaccine)
     print("You have successfully cancelled your appointment.")
-    # Cancel the appointment
-    conn.commit()
-    cm.close_connection()
-
 
-def remove_dose(vaccine_name):
-    """
-    Removes a single dose from the specified vaccine
-    in the vaccines table.
 
-    Parameters
-    ----------
-    vaccine_name : str
-        A string that specifies the name of the vaccine
-        in the Vaccines Table
-    """
-    try:
-        try:
-            vaccine = Vaccine(vaccine_name, 0).get()
-            if vaccine is None:
-                print("Vaccine", vaccine_name, "does not exist")
-                show_doses()
-                return
-        except:
-            print("Failed to get Vaccine")
-            return
-    except pymssql.Error:
-        print("Error occured when removing dose")
-        return
-    # Remove dose from Vaccine
-    try:
-        try:
-            vaccine.decrease_available_doses(1)
-        except:
-            print("Failed to decrease available doses")
-            return
-    except pymssql.Error:
-        print("Error occured when updating Vaccine doses")
-        return
-
-def add_doses(tokens, override=False):
+def add_doses(tokens):
     """
     An operation that can be used only by Caregivers. It allows
     them to add doses to the Vaccines table. If the vaccine does
@@ -824,128 +507,83 @@ def add_doses(tokens, override=False):
         A list of strings of the format:
         ['add_doses', 'vaccine', <number>] 
             - vaccine: Name of the vaccine
-            - number: number of vaccines
-    override : bool, optional
-        If override is true, the function does not care
-        if the current logged in user is a caregiver. This is so
-        patients can cancel their appointments and effectively 'add back'
-        a vaccine dose for availability, by default False
+            - number: number of vaccines, parsed by the command
+              router
     """
     #  add_doses <vaccine> <number>
-    #  check 1: check if the current logged-in user is a caregiver
-    if override is False:
-        global current_caregiver
-        global current_patient
-        if not check_login('caregiver', current_patient, current_caregiver):
-            print("Please login as caregiver first!")
-            return
-
-    #  check 2: the length for tokens need to be exactly 3 to include all information (with the operation name)
-    if len(tokens) != 3:
-        print(f"Expected 3 inputs, received {len(tokens)} inputs")
-        print("Please try again!")
-        return
-
     vaccine_name = tokens[1]
+    doses = tokens[2]
     try:
-        doses = int(tokens[2])
-        if doses < 0:
-            print("Number of doses must be a positive integer")
-            print("Please try again!")
-            return
-    except ValueError:
-        print("Number of doses must be a positive integer!")
-        print("Please try again!")
-        return
-    vaccine = None
-    try:
-        try:
-            vaccine = Vaccine(vaccine_name, doses).get()
-        except:
-            print("Failed to get Vaccine!")
-            return
-    except pymssql.Error:
-        print("Error occurred when adding doses")
-
-    # check 3: if getter returns null, it means that we 
-    # need to create the vaccine and insert it into the Vaccines table
-    if vaccine is None:
-        try:
-            vaccine = Vaccine(vaccine_name, doses)
-            try:
-                vaccine.save_to_db()
-            except:
-                print("Failed To Save")
-                return
-        except pymssql.Error:
-            print("Error occurred when adding doses")
-    else:
-        # if the vaccine is not null, meaning that the vaccine already exists in our table
-        try:
-            try:
-                vaccine.increase_available_doses(doses)
-            except:
-                print("Failed to increase available doses!")
-                return
-        except pymssql.Error:
-            print("Error occurred when adding doses")
-    if not override:
-        print("Doses updated!")
-
-
-def show_appointments():
+        vaccine = Vaccine(vaccine_name, doses).get()
+        # check 1: if getter returns null, it means that we
+        # need to create the vaccine and insert it into the Vaccines table
+        if vaccine is None:
+            Vaccine(vaccine_name, doses).save_to_db()
+        else:
+            # if the vaccine is not null, meaning that the vaccine already exists in our table
+            vaccine.increase_available_doses(doses)
+    except (DBError, ValueError):
+        return CommandStatus.failed("Error occurred when adding doses")
+    # move the new doses into the vaccine's shards
+    DoseAllocator.shared().spread(vaccine_name)
+    print("Doses updated!")
+
+
+def show_appointments(tokens):
     """
     Outputs the scheduled appointments for the given user
     (Patient or Caregiver) as a table that includes the 
-    appointment id, Patient/Caregiver name, Vaccine, and date
+    appointment id, Patient/Caregiver name, Vaccine, and date.
+    Rows are printed while they are read, in appointment id order.
+
+    Parameters
+    ----------
+    tokens : list
+        ['show_appointments', <options>] where options holds the
+        parsed values of the optional '--after <id> --limit <n>'
+        arguments: only appointments with an id above 'after' are
+        shown, at most 'limit' of them.
     """
-    global current_patient
-    global current_caregiver
+    session = get_session()
+    current_patient = session.patient
+    current_caregiver = session.caregiver
+    options = tokens[1]
 
-    cm = ConnectionManager()
-    conn = cm.create_connection()
-    cursor = conn.cursor(as_dict=True)
+    if current_caregiver is not None:
+        # Retrieve caregiver appointments
+        select_appointments = 'caregiver_appointments'
+        username = current_caregiver.username
+        name = 'p_username'
+        person = 'PATIENT'
+    else:
+        select_appointments = 'patient_appointments'
+        username = current_patient.username
+        name = 'c_username'
+        person = 'CAREGIVER'
+    limit = options.get('limit')
+    # one extra row tells whether there is a next page
+    rows = MAX_ROWS if limit is None else limit + 1
 
     try:
-        if current_caregiver is not None:
-            try:
-                # Retrieve caregiver appointments
-                select_appointments = "SELECT * FROM Appointments WHERE c_username=%s"
-                cursor.execute(select_appointments, current_caregiver.username)
-                name = 'p_username'
-            except:
-                print("Failed to retrieve caregiver appointments")
-        elif current_patient is not None:
-            try:
-                select_appointments = "SELECT * FROM Appointments WHERE p_username=%s"
-                cursor.execute(select_appointments, current_patient.username)
-                name = 'c_username'
-            except:
-                print("Failed to retrieve patient appointments")
-        else:
-            print("Not currently logged in")
-            print("Please login first!")
-            return
-        # Printing the output
-        if name == 'p_username':
-            person = 'PATIENT        '
-        elif name == 'c_username':
-            person = 'CAREGIVER      '
-        print("Appointments:")
-        headers = ["APPOINTMENT ID", person, "VACCINE", "DATE"]
-        # generating rows
-        cols = ['appointment_id', name, 'vac_name', 'Time']
-        table = []
-        for appointment in cursor.fetchall():
-            row = []
-            for colname in cols:
-                val = str(appointment[colname])
-                row.append(val)
-            table.append(row)
-        print(tabulate(table, headers, tablefmt="pretty"))
-
-    except pymssql.Error:
-        print("Error in retrieving appointments!")
+        with ConnectionManager() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                cursor.run(select_appointments, (username, options.get('after', 0), rows))
+                # Printing the output
+                print("Appointments:")
+                last_id = None
+                more = False
+                with TableWriter(["APPOINTMENT ID", person, "VACCINE", "DATE"]) as table:
+                    for appointment in cursor:
+                        if table.rows == limit:
+                            more = True
+                            break
+                        table.write([appointment['appointment_id'], appointment[name],
+                                     appointment['vac_name'], Dates.format(appointment['Time'])])
+                        last_id = appointment['appointment_id']
+                if more:
+                    print(f"More appointments: show_appointments --after {last_id} --limit {limit}")
+    except DBError:
+        return CommandStatus.failed("Error in retrieving appointments!")
 
 def logout(tokens):
     """
@@ -957,93 +595,168 @@ def logout(tokens):
         A list of the user input of the form
         ['logout']
     """
-    # Check 1: check the length of the input
-    if len(tokens) != 1:
-        print("Invalid token length")
-        print("Please try again!")
-        return
-    
-    global current_caregiver
-    global current_patient
+    session = get_session()
+    current_patient = session.patient
+    current_caregiver = session.caregiver
 
     if current_caregiver is not None:
         print(f"Logging out caregiver {current_caregiver.username}")
-        current_caregiver = None
+        session.caregiver = None
     elif current_patient is not None:
         print(f"Logging out patient {current_patient.username}")
-        current_patient = None
+        session.patient = None
     else:
-        print("Not currently logged in")
-        return
+        return CommandStatus.failed("Not currently logged in")
     print("Successfully logged out")
-    return
+
+
+def print_menu():
+    """
+    Prints the commands available to the user of the current session.
+    """
+    session = get_session()
+    current_patient = session.patient
+    current_caregiver = session.caregiver
+    if current_caregiver is None and current_patient is None:
+        print()
+        print("+----------------------------------------+")
+        print("|   PLEASE LOGIN OR CREATE AN ACCOUNT!   |")
+        print("+----------------------------------------+")
+        print()
+        print(" *** Available Commands *** ")
+        print("> create_patient <username> <password>")
+        print("> create_caregiver <username> <password>")
+        print("> login_patient <username> <password>")
+        print("> login_caregiver <username> <password>")
+        print("> help")
+        print("> stats")
+        print("> queries")
+        print("> Quit")
+        print()
+    elif current_caregiver is not None:
+        print()
+        print("+----------------------------------------+")
+        print("|           WELCOME CAREGIVER!           |")
+        print("+----------------------------------------+")
+        print()
+        print(" *** Available Commands *** ")
+        print("Vaccine Management:")
+        print("-------------------")
+        print("> show_doses")
+        print("> add_doses <vaccine> <number>")
+        print()
+        print("Scheduler:")
+        print("----------")
+        print("> show_appointments [--after <id>] [--limit <n>]")  
+        print("> upload_availability <date>")
+        print("> upload_availability <start> <end> [weekdays|weekends|mon,wed,...]")
+        print("> cancel <appointment_id>") 
+        print("> show_availabilities [--from <date>] [--to <date>] [--limit <n>]")
+        print()
+        print("Logout:")
+        print("-------")
+        print("> logout")
+        print("> help")
+        print("> stats")
+        print("> queries")
+        print("> Quit")
+        print()
+    else:
+        print()
+        print("+----------------------------------------+")
+        print("|            WELCOME PATIENT!            |")
+        print("+----------------------------------------+")
+        print()
+        print(" *** Available Commands *** ")
+        print("Schedule an Appointment:")
+        print("------------------------")
+        print("> show_availabilities [--from <date>] [--to <date>] [--limit <n>]")
+        print("> show_doses")
+        print("> search_caregiver_schedule <date>")
+        print("> reserve <date> <vaccine>")
+        print()
+        print("Manage Existing Appointments:")
+        print("-----------------------------")
+        print("> show_appointments [--after <id>] [--limit <n>]")
+        print("> cancel <appointment_id>")
+        print()
+        print("Logout:")
+        print("-------")
+        print("> logout")
+        print("> help")
+        print("> stats")
+        print("> queries")
+        print("> Quit")
+        print()
+
+
+def get_role():
+    """
+    Returns the role of the user logged in to the current session:
+    'patient', 'caregiver' or None.
+    """
+    session = get_session()
+    if session.caregiver is not None:
+        return 'caregiver'
+    if session.patient is not None:
+        return 'patient'
+    return None
+
+
+def quit_session(tokens):
+    print("Thank you for using the scheduler, Goodbye!")
+    return False
+
+
+# Every command, with who may run it, how many arguments it takes and
+# the checks its arguments must pass before the handler runs
+router = CommandRouter(get_role, CommandMetrics.shared())
+# profile every statement from the start, see the 'queries' command
+QueryProfiler.shared()
+router.register('create_patient', create_patient, 2)
+router.register('create_caregiver', create_caregiver, 2)
+router.register('login_patient', login_patient, 2, role='guest')
+router.register('login_caregiver', login_caregiver, 2, role='guest')
+router.register('search_caregiver_schedule', search_caregiver_schedule, 1, role='any', parsers=[Dates.parse])
+router.register('reserve', reserve, 2, role='patient', parsers=[Dates.parse])
+router.register('upload_availability', upload_availability, 1, 3, role='caregiver',
+                parsers=[Dates.parse, Dates.parse, recurrence_days])
+router.register('cancel', cancel, 1, role='any', parsers=[appointment_id])
+router.register('add_doses', add_doses, 2, role='caregiver', parsers=[str, positive_int])
+router.register('show_doses', lambda tokens: show_doses())
+router.register('show_availabilities', show_availabilities, 0, 6, role='any',
+                options={'from': Dates.parse, 'to': Dates.parse, 'limit': positive_int})
+router.register('show_appointments', show_appointments, 0, 4, role='any',
+                options={'after': int, 'limit': positive_int})
+router.register('logout', logout)
+router.register('help', lambda tokens: print_menu())
+router.register('stats', lambda tokens: CommandMetrics.shared().print_stats())
+router.register('queries', lambda tokens: QueryProfiler.shared().print_queries())
+router.register('quit', quit_session)
+
+
+def run_command(response):
+    """
+    Parses and runs one command line in the current session.
+
+    Parameters
+    ----------
+    response : str
+        The command line, e.g. 'reserve 01-05-2022 Pfizer'. Only the
+        operation name is case insensitive.
+
+    Returns
+    -------
+    CommandStatus
+        Whether the command failed and whether the user asked to quit.
+    """
+    return router.dispatch(response)
 
 
 def start():
+    print_menu()
     stop = False
     while not stop:
-        if current_caregiver is None and current_patient is None:
-            print()
-            print("+----------------------------------------+")
-            print("|   PLEASE LOGIN OR CREATE AN ACCOUNT!   |")
-            print("+----------------------------------------+")
-            print()
-            print(" *** Available Commands *** ")
-            print("> create_patient <username> <password>")
-            print("> create_caregiver <username> <password>")
-            print("> login_patient <username> <password>")
-            print("> login_caregiver <username> <password>")
-            print("> Quit")
-            print()
-        elif current_caregiver is not None:
-            print()
-            print("+----------------------------------------+")
-            print("|           WELCOME CAREGIVER!           |")
-            print("+----------------------------------------+")
-            print()
-            print(" *** Available Commands *** ")
-            print("Vaccine Management:")
-            print("-------------------")
-            print("> show_doses")
-            print("> add_doses <vaccine> <number>")
-            print()
-            print("Scheduler:")
-            print("----------")
-            print("> show_appointments")  
-            print("> upload_availability <date>")
-            print("> cancel <appointment_id>") 
-            print("> show_availabilities")
-            print()
-            print("Logout:")
-            print("-------")
-            print("> logout")
-            print("> Quit")
-            print()
-        else:
-            print()
-            print("+----------------------------------------+")
-            print("|            WELCOME PATIENT!            |")
-            print("+----------------------------------------+")
-            print()
-            print(" *** Available Commands *** ")
-            print("Schedule an Appointment:")
-            print("------------------------")
-            print("> show_availabilities")
-            print("> show_doses")
-            print("> search_caregiver_schedule <date>")
-            print("> reserve <date> <vaccine>")
-            print()
-            print("Manage Existing Appointments:")
-            print("-----------------------------")
-            print("> show_appointments")
-            print("> cancel <appointment_id>")
-            print()
-            print("Logout:")
-            print("-------")
-            print("> logout")
-            print("> Quit")
-            print()
-
         response = ""
         print("> Enter: ", end='')
 
@@ -1053,48 +766,47 @@ def start():
             print("Type in a valid argument")
             break
 
-        response = response.lower()
-        tokens = response.split(" ")
-        if len(tokens) == 0:
-            ValueError("Try Again")
-            continue
-        operation = tokens[0]
-        if operation == "create_patient":
-            create_patient(tokens)
-        elif operation == "create_caregiver":
-            create_caregiver(tokens)
-        elif operation == "login_patient":
-            login_patient(tokens)
-        elif operation == "login_caregiver":
-            login_caregiver(tokens)
-        elif operation == "search_caregiver_schedule":
-            search_caregiver_schedule(tokens)
-        elif operation == "reserve":
-            reserve(tokens)
-        elif operation == "upload_availability":
-            upload_availability(tokens)
-        elif operation == cancel:
-            cancel(tokens)
-        elif operation == "add_doses":
-            add_doses(tokens)
-        elif operation == "show_doses":
-            show_doses()
-        elif operation == "show_availabilities":
-            show_availabilities()
-        elif operation == "show_appointments":
-            show_appointments()
-        elif operation == "cancel":
-            cancel(tokens)
-        elif operation == "logout":
-            logout(tokens)
-        elif operation == "quit":
-            print("Thank you for using the scheduler, Goodbye!")
-            stop = True
-        else:
-            print("Invalid Argument")
+        stop = not run_command(response).keep_going
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="COVID-19 Vaccine Reservation Scheduling Application")
+    parser.add_argument('--serve', action='store_true', help="serve many sessions over TCP instead of the prompt")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on with --serve")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on with --serve")
+    parser.add_argument('--script', metavar='FILE',
+                        help="run the commands in FILE ('-' for stdin) and print JSON lines results")
+    parser.add_argument('--batch-size', type=int,
+                        help="maximum commands per transaction with --script, rows per batch with --import")
+    parser.add_argument('--import', dest='import_path', metavar='FILE',
+                        help="create the accounts in the CSV or JSON lines FILE ('-' for stdin)")
+    parser.add_argument('--account-type', choices=['patient', 'caregiver'], default='patient',
+                        help="kind of accounts created with --import")
+    parser.add_argument('--import-format', choices=['csv', 'jsonl'],
+                        help="format of the --import file, by default guessed from its extension")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="report the import time of the scheduler and fail if it exceeds the budget")
+    parser.add_argument('--startup-budget', type=float, metavar='MS',
+                        help="import time budget in milliseconds for --profile-startup")
+    args = parser.parse_args()
+    if args.profile_startup:
+        from util.StartupProfiler import StartupProfiler
+        sys.exit(0 if StartupProfiler(budget=args.startup_budget).report() else 1)
+    # Started here rather than on import: the hashing workers import
+    # this module too and must not write the metrics files
+    CommandMetrics.shared().start()
+    if args.serve:
+        from Server import serve
+        serve(args.host, args.port)
+        sys.exit()
+    if args.script:
+        from Batch import run_script
+        sys.exit(1 if run_script(args.script, args.batch_size) else 0)
+    if args.import_path:
+        from Import import run_import
+        sys.exit(1 if run_import(args.import_path, args.account_type, args.import_format, args.batch_size) else 0)
+
     # start command line
     print()
     print("+---------------------------------------------------------------------+")
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import Scheduler
+
+
+# Buffer that print() writes to while a server command runs.
+_output = contextvars.ContextVar('output', default=None)
+
+
+class _StdoutRouter(io.TextIOBase):
+    """
+    Stands in for sys.stdout and sends each write to the output
+    buffer of the command running in the current context, falling
+    back to the real stdout outside of commands.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, s):
+        buffer = _output.get()
+        if buffer is None:
+            return self.stdout.write(s)
+        return buffer.write(s)
+
+    def flush(self):
+        if _output.get() is None:
+            self.stdout.flush()
+
+
+class SchedulerServer:
+    """
+    Serves the scheduler's command grammar over TCP. Each connection
+    is a session with its own logged-in user; commands are sent one
+    per line and answered with their output followed by a '> ' prompt.
+    'help' prints the available commands and 'quit' closes the
+    connection.
+
+    Commands run on a thread pool and share the process wide
+    connection pool, so a slow command only holds up its own session.
+
+    Parameters
+    ----------
+    host : str
+        Interface to listen on.
+    port : int
+        TCP port to listen on.
+    threads : int, optional
+        Number of commands that can run at once. Defaults to the
+        ServerThreads environment variable, or 32.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, threads=None):
+        self.host = host
+        self.port = port
+        self.threads = threads or int(os.getenv("ServerThreads", 32))
+        self.sessions = 0
+
+    def run_line(self, session, line):
+        """
+        Runs one command line in session and returns its output and
+        whether the session should stay open.
+        """
+        Scheduler.set_session(session)
+        buffer = io.StringIO()
+        _output.set(buffer)
+        try:
+            keep_open = Scheduler.run_command(line).keep_going
+        except Exception as err:
+            print(f"Error while running command: {err}")
+            keep_open = True
+        return buffer.getvalue(), keep_open
+
+    async def handle_client(self, reader, writer):
+        session = Scheduler.Session()
+        self.sessions += 1
+        try:
+            writer.write(b"Welcome to the COVID-19 Vaccine Reservation Scheduling Application!\n"
+                         b"Type 'help' for the available commands.\n> ")
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8', errors='replace').strip()
+                if line:
+                    # to_thread runs the command in a copy of this context
+                    output, keep_open = await asyncio.to_thread(self.run_line, session, line)
+                    writer.write(output.encode('utf-8'))
+                    if not keep_open:
+                        break
+                writer.write(b"> ")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def serve_forever(self):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.threads))
+        if not isinstance(sys.stdout, _StdoutRouter):
+            sys.stdout = _StdoutRouter(sys.stdout)
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Scheduler server listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def serve(host='127.0.0.1', port=8765, threads=None):
+    """
+    Runs a SchedulerServer until interrupted.
+    """
+    try:
+        asyncio.run(SchedulerServer(host, port, threads).serve_forever())
+    except KeyboardInterrupt:
+        pass
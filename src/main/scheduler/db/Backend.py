@@ -0,0 +1,458 @@
+import os
+import re
+import time
+from db.Statements import STATEMENTS
+
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'resources')
+
+
+class DBError(Exception):
+    """
+    Raised for any error reported by the underlying database driver.
+    The driver's original exception is kept as __cause__ and its
+    args are preserved, so db_err.args[0] is still the driver's
+    error code or message.
+    """
+    pass
+
+
+# Objects notified of database activity, see add_observer()
+observers = []
+
+
+def add_observer(observer):
+    """
+    Registers observer to be notified of database activity, e.g. to
+    collect metrics or profile queries. observer must have the methods
+
+        connected(seconds)
+            a connection was checked out of the pool in seconds
+        executed(operation, params, seconds, rowcount)
+            a statement, as written by the caller, ran in seconds
+        fetched(operation, rows)
+            rows rows of operation's result were read
+
+    They are called on the thread doing the work and must be quick.
+    Nothing is timed while no observer is registered.
+    """
+    observers.append(observer)
+
+
+def remove_observer(observer):
+    """
+    Stops notifying observer.
+    """
+    observers.remove(observer)
+
+
+class Cursor:
+    """
+    Thin DB-API cursor wrapper that gives every backend the pymssql
+    calling conventions used throughout the scheduler: '%s'/'%d'
+    placeholders, a bare value for a single parameter, dict rows when
+    created with as_dict=True, and use as a context manager.
+    """
+
+    def __init__(self, backend, cursor, conn=None):
+        self.backend = backend
+        self.cursor = cursor
+        self.conn = conn
+        self.operation = None
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def execute(self, operation, params=None):
+        params = self.backend.params(params)
+        return self._execute(operation, params, self.backend.translate(operation), params)
+
+    def executemany(self, operation, seq_of_params):
+        seq_of_params = [self.backend.params(params) for params in seq_of_params]
+        return self._executemany(operation, seq_of_params, self.backend.translate(operation), seq_of_params)
+
+    def run(self, name, params=None, **fragments):
+        """
+        Executes the named statement of db.Statements, or of the
+        backend's SQL, with params. fragments fill in the statement's
+        {placeholders} other than {limit}. The backend prepares each
+        distinct statement text once, see Backend.prepare().
+        """
+        operation = self.backend.statement(name, **fragments)
+        params = self.backend.params(params)
+        return self._execute(operation, params, *self.backend.prepare(operation, params))
+
+    def run_many(self, name, seq_of_params, **fragments):
+        """
+        Executes the named statement once for each parameter set.
+        """
+        operation = self.backend.statement(name, **fragments)
+        seq_of_params = [self.backend.params(params) for params in seq_of_params]
+        prepared = [self.backend.prepare(operation, params) for params in seq_of_params]
+        if not prepared:
+            return self
+        return self._executemany(operation, seq_of_params, prepared[0][0],
+                                 [driver_params for _, driver_params in prepared])
+
+    def _execute(self, operation, params, driver_operation, driver_params):
+        self.operation = operation
+        if self.conn is not None:
+            self.conn.dirty = True
+        start = time.perf_counter() if observers else None
+        try:
+            self.cursor.execute(driver_operation, driver_params)
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        finally:
+            if start is not None:
+                self._executed(operation, params, start)
+        return self
+
+    def _executemany(self, operation, seq_of_params, driver_operation, driver_seq_of_params):
+        self.operation = operation
+        if self.conn is not None:
+            self.conn.dirty = True
+        start = time.perf_counter() if observers else None
+        try:
+            self.cursor.executemany(driver_operation, driver_seq_of_params)
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        finally:
+            if start is not None:
+                self._executed(operation, seq_of_params, start)
+        return self
+
+    def _executed(self, operation, params, start):
+        seconds = time.perf_counter() - start
+        rowcount = self.cursor.rowcount
+        for observer in observers:
+            observer.executed(operation, params, seconds, rowcount)
+
+    def _fetched(self, rows):
+        for observer in observers:
+            observer.fetched(self.operation, rows)
+
+    def fetchone(self):
+        try:
+            row = self.cursor.fetchone()
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        if observers and row is not None:
+            self._fetched(1)
+        return row
+
+    def fetchmany(self, size=1):
+        try:
+            rows = self.cursor.fetchmany(size)
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        if observers:
+            self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        try:
+            rows = self.cursor.fetchall()
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        if observers:
+            self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self):
+        try:
+            self.cursor.close()
+        except self.backend.Error:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class Connection:
+    """
+    DB-API connection wrapper returned by ConnectionManager. Cursors
+    are created with cursor(as_dict=False) like pymssql.
+
+    dirty is True while statements have run since the last commit or
+    rollback, so the pool only rolls back connections that need it.
+    """
+
+    def __init__(self, backend, conn):
+        self.backend = backend
+        self.conn = conn
+        self.dirty = False
+
+    def cursor(self, as_dict=False):
+        try:
+            return Cursor(self.backend, self.backend.cursor(self.conn, as_dict), self)
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+
+    def commit(self):
+        try:
+            self.conn.commit()
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        self.dirty = False
+
+    def rollback(self):
+        try:
+            self.conn.rollback()
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+        self.dirty = False
+
+    def close(self):
+        try:
+            self.conn.close()
+        except self.backend.Error as db_err:
+            raise DBError(*db_err.args) from db_err
+
+
+class Savepoint:
+    """
+    Connection handed out by ConnectionManager inside
+    ConnectionManager.transaction(). It shares the transaction's
+    connection but scopes its work with a savepoint, so commit() only
+    keeps its statements for the enclosing transaction and rollback()
+    or close() without a commit undoes them without touching the rest
+    of the batch.
+    """
+
+    def __init__(self, conn, name):
+        self.backend = conn.backend
+        self.conn = conn
+        self.name = name
+        self._run('savepoint')
+
+    def _run(self, statement):
+        operation = self.backend.sql(statement)
+        if operation:
+            with self.conn.cursor() as cursor:
+                cursor.execute(operation.format(self.name))
+
+    def cursor(self, as_dict=False):
+        return self.conn.cursor(as_dict)
+
+    def commit(self):
+        # statements after a commit get a fresh savepoint
+        self._run('release_savepoint')
+        self._run('savepoint')
+
+    def rollback(self):
+        self._run('rollback_savepoint')
+
+    def close(self):
+        try:
+            self._run('rollback_savepoint')
+            self._run('release_savepoint')
+        except DBError:
+            # the transaction itself is broken, its commit will fail
+            pass
+
+
+class Backend:
+    """
+    Base class for storage backends. A backend knows how to open a
+    raw driver connection, how to adapt the scheduler's pymssql style
+    SQL and parameters to its driver, which exception type its driver
+    raises and which dialect specific statements it needs.
+
+    Subclasses override SQL with the statements whose text differs
+    from the defaults below.
+    """
+
+    name = None
+    # script that creates the baseline schema
+    schema_path = os.path.join(RESOURCES, 'create.sql')
+    # exception base class raised by the driver
+    Error = Exception
+    # whether one execute() may run a multi-statement batch with variables
+    batch_statements = False
+    # most parameters a single statement may bind
+    max_params = 999
+    # dialect specific statements, looked up by sql(name) before the
+    # shared ones of db.Statements
+    SQL = {
+        'table_exists': "SELECT 1 AS found FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = %s",
+        # returns the generated appointment_id
+        'insert_appointment': """INSERT INTO Appointments (p_username, c_username, vac_name, Time)
+                                 VALUES (%s, %s, %s, %s) RETURNING appointment_id""",
+        # {values} is a list of (%s, %s) rows, existing rows are skipped
+        'insert_availabilities': """INSERT INTO Availabilities (Time, Username)
+                                    SELECT CAST(v.Time AS date), v.Username
+                                    FROM (VALUES {values}) AS v (Time, Username)
+                                    WHERE NOT EXISTS (SELECT 1 FROM Availabilities a
+                                                      WHERE a.Time = CAST(v.Time AS date)
+                                                      AND a.Username = v.Username)""",
+        # {values} is a list of (%s, %d) (vaccine, delta) rows; returns
+        # each changed vaccine's total stock, shards included
+        'change_doses': """UPDATE Vaccines SET Doses = Vaccines.Doses + d.delta
+                           FROM (VALUES {values}) AS d (Name, delta)
+                           WHERE Vaccines.Name = d.Name AND Vaccines.Doses + d.delta >= 0
+                           RETURNING Vaccines.Name, Vaccines.Doses + COALESCE((SELECT SUM(s.Doses) FROM VaccineShards s
+                                                                               WHERE s.Name = Vaccines.Name), 0)""",
+        # used in caregiver assignment orderings (see CaregiverAssignment)
+        'random': "RANDOM()",
+        'last_caregiver': "(SELECT c_username FROM Appointments ORDER BY appointment_id DESC LIMIT 1)",
+        # appended after ORDER BY to return at most %d rows
+        'limit': "LIMIT %d",
+        # returns a row if Appointments.appointment_id is not generated
+        # by the database (created before it was, see migration 0008),
+        # empty if the backend always generates it
+        'legacy_appointment_ids': "",
+        # {0} is the savepoint name, an empty statement is skipped
+        'savepoint': "SAVEPOINT {0}",
+        'rollback_savepoint': "ROLLBACK TO SAVEPOINT {0}",
+        'release_savepoint': "RELEASE SAVEPOINT {0}",
+    }
+
+    def __init__(self):
+        # statement texts by (name, fragments) and their prepared form
+        self._statements = {}
+        self._prepared = {}
+
+    def connect(self):
+        """
+        Opens a new raw driver connection.
+        """
+        raise NotImplementedError
+
+    def cursor(self, conn, as_dict):
+        """
+        Returns a raw driver cursor, producing dict rows if as_dict.
+        """
+        return conn.cursor()
+
+    def translate(self, operation):
+        """
+        Rewrites a statement written with '%s'/'%d' placeholders into
+        the driver's paramstyle.
+        """
+        return operation
+
+    def params(self, params):
+        """
+        Normalizes statement parameters for the driver.
+        """
+        return params
+
+    def sql(self, name):
+        """
+        Returns the dialect specific text of the statement called name.
+        """
+        statement = type(self).SQL.get(name)
+        if statement is None:
+            statement = Backend.SQL.get(name)
+        if statement is None:
+            statement = STATEMENTS[name]
+        return statement
+
+    def statement(self, name, **fragments):
+        """
+        Returns the text of the statement called name with its {limit}
+        clause and the given fragments filled in.
+        """
+        key = (name, tuple(sorted(fragments.items()))) if fragments else name
+        text = self._statements.get(key)
+        if text is None:
+            text = self.sql(name)
+            if '{' in text:
+                text = text.format(limit=self.sql('limit'), **fragments)
+            self._statements[key] = text
+        return text
+
+    def prepare(self, operation, params):
+        """
+        Returns the statement text and parameters to send to the
+        driver for a named statement. The text is translated once and
+        reused, so the driver's per-connection statement cache sees
+        the same text on every call.
+        """
+        prepared = self._prepared.get(operation)
+        if prepared is None:
+            prepared = self._prepared[operation] = self.translate(operation)
+        return prepared, params
+
+    def begin(self, conn):
+        """
+        Explicitly starts a transaction on the wrapped connection conn.
+        Drivers that open a transaction before the first statement,
+        like pymssql, need nothing.
+        """
+        pass
+
+    def run_script(self, conn, script):
+        """
+        Runs a SQL script on the wrapped connection conn as one
+        transaction and commits it. Batches are separated by lines
+        containing only GO.
+        """
+        try:
+            with conn.cursor() as cursor:
+                for batch in re.split(r"^\s*GO\s*$", script, flags=re.MULTILINE | re.IGNORECASE):
+                    if batch.strip():
+                        cursor.execute(batch)
+        except DBError:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def explain(self, conn, operation, params=None):
+        """
+        Returns the steps of the execution plan for a statement
+        without running it.
+
+        Returns
+        -------
+        list of (str, bool)
+            Description of each plan step and whether the step scans
+            a whole table or index.
+        """
+        raise NotImplementedError
+
+    def wrap(self, conn):
+        return Connection(self, conn)
+
+
+def get_backend(name=None):
+    """
+    Returns a new backend instance.
+
+    Parameters
+    ----------
+    name : str, optional
+        'mssql' or 'sqlite'. Defaults to the DBBackend environment
+        variable, or 'mssql' if that is not set.
+
+    Returns
+    -------
+    Backend
+        The backend instance.
+    """
+    if name is None:
+        name = os.getenv("DBBackend", "mssql")
+    name = name.lower()
+    if name == 'mssql':
+        from db.MSSQLBackend import MSSQLBackend
+        return MSSQLBackend()
+    if name == 'sqlite':
+        from db.SQLiteBackend import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(f"Unknown database backend '{name}'")
@@ -1,29 +1,381 @@
-import pymssql
-import os
-
-
-class ConnectionManager:
-
-    def __init__(self):
-        self.server_name = os.getenv("Server")
-        self.db_name = os.getenv("DBName")
-        self.user = os.getenv("UserID")
-        self.password = os.getenv("Password")
-        self.conn = None
-
-    def create_connection(self):
-        try:
-            self.conn = pymssql.connect(server=self.server_name, user=self.user, password=self.password, database=self.db_name)
-        except pymssql.Error as db_err:
-            print("Database Programming Error in SQL connection processing! ")
-            sqlrc = str(db_err.args[0])
-            print("Exception code: " + str(sqlrc))
-        return self.conn
-
-    def close_connection(self):
-        try:
-            self.conn.close()
-        except pymssql.Error as db_err:
-            print("Database Programming Error in SQL connection processing! ")
-            sqlrc = str(db_err.args[0])
-            print("Exception code: " + str(sqlrc))
+import contextlib
+import contextvars
+import itertools
+import os
+import threading
+import time
+from db.Backend import DBError, Savepoint, get_backend, observers
+
+
+# (connection, savepoint counter) of the transaction() block the
+# current context runs in, if any.
+_transaction = contextvars.ContextVar('transaction', default=None)
+
+
+class ConnectionPool:
+    """
+    A thread-safe, bounded pool of database connections.
+
+    Connections are created lazily up to max_size, kept warm down to
+    min_size, evicted once they have been idle for longer than
+    idle_timeout seconds and pinged on checkout if they have not been
+    used for ping_interval seconds.
+
+    Parameters
+    ----------
+    connect : callable
+        Zero argument function returning a new DB-API connection.
+    min_size : int
+        Number of idle connections the pool keeps around.
+    max_size : int
+        Maximum number of connections (idle + checked out).
+    idle_timeout : float
+        Seconds a connection may sit idle before it is closed.
+    ping_interval : float
+        Seconds of inactivity after which a connection is health
+        checked before being handed out.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300.0, ping_interval=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition()
+        self._idle = []  # list of (connection, last_used) pairs, most recent last
+        self._size = 0  # idle + checked out connections
+
+        # stats
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.created = 0
+        self.closed = 0
+
+    def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool, creating one if the pool
+        is not full yet. Blocks while the pool is exhausted.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds to wait for a free connection,
+            by default wait forever.
+
+        Returns
+        -------
+        connection
+            A healthy DB-API connection.
+        """
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._evict_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a database connection")
+                    self._lock.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                if conn is None:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    return None
+                with self._lock:
+                    self.created += 1
+            elif time.monotonic() - last_used > self.ping_interval and not self._ping(conn):
+                self._discard(conn)
+                continue
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+            return conn
+
+    def release(self, conn, discard=False):
+        """
+        Returns a connection to the pool. Uncommitted work is rolled
+        back so the next borrower starts with a clean session; a
+        connection whose work was all committed or rolled back (see
+        Connection.dirty) is reused as is, saving a round-trip.
+
+        Parameters
+        ----------
+        conn : connection
+            A connection previously returned by acquire().
+        discard : bool, optional
+            If True, the connection is closed instead of reused,
+            by default False
+        """
+        if conn is None:
+            return
+        if not discard and getattr(conn, 'dirty', True):
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def close(self):
+        """
+        Closes every idle connection. Checked out connections are
+        closed when they are released.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool counters.
+
+        Returns
+        -------
+        dict
+            checkouts, total/average/max wait time in seconds,
+            connections created and closed, and the current number
+            of idle and in-use connections.
+        """
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_time': self.wait_time,
+                'avg_wait_time': self.wait_time / self.checkouts if self.checkouts else 0.0,
+                'max_wait_time': self.max_wait_time,
+                'created': self.created,
+                'closed': self.closed,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+            }
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.closed += 1
+            self._lock.notify()
+
+    def _evict_idle(self):
+        # caller holds the lock; the oldest idle connections sit at the front
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self.closed += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class ConnectionManager:
+    """
+    Hands out connections from a process wide pool. The storage
+    backend is chosen with the DBBackend environment variable
+    ('mssql' by default, or 'sqlite') or with configure(). Use it
+    either explicitly:
+
+        cm = ConnectionManager()
+        conn = cm.create_connection()
+        ...
+        cm.close_connection()
+
+    or as a context manager, which rolls back on error and always
+    returns the connection to the pool:
+
+        with ConnectionManager() as conn:
+            ...
+            conn.commit()
+
+    Inside a ConnectionManager.transaction() block every
+    ConnectionManager shares the block's connection instead, see
+    transaction().
+    """
+
+    backend = None
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self):
+        self.pool = None
+        self.conn = None
+
+    @classmethod
+    def configure(cls, backend=None, **pool_options):
+        """
+        Replaces the shared backend and pool, closing the idle
+        connections of the previous pool.
+
+        Parameters
+        ----------
+        backend : Backend or str, optional
+            A backend instance or name, by default the DBBackend
+            environment variable.
+        **pool_options
+            Keyword arguments forwarded to ConnectionPool.
+        """
+        if backend is None or isinstance(backend, str):
+            backend = get_backend(backend)
+        with cls._pool_lock:
+            old_pool = cls._pool
+            cls.backend = backend
+            cls._pool = cls._new_pool(backend, **pool_options)
+        if old_pool is not None:
+            old_pool.close()
+
+    @classmethod
+    def get_backend(cls):
+        """
+        Returns the shared backend, creating it on first use.
+        """
+        if cls.backend is None:
+            cls.get_pool()
+        return cls.backend
+
+    @classmethod
+    def get_pool(cls):
+        """
+        Returns the shared connection pool, creating it on first use.
+        Pool sizing is read from the PoolMinSize, PoolMaxSize,
+        PoolIdleTimeout and PoolPingInterval environment variables.
+        """
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    if cls.backend is None:
+                        cls.backend = get_backend()
+                    cls._pool = cls._new_pool(cls.backend)
+        return cls._pool
+
+    @classmethod
+    def _new_pool(cls, backend, **pool_options):
+        def connect():
+            try:
+                return backend.wrap(backend.connect())
+            except backend.Error as db_err:
+                print("Database Programming Error in SQL connection processing! ")
+                sqlrc = str(db_err.args[0])
+                print("Exception code: " + str(sqlrc))
+            return None
+
+        options = {
+            'min_size': int(os.getenv("PoolMinSize", 1)),
+            'max_size': int(os.getenv("PoolMaxSize", 10)),
+            'idle_timeout': float(os.getenv("PoolIdleTimeout", 300)),
+            'ping_interval': float(os.getenv("PoolPingInterval", 30)),
+        }
+        options.update(pool_options)
+        return ConnectionPool(connect, **options)
+
+    @classmethod
+    def pool_stats(cls):
+        """
+        Returns the statistics of the shared pool, see ConnectionPool.stats.
+        """
+        return cls.get_pool().stats()
+
+    @classmethod
+    @contextlib.contextmanager
+    def transaction(cls):
+        """
+        Runs a block of work as a single database transaction, which
+        is committed when the block exits and rolled back if it
+        raises. Code inside the block keeps using ConnectionManager as
+        usual; each instance gets the block's connection wrapped in a
+        Savepoint, so its own commit() and rollback() behave as before
+        without ending the transaction. Nested blocks join the
+        outermost one.
+
+        Raises
+        ------
+        DBError
+            If no connection could be opened or the commit fails.
+        """
+        if _transaction.get() is not None:
+            yield _transaction.get()[0]
+            return
+        manager = cls()
+        conn = manager.__enter__()
+        token = _transaction.set((conn, itertools.count(1)))
+        try:
+            cls.get_backend().begin(conn)
+            yield conn
+            conn.commit()
+        finally:
+            _transaction.reset(token)
+            manager.close_connection()
+
+    def create_connection(self):
+        if self.conn is None:
+            batch = _transaction.get()
+            if batch is not None:
+                conn, savepoints = batch
+                self.conn = Savepoint(conn, f"sp{next(savepoints)}")
+            else:
+                self.pool = self.get_pool()
+                start = time.perf_counter() if observers else None
+                self.conn = self.pool.acquire()
+                if start is not None:
+                    seconds = time.perf_counter() - start
+                    for observer in observers:
+                        observer.connected(seconds)
+        return self.conn
+
+    def close_connection(self):
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        if isinstance(conn, Savepoint):
+            conn.close()
+        else:
+            self.pool.release(conn)
+
+    def __enter__(self):
+        conn = self.create_connection()
+        if conn is None:
+            raise DBError("Could not connect to the database")
+        return conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # release() rolls back anything that was not committed
+        self.close_connection()
+        return False
@@ -0,0 +1,186 @@
+import datetime
+import os
+import re
+from db.Backend import Backend
+
+
+_PHYSICAL_OP = re.compile(r'PhysicalOp="([^"]+)"')
+_SCANS = ('Table Scan', 'Index Scan', 'Clustered Index Scan')
+_PLACEHOLDER = re.compile(r"%[sd]")
+# sp_executesql parameter types by Python type. Strings are varchar
+# like the schema's columns, an nvarchar parameter would make SQL
+# Server convert the column and scan instead of seek.
+_PARAMETER_TYPES = {
+    str: 'varchar(255)',
+    bytes: 'varbinary(8000)',
+    bool: 'bit',
+    int: 'int',
+    float: 'float',
+    datetime.date: 'date',
+    datetime.datetime: 'datetime2',
+    type(None): 'varchar(255)',
+}
+
+
+class MSSQLBackend(Backend):
+    """
+    Microsoft SQL Server / Azure SQL backend using pymssql. The
+    connection settings are read from the Server, DBName, UserID and
+    Password environment variables.
+    """
+
+    name = 'mssql'
+    batch_statements = True
+    max_params = 2000
+    SQL = {
+        'savepoint': "SAVE TRANSACTION {0}",
+        'rollback_savepoint': "ROLLBACK TRANSACTION {0}",
+        # SQL Server savepoints last until the transaction ends
+        'release_savepoint': "",
+        'limit': "OFFSET 0 ROWS FETCH NEXT %d ROWS ONLY",
+        'legacy_appointment_ids': """SELECT 1 AS found FROM sys.columns
+                                     WHERE object_id = OBJECT_ID('Appointments') AND name = 'appointment_id'
+                                     AND is_identity = 0 AND default_object_id = 0""",
+        'random': "NEWID()",
+        'last_caregiver': "(SELECT TOP 1 c_username FROM Appointments ORDER BY appointment_id DESC)",
+        'change_doses': """UPDATE v SET Doses = v.Doses + d.delta
+                           OUTPUT INSERTED.Name, INSERTED.Doses + ISNULL(s.Doses, 0)
+                           FROM Vaccines v JOIN (VALUES {values}) AS d (Name, delta) ON v.Name = d.Name
+                           LEFT JOIN (SELECT Name, SUM(Doses) AS Doses FROM VaccineShards GROUP BY Name) s
+                               ON s.Name = v.Name
+                           WHERE v.Doses + d.delta >= 0""",
+        # skips the shards other transactions are updating, like the
+        # reserve batch
+        'take_shard_doses': """UPDATE TOP (1) VaccineShards WITH (ROWLOCK, READPAST) SET Doses = Doses - %d
+                               WHERE Name = %s AND Doses >= %d""",
+        'insert_appointment': """INSERT INTO Appointments (p_username, c_username, vac_name, Time)
+                                 OUTPUT INSERTED.appointment_id VALUES (%s, %s, %s, %s)""",
+        # parameters: time, vaccine, shard, vaccine, vaccine, vaccine,
+        # vaccine, patient, vaccine; {order} is the caregiver
+        # assignment's ORDER BY clause
+        'reserve_appointment': """
+            SET NOCOUNT ON;
+            DECLARE @time date, @candidate varchar(255), @caregiver varchar(255), @tries int;
+            DECLARE @appointment_id int, @status int, @took int;
+            DECLARE @claimed TABLE (Username varchar(255));
+            DECLARE @inserted TABLE (appointment_id int);
+            SET @time = %s;
+            SET @status = 0;
+            SET @tries = 0;
+            -- the candidate is ranked without locking the date's rows,
+            -- skipping the ones being claimed and reading the load
+            -- counters uncommitted as they only rank; then only that
+            -- row is claimed, and if another reservation took it
+            -- meanwhile the next candidate is tried
+            WHILE @caregiver IS NULL AND @tries < 3
+            BEGIN
+                SET @candidate = NULL;
+                SELECT TOP 1 @candidate = a.Username
+                    FROM Availabilities a WITH (READPAST)
+                    LEFT JOIN CaregiverLoad l WITH (READUNCOMMITTED) ON l.Username = a.Username
+                    WHERE a.Time = @time
+                    ORDER BY {order};
+                IF @candidate IS NULL
+                    BREAK;
+                DELETE FROM Availabilities WITH (ROWLOCK, READPAST)
+                    OUTPUT DELETED.Username INTO @claimed
+                    WHERE Time = @time AND Username = @candidate;
+                SELECT @caregiver = Username FROM @claimed;
+                SET @tries = @tries + 1;
+            END
+            -- after repeated races any free slot of the date is taken
+            IF @caregiver IS NULL AND @candidate IS NOT NULL
+            BEGIN
+                DELETE TOP (1) FROM Availabilities WITH (ROWLOCK, READPAST)
+                    OUTPUT DELETED.Username INTO @claimed
+                    WHERE Time = @time;
+                SELECT @caregiver = Username FROM @claimed;
+            END
+            IF @caregiver IS NULL
+                SET @status = 1;
+            ELSE
+            BEGIN
+                -- the picked shard, then any unlocked shard, then the
+                -- Vaccines row, then waiting for a locked shard
+                UPDATE VaccineShards WITH (ROWLOCK, READPAST) SET Doses = Doses - 1
+                    WHERE Name = %s AND Shard = %d AND Doses >= 1;
+                SET @took = @@ROWCOUNT;
+                IF @took = 0
+                BEGIN
+                    UPDATE TOP (1) VaccineShards WITH (ROWLOCK, READPAST) SET Doses = Doses - 1
+                        WHERE Name = %s AND Doses >= 1;
+                    SET @took = @@ROWCOUNT;
+                END
+                IF @took = 0
+                BEGIN
+                    UPDATE Vaccines SET Doses = Doses - 1 WHERE Name = %s AND Doses >= 1;
+                    SET @took = @@ROWCOUNT;
+                END
+                IF @took = 0
+                BEGIN
+                    UPDATE TOP (1) VaccineShards SET Doses = Doses - 1 WHERE Name = %s AND Doses >= 1;
+                    SET @took = @@ROWCOUNT;
+                END
+                IF @took = 0
+                    SET @status = CASE WHEN EXISTS (SELECT 1 FROM Vaccines WHERE Name = %s) THEN 3 ELSE 2 END;
+                ELSE
+                BEGIN
+                    INSERT INTO Appointments (p_username, c_username, vac_name, Time)
+                        OUTPUT INSERTED.appointment_id INTO @inserted
+                        VALUES (%s, @caregiver, %s, @time);
+                    SELECT @appointment_id = appointment_id FROM @inserted;
+                END
+            END
+            SELECT @status AS status, @caregiver AS caregiver, @appointment_id AS appointment_id;
+        """,
+    }
+
+    def __init__(self):
+        super().__init__()
+        import pymssql
+        self.driver = pymssql
+        self.Error = pymssql.Error
+        self.server_name = os.getenv("Server")
+        self.db_name = os.getenv("DBName")
+        self.user = os.getenv("UserID")
+        self.password = os.getenv("Password")
+
+    def connect(self):
+        return self.driver.connect(server=self.server_name, user=self.user, password=self.password, database=self.db_name)
+
+    def cursor(self, conn, as_dict):
+        return conn.cursor(as_dict=as_dict)
+
+    def prepare(self, operation, params):
+        # pymssql writes parameters into the statement text as
+        # literals, so the server would compile a plan per value.
+        # Named statements are sent through sp_executesql with typed
+        # parameters instead, which caches one plan per statement.
+        if params is None:
+            return operation, params
+        if not isinstance(params, (tuple, list)):
+            params = (params,)
+        types = tuple(_PARAMETER_TYPES.get(type(value), 'sql_variant') for value in params)
+        key = (operation, types)
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            if not params or len(_PLACEHOLDER.findall(operation)) != len(params):
+                prepared = operation
+            else:
+                numbers = iter(range(len(params)))
+                inner = _PLACEHOLDER.sub(lambda match: f"@p{next(numbers)}", operation).replace("'", "''")
+                declarations = ", ".join(f"@p{i} {type}" for i, type in enumerate(types))
+                values = ", ".join(f"@p{i} = %s" for i in range(len(types)))
+                prepared = f"EXEC sp_executesql N'{inner}', N'{declarations}', {values}"
+            self._prepared[key] = prepared
+        return prepared, tuple(params)
+
+    def explain(self, conn, operation, params=None):
+        with conn.cursor() as cursor:
+            cursor.execute("SET SHOWPLAN_XML ON")
+            try:
+                cursor.execute(operation, params)
+                plan = "".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+        return [(op, op in _SCANS) for op in _PHYSICAL_OP.findall(plan)]
@@ -0,0 +1,237 @@
+import argparse
+import os
+import re
+from db.Backend import RESOURCES, DBError
+
+
+MIGRATIONS = os.path.join(RESOURCES, 'migrations')
+
+_MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.(up|down)\.sql$")
+
+# The named statements of db.Statements issued by Scheduler.py and the
+# model classes, with the fragments and sample parameters used by the
+# plan report. 'scan' marks statements that read a whole table by
+# design.
+PLAN_QUERIES = [
+    ("create patient", 'insert_account', {'table': 'Patients'}, ('u', 's', 'h', 1, 'u'), 'seek'),
+    ("create caregiver", 'insert_account', {'table': 'Caregivers'}, ('u', 's', 'h', 1, 'u'), 'seek'),
+    ("login patient", 'account_credentials', {'table': 'Patients'}, ('u',), 'seek'),
+    ("login caregiver", 'account_credentials', {'table': 'Caregivers'}, ('u',), 'seek'),
+    ("caregivers on date", 'caregivers_on_date', {}, ('2022-01-01',), 'seek'),
+    ("reserve slot (least loaded)", 'select_caregiver', {'order': "COALESCE(l.Appointments, 0), a.Username"},
+     ('2022-01-01', 1), 'seek'),
+    ("remove availability", 'delete_availability', {}, ('2022-01-01', 'u'), 'seek'),
+    ("availability calendar", 'availability_calendar', {}, ('0001-01-01', '9999-12-31', 10), 'seek'),
+    ("vaccine", 'vaccine_stock', {}, ('v',), 'seek'),
+    ("take shard dose", 'take_shard_dose', {}, ('v', 0), 'seek'),
+    ("take dose", 'take_vaccine_dose', {}, ('v',), 'seek'),
+    ("vaccine list", 'all_vaccine_stock', {}, (), 'scan'),
+    ("caregiver appointments", 'caregiver_appointments', {}, ('u', 0, 10), 'seek'),
+    ("patient appointments", 'patient_appointments', {}, ('u', 0, 10), 'seek'),
+    ("cancel lookup (caregiver)", 'caregiver_appointment', {}, (1, 'u'), 'seek'),
+    ("cancel lookup (patient)", 'patient_appointment', {}, (1, 'u'), 'seek'),
+    ("delete appointment", 'delete_appointment', {}, (1,), 'seek'),
+]
+
+
+class Migration:
+    def __init__(self, version, name, up_path=None, down_path=None):
+        self.version = version
+        self.name = name
+        self.up_path = up_path
+        self.down_path = down_path
+
+    def script(self, direction):
+        path = self.up_path if direction == 'up' else self.down_path
+        if path is None:
+            raise ValueError(f"Migration {self.version} ({self.name}) has no {direction} script")
+        with open(path) as f:
+            return f.read()
+
+
+class MigrationRunner:
+    """
+    Applies and rolls back versioned schema migrations.
+
+    Migrations live in resources/migrations/<backend>/ as
+    NNNN_name.up.sql and NNNN_name.down.sql. Version 1 is the baseline
+    schema, whose up script is the backend's create script
+    (create.sql for SQL Server). The applied versions are recorded in
+    the SchemaVersion table; a database created from create.sql before
+    the table existed is treated as being at version 1; if its
+    appointment ids predate IDENTITY, migration 0008 gives them a
+    database generated default (see legacy_appointment_ids()).
+
+    Parameters
+    ----------
+    backend : Backend
+        The backend whose dialect directory is used.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.directory = os.path.join(MIGRATIONS, backend.name)
+
+    def migrations(self):
+        """
+        Returns the available migrations sorted by version.
+        """
+        found = {1: Migration(1, 'baseline', up_path=self.backend.schema_path)}
+        for filename in os.listdir(self.directory):
+            match = _MIGRATION_FILE.match(filename)
+            if match is None:
+                continue
+            version = int(match.group(1))
+            migration = found.setdefault(version, Migration(version, match.group(2)))
+            setattr(migration, match.group(3) + '_path', os.path.join(self.directory, filename))
+        return [found[version] for version in sorted(found)]
+
+    def current_version(self, conn):
+        """
+        Returns the schema version of the database, 0 if it is empty.
+        """
+        with conn.cursor(as_dict=True) as cursor:
+            exists = self.backend.sql('table_exists')
+            cursor.execute(exists, 'SchemaVersion')
+            if cursor.fetchone() is not None:
+                cursor.execute("SELECT MAX(Version) AS version FROM SchemaVersion")
+                return cursor.fetchone()['version'] or 0
+            cursor.execute(exists, 'Caregivers')
+            return 1 if cursor.fetchone() is not None else 0
+
+    def legacy_appointment_ids(self, conn):
+        """
+        Returns True if Appointments.appointment_id is not generated by
+        the database, which makes every reservation fail until
+        migration 0008 is applied.
+        """
+        check = self.backend.sql('legacy_appointment_ids')
+        if not check:
+            return False
+        with conn.cursor() as cursor:
+            cursor.execute(check)
+            return cursor.fetchone() is not None
+
+    def _warn_legacy_appointment_ids(self, conn):
+        if self.legacy_appointment_ids(conn):
+            print("Appointments.appointment_id is not generated by the database, "
+                  "reservations fail until migration 0008 is applied")
+
+    def upgrade(self, conn, target=None, verbose=True):
+        """
+        Applies every migration above the current version up to and
+        including target (the latest version by default). Each
+        migration runs in its own transaction together with its
+        SchemaVersion record.
+        """
+        current = self._ensure_version_table(conn)
+        for migration in self.migrations():
+            if migration.version <= current or (target is not None and migration.version > target):
+                continue
+            record = (f"INSERT INTO SchemaVersion (Version, Name, AppliedAt) "
+                      f"VALUES ({migration.version}, '{migration.name}', CURRENT_TIMESTAMP);")
+            self.backend.run_script(conn, migration.script('up') + "\n" + record)
+            current = migration.version
+            if verbose:
+                print(f"Applied {migration.version:04d}_{migration.name}")
+        if verbose:
+            self._warn_legacy_appointment_ids(conn)
+        return current
+
+    def downgrade(self, conn, target, verbose=True):
+        """
+        Rolls back every applied migration above target, newest first.
+        """
+        current = self._ensure_version_table(conn)
+        for migration in reversed(self.migrations()):
+            if migration.version > current or migration.version <= target:
+                continue
+            record = f"DELETE FROM SchemaVersion WHERE Version = {migration.version};"
+            self.backend.run_script(conn, migration.script('down') + "\n" + record)
+            current = migration.version - 1
+            if verbose:
+                print(f"Rolled back {migration.version:04d}_{migration.name}")
+        return current
+
+    def status(self, conn):
+        """
+        Prints every migration and whether it has been applied.
+        """
+        current = self.current_version(conn)
+        for migration in self.migrations():
+            state = 'applied' if migration.version <= current else 'pending'
+            print(f"{migration.version:04d}_{migration.name}: {state}")
+        self._warn_legacy_appointment_ids(conn)
+
+    def plan_report(self, conn, queries=PLAN_QUERIES):
+        """
+        Captures the execution plan of each query and prints whether
+        it is served by a seek or scans a table.
+
+        Returns
+        -------
+        bool
+            True if every query expected to seek does.
+        """
+        ok = True
+        for name, statement, fragments, params, expected in queries:
+            steps = self.backend.explain(conn, self.backend.statement(statement, **fragments), params)
+            scans = any(is_scan for _, is_scan in steps)
+            if scans and expected == 'seek':
+                verdict = 'SCAN (expected seek)'
+                ok = False
+            elif scans:
+                verdict = 'scan (full read by design)'
+            else:
+                verdict = 'seek'
+            print(f"{name}: {verdict}")
+            for step, _ in steps:
+                print(f"    {step}")
+        return ok
+
+    def _ensure_version_table(self, conn):
+        current = self.current_version(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(self.backend.sql('table_exists'), 'SchemaVersion')
+            if cursor.fetchone() is None:
+                script = "CREATE TABLE SchemaVersion (Version int PRIMARY KEY, Name varchar(255), AppliedAt datetime);"
+                if current == 1:
+                    script += ("\nINSERT INTO SchemaVersion (Version, Name, AppliedAt) "
+                               "VALUES (1, 'baseline', CURRENT_TIMESTAMP);")
+                self.backend.run_script(conn, script)
+        return current
+
+
+def main(argv=None):
+    from db.ConnectionManager import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Manage the scheduler database schema.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="list migrations and whether they are applied")
+    upgrade = commands.add_parser('upgrade', help="apply pending migrations")
+    upgrade.add_argument('version', type=int, nargs='?', help="target version, latest by default")
+    downgrade = commands.add_parser('downgrade', help="roll back migrations")
+    downgrade.add_argument('version', type=int, help="target version")
+    commands.add_parser('explain', help="report whether each scheduler query seeks or scans")
+    args = parser.parse_args(argv)
+
+    runner = MigrationRunner(ConnectionManager.get_backend())
+    try:
+        with ConnectionManager() as conn:
+            if args.command == 'status':
+                runner.status(conn)
+            elif args.command == 'upgrade':
+                print(f"Schema at version {runner.upgrade(conn, args.version)}")
+            elif args.command == 'downgrade':
+                print(f"Schema at version {runner.downgrade(conn, args.version)}")
+            elif not runner.plan_report(conn):
+                return 1
+    except DBError as db_err:
+        print("Migration failed")
+        print("Exception code: " + str(db_err.args[0]))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+import datetime
+import functools
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import weakref
+from db.Backend import Backend, DBError, RESOURCES
+
+# All date columns in the schema are DATE, so datetimes are stored by day.
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.date().isoformat())
+sqlite3.register_converter("date", lambda b: datetime.date.fromisoformat(b.decode()))
+
+_PLACEHOLDER = re.compile(r"%[sd]")
+
+
+def _dict_row(cursor, row):
+    return {col[0]: val for col, val in zip(cursor.description, row)}
+
+
+@functools.lru_cache(maxsize=256)
+def _translate(operation):
+    return _PLACEHOLDER.sub("?", operation)
+
+
+class SQLiteBackend(Backend):
+    """
+    Embedded SQLite backend, used for local development, benchmarks
+    and CI. The database file is taken from the DBName environment
+    variable; when it is unset or ':memory:' a throwaway database is
+    created in a temporary directory, which is removed once the
+    backend is no longer used. It runs in WAL mode, so readers and
+    writers on different connections do not block each other. An
+    empty database is migrated to the latest schema version on first
+    connection.
+    """
+
+    name = 'sqlite'
+    schema_path = os.path.join(RESOURCES, 'create_sqlite.sql')
+    Error = sqlite3.Error
+    SQL = {
+        'table_exists': "SELECT 1 AS found FROM sqlite_master WHERE type = 'table' AND name = %s",
+        # VALUES columns are named column1, column2, ... in SQLite
+        'change_doses': """UPDATE Vaccines SET Doses = Doses + d.column2
+                           FROM (VALUES {values}) AS d
+                           WHERE Vaccines.Name = d.column1 AND Vaccines.Doses + d.column2 >= 0
+                           RETURNING Name, Doses + (SELECT COALESCE(SUM(s.Doses), 0) FROM VaccineShards s
+                                                    WHERE s.Name = Vaccines.Name)""",
+        'take_shard_doses': """UPDATE VaccineShards SET Doses = Doses - %d
+                               WHERE rowid = (SELECT rowid FROM VaccineShards WHERE Name = %s AND Doses >= %d LIMIT 1)""",
+        'insert_availabilities': "INSERT OR IGNORE INTO Availabilities (Time, Username) VALUES {values}",
+    }
+
+    # compiled statements kept per connection, enough for every named
+    # statement and the chunk sizes of the multi-row inserts
+    statement_cache_size = 256
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        super().__init__()
+        if path is None:
+            path = os.getenv("DBName") or ":memory:"
+        self.temporary = path == ":memory:"
+        if self.temporary:
+            # Connections to a shared-cache in-memory database fail with
+            # SQLITE_LOCKED under concurrent writes, which busy_timeout
+            # does not retry, so every backend gets its own temporary file
+            directory = tempfile.mkdtemp(prefix="scheduler")
+            weakref.finalize(self, shutil.rmtree, directory, True)
+            path = os.path.join(directory, "scheduler.db")
+        self.path = path
+        self.initialized = False
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False, cached_statements=SQLiteBackend.statement_cache_size)
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.temporary:
+            # a throwaway database need not survive a crash
+            conn.execute("PRAGMA synchronous = OFF")
+        if not self.initialized:
+            with SQLiteBackend._lock:
+                if not self.initialized:
+                    if self.temporary:
+                        conn.execute("PRAGMA journal_mode = WAL")
+                    self.create_schema(conn)
+                    self.initialized = True
+        return conn
+
+    def create_schema(self, conn):
+        """
+        Migrates an empty database to the latest schema version.
+        Existing databases are left alone, use db.MigrationRunner.
+        """
+        from db.MigrationRunner import MigrationRunner
+        runner = MigrationRunner(self)
+        conn = self.wrap(conn)
+        if runner.current_version(conn) == 0:
+            runner.upgrade(conn, verbose=False)
+
+    def cursor(self, conn, as_dict):
+        cursor = conn.cursor()
+        if as_dict:
+            cursor.row_factory = _dict_row
+        return cursor
+
+    def translate(self, operation):
+        return _translate(operation)
+
+    def params(self, params):
+        if params is None:
+            return ()
+        if isinstance(params, (tuple, list, dict)):
+            return params
+        return (params,)
+
+    def begin(self, conn):
+        # sqlite3 only begins implicitly before DML, and releasing the
+        # outermost savepoint outside a transaction would commit
+        if not conn.conn.in_transaction:
+            try:
+                conn.conn.execute("BEGIN")
+            except sqlite3.Error as db_err:
+                raise DBError(*db_err.args) from db_err
+
+    def run_script(self, conn, script):
+        # executescript() commits first, so wrap the script in a transaction
+        try:
+            conn.conn.executescript("BEGIN;\n" + script + "\n;COMMIT;")
+        except sqlite3.Error as db_err:
+            conn.conn.rollback()
+            raise DBError(*db_err.args) from db_err
+
+    def explain(self, conn, operation, params=None):
+        with conn.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + operation, params)
+            steps = [row[3] for row in cursor.fetchall()]
+        return [(step, step.startswith("SCAN ") and step != "SCAN CONSTANT ROW") for step in steps]
@@ -0,0 +1,75 @@
+# Named statements run with Cursor.run(name, params). Every value is
+# a '%s'/'%d' parameter, never part of the text, so each statement has
+# one text the backends can prepare once per connection and the server
+# can cache one plan for. {limit} is the backend's 'limit' clause and
+# other {fragments} are passed to Cursor.run. Statements whose text
+# differs between databases are in the backends' SQL instead.
+STATEMENTS = {
+    # accounts; {table} is Patients or Caregivers
+    'account_credentials': "SELECT Salt, Hash, HashVersion, LowercasedPassword FROM {table} WHERE Username = %s",
+    # parameters: username, salt, hash, version, username. Inserts
+    # nothing if the username is taken.
+    'insert_account': """INSERT INTO {table} (Username, Salt, Hash, HashVersion) SELECT %s, %s, %s, %d
+                         WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE Username = %s)""",
+    # {names} is a list of %s
+    'existing_accounts': "SELECT Username FROM {table} WHERE Username IN ({names})",
+    # {values} is a list of (%s, %s, %s, %d)
+    'insert_accounts': "INSERT INTO {table} (Username, Salt, Hash, HashVersion) VALUES {values}",
+    # parameters: salt, hash, version, username, old version
+    'rehash_account': """UPDATE {table} SET Salt = %s, Hash = %s, HashVersion = %d
+                         WHERE Username = %s AND HashVersion = %d""",
+
+    # availabilities
+    'insert_availability': "INSERT INTO Availabilities (Time, Username) VALUES (%s, %s)",
+    'delete_availability': "DELETE FROM Availabilities WHERE Time = %s AND Username = %s",
+    'caregivers_on_date': "SELECT Username FROM Availabilities WHERE Time = %s ORDER BY Username",
+    # parameters: first date, last date, number of rows
+    'availability_calendar': """SELECT Time, Slots FROM AvailabilityCalendar
+                                WHERE Time >= %s AND Time <= %s ORDER BY Time ASC {limit}""",
+    # parameters: date, number of rows; {order} ranks the candidates,
+    # see CaregiverAssignment
+    'select_caregiver': """SELECT a.Username FROM Availabilities a
+                           LEFT JOIN CaregiverLoad l ON l.Username = a.Username
+                           WHERE a.Time = %s ORDER BY {order} {limit}""",
+
+    # vaccines
+    'vaccine_exists': "SELECT 1 AS found FROM Vaccines WHERE Name = %s",
+    'insert_vaccine': "INSERT INTO Vaccines (Name, Doses) VALUES (%s, %d)",
+    'vaccine_stock': "SELECT Name, Doses FROM VaccineStock WHERE Name = %s",
+    'all_vaccine_stock': "SELECT Name, Doses FROM VaccineStock ORDER BY Name",
+    # {names} is a list of %s
+    'vaccine_stock_in': "SELECT Name, Doses FROM VaccineStock WHERE Name IN ({names})",
+    'vaccine_row_doses': "SELECT Doses FROM Vaccines WHERE Name = %s",
+    'take_vaccine_dose': "UPDATE Vaccines SET Doses = Doses - 1 WHERE Name = %s AND Doses >= 1",
+    # parameters: doses, vaccine, doses
+    'take_vaccine_doses': "UPDATE Vaccines SET Doses = Doses - %d WHERE Name = %s AND Doses >= %d",
+    'take_shard_dose': "UPDATE VaccineShards SET Doses = Doses - 1 WHERE Name = %s AND Shard = %d AND Doses >= 1",
+    # parameters: vaccine, vaccine
+    'take_any_shard_dose': """UPDATE VaccineShards SET Doses = Doses - 1
+                              WHERE Name = %s AND Shard = (SELECT MIN(Shard) FROM VaccineShards
+                                                           WHERE Name = %s AND Doses >= 1)""",
+    # take_shard_doses (parameters: doses, vaccine, doses) takes the
+    # doses from one shard that has enough, see the backends' SQL
+    'vaccine_shard_doses': "SELECT Shard, Doses FROM VaccineShards WHERE Name = %s AND Doses > 0 ORDER BY Shard",
+    # parameters: doses, vaccine, shard, doses
+    'take_from_shard': "UPDATE VaccineShards SET Doses = Doses - %d WHERE Name = %s AND Shard = %d AND Doses >= %d",
+    # parameters: vaccine, shard, vaccine, shard
+    'insert_shard': """INSERT INTO VaccineShards (Name, Shard, Doses) SELECT %s, %d, 0
+                       WHERE NOT EXISTS (SELECT 1 FROM VaccineShards WHERE Name = %s AND Shard = %d)""",
+    # parameters: doses, vaccine, shard
+    'add_to_shard': "UPDATE VaccineShards SET Doses = Doses + %d WHERE Name = %s AND Shard = %d",
+
+    # appointments
+    'caregiver_appointment': """SELECT c_username, Time, vac_name FROM Appointments
+                                WHERE appointment_id = %s AND c_username = %s""",
+    'patient_appointment': """SELECT c_username, Time, vac_name FROM Appointments
+                              WHERE appointment_id = %s AND p_username = %s""",
+    'delete_appointment': "DELETE FROM Appointments WHERE appointment_id = %s",
+    # parameters: username, last appointment id seen, number of rows
+    'caregiver_appointments': """SELECT appointment_id, p_username, vac_name, Time FROM Appointments
+                                 WHERE c_username = %s AND appointment_id > %s
+                                 ORDER BY appointment_id {limit}""",
+    'patient_appointments': """SELECT appointment_id, c_username, vac_name, Time FROM Appointments
+                               WHERE p_username = %s AND appointment_id > %s
+                               ORDER BY appointment_id {limit}""",
+}
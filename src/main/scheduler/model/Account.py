@@ -0,0 +1,227 @@
+import sys
+sys.path.append("../util/*")
+sys.path.append("../db/*")
+from util.Util import Util
+from util.HashService import HashService
+from db.ConnectionManager import ConnectionManager
+from db.Backend import DBError
+
+
+class Account:
+    """
+    The login account of a user, stored in the table of its subclass.
+    Patient and Caregiver only differ in that table, so creating,
+    logging in and re-hashing go through the methods below for both.
+
+    Subclasses set table, the name of their table, and
+    credential_cache, the CredentialCache of their recently verified
+    logins.
+    """
+    table = None
+    credential_cache = None
+
+    def __init__(self, username, password=None, salt=None, hash=None, hash_version=None):
+        self.username = username
+        self.password = password
+        self.salt = salt
+        self.hash = hash
+        if hash_version is None and hash is not None:
+            hash_version = Util.current_hash_version()
+        self.hash_version = hash_version
+
+    # getters
+    def get(self):
+        """
+        Get the account that matches the Username, if the password
+        verifies against its Salt and Hash.
+
+        Returns
+        -------
+        Account
+            self with its salt and hash filled in, or None if the
+            username does not exist or the password is wrong.
+        """
+        cached = self.credential_cache.get(self.username, self.password)
+        if cached is not None:
+            self.salt, self.hash, self.hash_version = cached
+            return self
+
+        try:
+            with ConnectionManager() as conn:
+                cursor = conn.cursor(as_dict=True)
+                cursor.run('account_credentials', self.username, table=self.table)
+                row = cursor.fetchone()
+        except DBError:
+            print(f"Error occurred when getting {self.table}")
+            return None
+
+        if row is None:
+            return None
+        curr_salt = row['Salt']
+        curr_hash = row['Hash'] # stored hash
+        curr_version = row['HashVersion']
+        # hashes stored before passwords became case-sensitive are of
+        # the lowercased password; they keep accepting it in any case
+        # and are re-hashed lowercased, as the password's case is unknown
+        password = self.password.lower() if row['LowercasedPassword'] else self.password
+        if not HashService.shared().verify_hash(password, curr_salt, curr_hash, curr_version):
+            return None
+        self.salt = curr_salt
+        self.hash = curr_hash
+        self.hash_version = curr_version
+        if curr_version != Util.current_hash_version():
+            self.rehash(password)
+        self.credential_cache.put(self.username, self.password, self.salt, self.hash, self.hash_version)
+        return self
+
+    def rehash(self, password=None):
+        """
+        Re-hashes the verified password, or the given form of it, with
+        the current hashing scheme and a new salt, and stores it in the
+        account's table.
+        """
+        salt = Util.generate_salt()
+        version = Util.current_hash_version()
+        hash = HashService.shared().generate_hash(self.password if password is None else password, salt, version)
+        try:
+            with ConnectionManager() as conn:
+                cursor = conn.cursor()
+                cursor.run('rehash_account', (salt, hash, version, self.username, self.hash_version),
+                           table=self.table)
+                conn.commit()
+        except DBError:
+            print("Error occurred when upgrading the password hash")
+            return
+        self.salt = salt
+        self.hash = hash
+        self.hash_version = version
+
+    def get_username(self):
+        """
+        Returns the username of the account.
+
+        Returns
+        -------
+        str
+            The username
+        """
+        return self.username
+
+    def get_salt(self):
+        """
+        Returns the salt of the account.
+
+        Returns
+        -------
+        str
+            The salt
+        """
+        return self.salt
+
+    def get_hash(self):
+        """
+        Returns the hash of the account.
+
+        Returns
+        -------
+        str
+            The hash
+        """
+        return self.hash
+
+    def save_to_db(self):
+        """
+        Saves the account into its table unless the username is
+        taken. The check and the insert are one statement, so creating
+        an account is a single round-trip.
+
+        Returns
+        -------
+        bool
+            True if the account was created, False if the username is
+            taken, None if the database reported an error.
+        """
+        try:
+            with ConnectionManager() as conn:
+                cursor = conn.cursor()
+                cursor.run('insert_account', (self.username, self.salt, self.hash, self.hash_version, self.username),
+                           table=self.table)
+                created = cursor.rowcount == 1
+                # you must call commit() to persist your data if you don't set autocommit to True
+                conn.commit()
+            return created
+        except DBError as db_err:
+            print(f"Error occurred when inserting {self.table}")
+            sqlrc = str(db_err.args[0])
+            print("Exception code: " + str(sqlrc))
+            return None
+
+    @classmethod
+    def taken(cls, usernames):
+        """
+        Returns the usernames of the list that already have an account.
+
+        Raises
+        ------
+        DBError
+            If the database reports an error.
+        """
+        usernames = list(usernames)
+        chunk = ConnectionManager.get_backend().max_params
+        taken = set()
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                for start in range(0, len(usernames), chunk):
+                    names = usernames[start:start + chunk]
+                    cursor.run('existing_accounts', tuple(names), table=cls.table,
+                               names=", ".join(["%s"] * len(names)))
+                    taken.update(username for username, in cursor.fetchall())
+        return taken
+
+    @classmethod
+    def save_all(cls, accounts):
+        """
+        Saves many accounts with multi-row inserts in one transaction.
+        If a username was taken meanwhile the transaction is retried
+        one account at a time, skipping the taken ones.
+
+        Parameters
+        ----------
+        accounts : list of Account
+            Accounts with their salt and hash set, and distinct
+            usernames.
+
+        Returns
+        -------
+        set of str
+            The usernames of the accounts created.
+
+        Raises
+        ------
+        DBError
+            If the database reports an error.
+        """
+        chunk = ConnectionManager.get_backend().max_params // 4
+        with ConnectionManager() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    for start in range(0, len(accounts), chunk):
+                        rows = accounts[start:start + chunk]
+                        params = tuple(value for account in rows
+                                       for value in (account.username, account.salt, account.hash,
+                                                     account.hash_version))
+                        cursor.run('insert_accounts', params, table=cls.table,
+                                   values=", ".join(["(%s, %s, %s, %d)"] * len(rows)))
+                conn.commit()
+                return {account.username for account in accounts}
+            except DBError:
+                conn.rollback()
+            created = set()
+            with conn.cursor() as cursor:
+                for account in accounts:
+                    cursor.run('insert_account', (account.username, account.salt, account.hash,
+                                                  account.hash_version, account.username), table=cls.table)
+                    if cursor.rowcount == 1:
+                        created.add(account.username)
+            conn.commit()
+            return created
@@ -0,0 +1,95 @@
+import sys
+sys.path.append("../db/*")
+from db.ConnectionManager import ConnectionManager
+from model.CaregiverAssignment import CaregiverAssignment
+from model.DoseAllocator import DoseAllocator
+from model.Vaccine import Vaccine
+
+
+class Appointment:
+    # reserve() status codes
+    RESERVED = 0
+    NO_CAREGIVER = 1
+    NO_VACCINE = 2
+    NO_DOSES = 3
+
+    def __init__(self, patient, time, vaccine_name, caregiver=None, appointment_id=None):
+        self.patient = patient
+        self.time = time
+        self.vaccine_name = vaccine_name
+        self.caregiver = caregiver
+        self.appointment_id = appointment_id
+
+    def reserve(self):
+        """
+        Books the appointment in a single transaction: claims a free
+        caregiver slot on self.time, chosen by the CaregiverAssignment
+        strategy, takes one dose of the vaccine and inserts the
+        appointment. Either all three happen or none do.
+
+        On SQL Server this is one statement batch. The slot is ranked
+        without locks and only the chosen row is claimed, with READPAST,
+        so concurrent reservers for the same date skip each other's
+        claimed rows instead of queueing behind them, and the dose
+        comes from one of the vaccine's shards (see DoseAllocator) for
+        the same reason.
+
+        Returns
+        -------
+        int
+            One of Appointment.RESERVED, NO_CAREGIVER, NO_VACCINE or
+            NO_DOSES. On success self.caregiver and self.appointment_id
+            are set.
+
+        Raises
+        ------
+        DBError
+            If the database reports an error, the transaction is
+            rolled back.
+        """
+        backend = ConnectionManager.get_backend()
+        with ConnectionManager() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                if backend.batch_statements:
+                    vaccine = self.vaccine_name
+                    order = CaregiverAssignment.shared().order_by(backend)
+                    cursor.run('reserve_appointment',
+                               (self.time, vaccine, DoseAllocator.shared().pick(), vaccine, vaccine, vaccine,
+                                vaccine, self.patient, vaccine), order=order)
+                    row = cursor.fetchone()
+                    status = row['status']
+                    caregiver = row['caregiver']
+                    appointment_id = row['appointment_id']
+                else:
+                    status, caregiver, appointment_id = self._reserve_statements(cursor)
+            if status != Appointment.RESERVED:
+                conn.rollback()
+                return status
+            conn.commit()
+        Vaccine.inventory.invalidate(self.vaccine_name)
+        self.caregiver = caregiver
+        self.appointment_id = appointment_id
+        return status
+
+    def _reserve_statements(self, cursor):
+        # Statement by statement version of the reserve batch for backends
+        # without multi-statement batches. The dose update comes first so
+        # the transaction holds the write lock before a slot is chosen.
+        took_dose = DoseAllocator.shared().take_dose(cursor, self.vaccine_name)
+
+        order = CaregiverAssignment.shared().order_by(ConnectionManager.get_backend())
+        cursor.run('select_caregiver', (self.time, 1), order=order)
+        row = cursor.fetchone()
+        if row is None:
+            return Appointment.NO_CAREGIVER, None, None
+        caregiver = row['Username']
+        if not took_dose:
+            cursor.run('vaccine_exists', self.vaccine_name)
+            if cursor.fetchone() is None:
+                return Appointment.NO_VACCINE, None, None
+            return Appointment.NO_DOSES, None, None
+
+        cursor.run('delete_availability', (self.time, caregiver))
+        cursor.run('insert_appointment', (self.patient, caregiver, self.vaccine_name, self.time))
+        appointment_id = cursor.fetchone()['appointment_id']
+        return Appointment.RESERVED, caregiver, appointment_id
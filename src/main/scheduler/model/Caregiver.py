@@ -1,136 +1,50 @@
 import sys
 sys.path.append("../util/*")
 sys.path.append("../db/*")
-from util.Util import Util
+from util.CredentialCache import CredentialCache
 from db.ConnectionManager import ConnectionManager
-import pymssql
+from db.Backend import DBError
+from model.Account import Account
 
 
-class Caregiver:
-    def __init__(self, username, password=None, salt=None, hash=None):
-        self.username = username
-        self.password = password
-        self.salt = salt
-        self.hash = hash
+class Caregiver(Account):
+    table = 'Caregivers'
+    # recently verified logins, shared by all Caregiver objects
+    credential_cache = CredentialCache()
 
-    # getters
-    def get(self):
+    def upload_availabilities(self, dates):
         """
-        Get the caregiver with that matches the Username and
-        Salt and Hash
-        
+        Uploads many availabilities of the Caregiver at once, skipping
+        the dates that are already in the Availabilities table. The
+        rows are sent in as few multi-row inserts as the backend's
+        parameter limit allows, in one transaction.
+
         Parameters
         ----------
-        self : Caregiver object
-            fields:
-                - username
-                - password
-                - salt
-                - hash
-        """
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor(as_dict=True)
-
-        get_caregiver_details = "SELECT Salt, Hash FROM Caregivers WHERE Username = %s"
-        try:
-            cursor.execute(get_caregiver_details, self.username)
-            for row in cursor:
-                curr_salt = row['Salt']
-                curr_hash = row['Hash'] # stored hash
-                calculated_hash = Util.generate_hash(self.password, curr_salt)
-                if not curr_hash == calculated_hash:
-                    cm.close_connection()
-                    return None
-                else:
-                    self.salt = curr_salt
-                    self.hash = calculated_hash
-                    return self
-        except pymssql.Error:
-            print("Error occurred when getting Caregivers")
-            cm.close_connection()
-
-        cm.close_connection()
-        return None
-
-    def get_username(self):
-        """
-        Returns the username of the caregiver
-        object.
-
-        Returns
-        -------
-        str
-            The caregiver username
-        """
-        return self.username
-
-    def get_salt(self):
-        """
-        Returns the salt of the caregiver
-        object.
+        dates : iterable of datetime.date
+            The available dates.
 
         Returns
         -------
-        str
-            The caregiver salt
-        """
-        return self.salt
-
-    def get_hash(self):
+        int
+            The number of availabilities added, or None if the upload
+            failed.
         """
-        Returns the hash of the caregiver
-        object.
-
-        Returns
-        -------
-        str
-            The caregiver hash
-        """
-        return self.hash
-
-    def save_to_db(self):
-        """
-        Saves the current caregiver object into
-        the Caregivers table in the database.
-        """
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor()
-
-        add_caregivers = "INSERT INTO Caregivers VALUES (%s, %s, %s)"
-        try:
-            cursor.execute(add_caregivers, (self.username, self.salt, self.hash))
-            # you must call commit() to persist your data if you don't set autocommit to True
-            conn.commit()
-        except pymssql.Error as db_err:
-            print("Error occurred when inserting Caregivers")
-            sqlrc = str(db_err.args[0])
-            print("Exception code: " + str(sqlrc))
-            cm.close_connection()
-        cm.close_connection()
-
-    # Insert availability with parameter date d
-    def upload_availability(self, d):
-        """
-        Uploads the availability of the Caregiver
-        into the Availabilities Table in the database.
-
-        Parameters
-        ----------
-        d : str
-            Date time string of the format 'yyyy-mm-dd'.
-        """
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor()
-
-        add_availability = "INSERT INTO Availabilities VALUES (%s , %s)"
+        dates = sorted(set(dates))
         try:
-            cursor.execute(add_availability, (d, self.username))
-            # you must call commit() to persist your data if you don't set autocommit to True
-            conn.commit()
-        except pymssql.Error:
+            with ConnectionManager() as conn:
+                backend = ConnectionManager.get_backend()
+                chunk = backend.max_params // 2
+                added = 0
+                with conn.cursor() as cursor:
+                    for start in range(0, len(dates), chunk):
+                        rows = dates[start:start + chunk]
+                        values = ", ".join(["(%s, %s)"] * len(rows))
+                        params = tuple(value for d in rows for value in (d, self.username))
+                        cursor.run('insert_availabilities', params, values=values)
+                        added += cursor.rowcount
+                conn.commit()
+            return added
+        except DBError:
             print("Error occurred when updating caregiver availability")
-            cm.close_connection()
-        cm.close_connection()
+            return None
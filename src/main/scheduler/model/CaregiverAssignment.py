@@ -0,0 +1,86 @@
+import os
+import threading
+
+
+class CaregiverAssignment:
+    """
+    Decides which of the caregivers available on a date gets a new
+    appointment. The choice is made by the database: reserve() selects
+    the first row of the date's availabilities in the strategy's order,
+    skipping rows other reservations are claiming, and then claims
+    that row alone, so the candidates are never sent to the
+    application.
+
+    Strategies
+    ----------
+    first
+        The caregiver with the smallest username.
+    least_loaded
+        The caregiver with the fewest appointments, from the
+        CaregiverLoad counters maintained by the database.
+    random
+        A random available caregiver.
+    round_robin
+        The caregiver after, by username, the one who received the
+        latest appointment, wrapping around, so consecutive bookings
+        rotate through the caregivers.
+
+    Parameters
+    ----------
+    strategy : str, optional
+        A key of STRATEGIES. Defaults to the CaregiverAssignment
+        environment variable, or 'least_loaded'.
+    """
+
+    # ORDER BY clause of each strategy over Availabilities a LEFT JOIN
+    # CaregiverLoad l; {random} and {last_caregiver} are replaced with
+    # the backend's statements of the same name
+    STRATEGIES = {
+        'first': "a.Username",
+        'least_loaded': "COALESCE(l.Appointments, 0), a.Username",
+        'random': "{random}",
+        'round_robin': "CASE WHEN a.Username > COALESCE({last_caregiver}, '') THEN 0 ELSE 1 END, a.Username",
+    }
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, strategy=None):
+        if strategy is None:
+            strategy = os.getenv("CaregiverAssignment", "least_loaded")
+        if strategy not in CaregiverAssignment.STRATEGIES:
+            raise ValueError(f"Unknown caregiver assignment strategy '{strategy}'")
+        self.strategy = strategy
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process wide assignment, creating it on first use.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def register(cls, name, order_by):
+        """
+        Adds a strategy.
+
+        Parameters
+        ----------
+        name : str
+            Name of the strategy.
+        order_by : str
+            ORDER BY clause ranking the rows of Availabilities a LEFT
+            JOIN CaregiverLoad l, best first.
+        """
+        cls.STRATEGIES[name] = order_by
+
+    def order_by(self, backend):
+        """
+        Returns the ORDER BY clause of the strategy for backend.
+        """
+        return CaregiverAssignment.STRATEGIES[self.strategy].format(
+            random=backend.sql('random'), last_caregiver=backend.sql('last_caregiver'))
@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+import threading
+sys.path.append("../db/*")
+from db.ConnectionManager import ConnectionManager
+from db.Backend import DBError
+
+
+class DoseAllocator:
+    """
+    Splits each vaccine's stock into shards so that concurrent
+    reservations of the same vaccine update different rows instead of
+    all queueing on its Vaccines row.
+
+    A vaccine's stock is the doses left in its Vaccines row plus the
+    doses of its rows in VaccineShards; the VaccineStock view adds them
+    up. New doses land in the Vaccines row and spread() moves them into
+    the shards. A reservation takes its dose from a random shard,
+    falling back to any other shard and then to the Vaccines row.
+
+    Parameters
+    ----------
+    shards : int, optional
+        Number of shards per vaccine, 1 or less keeps the whole stock
+        in the Vaccines row. Defaults to the DoseShards environment
+        variable, or 8.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, shards=None):
+        self.shards = int(os.getenv("DoseShards", 8)) if shards is None else shards
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process wide allocator, creating it on first use.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def pick(self):
+        """
+        Returns the shard a reservation should try first.
+        """
+        return random.randrange(self.shards) if self.shards > 1 else 0
+
+    def take_dose(self, cursor, vaccine_name):
+        """
+        Takes one dose of vaccine_name in the cursor's transaction.
+
+        Returns
+        -------
+        bool
+            False if the vaccine has no doses left, or does not exist.
+        """
+        cursor.run('take_shard_dose', (vaccine_name, self.pick()))
+        if cursor.rowcount == 1:
+            return True
+        cursor.run('take_any_shard_dose', (vaccine_name, vaccine_name))
+        if cursor.rowcount == 1:
+            return True
+        cursor.run('take_vaccine_dose', vaccine_name)
+        return cursor.rowcount == 1
+
+    def take_doses(self, cursor, vaccine_name, doses):
+        """
+        Takes doses of vaccine_name from its shards in the cursor's
+        transaction, for a change its Vaccines row cannot cover alone.
+        One shard that has enough is tried first, skipping the shards
+        reservations are updating on backends that can. Otherwise the
+        doses are taken from the row and the shards one at a time; if
+        they are not enough the caller must roll back.
+
+        Returns
+        -------
+        bool
+            False if the vaccine does not have that many doses left,
+            or does not exist.
+        """
+        cursor.run('take_shard_doses', (doses, vaccine_name, doses))
+        if cursor.rowcount == 1:
+            return True
+        cursor.run('vaccine_row_doses', vaccine_name)
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        places = [(None, row[0])]
+        cursor.run('vaccine_shard_doses', vaccine_name)
+        places.extend(cursor.fetchall())
+        for shard, available in places:
+            take = min(available, doses)
+            if take <= 0:
+                continue
+            if shard is None:
+                cursor.run('take_vaccine_doses', (take, vaccine_name, take))
+            else:
+                cursor.run('take_from_shard', (take, vaccine_name, shard, take))
+            if cursor.rowcount == 1:
+                doses -= take
+            if doses == 0:
+                return True
+        return False
+
+    def spread(self, vaccine_name):
+        """
+        Moves the doses in the Vaccines row of vaccine_name evenly into
+        its shards, creating them on first use. The total stock is
+        unchanged. If a reservation takes from the row meanwhile the
+        doses are left where they are.
+        """
+        if self.shards <= 1:
+            return
+        try:
+            with ConnectionManager() as conn:
+                with conn.cursor() as cursor:
+                    cursor.run('vaccine_row_doses', vaccine_name)
+                    row = cursor.fetchone()
+                    if row is None or not row[0]:
+                        return
+                    doses = row[0]
+                    cursor.run('take_vaccine_doses', (doses, vaccine_name, doses))
+                    if cursor.rowcount != 1:
+                        conn.rollback()
+                        return
+                    cursor.run_many('insert_shard', [(vaccine_name, shard, vaccine_name, shard)
+                                                      for shard in range(self.shards)])
+                    share, extra = divmod(doses, self.shards)
+                    shares = [(share + (1 if shard < extra else 0), vaccine_name, shard)
+                              for shard in range(self.shards)]
+                    cursor.run_many('add_to_shard', [params for params in shares if params[0] > 0])
+                conn.commit()
+        except DBError:
+            print("Error occurred when spreading vaccine doses")
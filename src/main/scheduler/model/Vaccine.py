@@ -1,32 +1,168 @@
+import contextlib
+import os
 import sys
+import threading
+import time
 sys.path.append("../db/*")
 from db.ConnectionManager import ConnectionManager
-import pymssql
+from db.Backend import DBError
+from model.DoseAllocator import DoseAllocator
+
+
+class InventoryCache:
+    """
+    In-process cache of the Vaccines table, keyed by vaccine name.
+
+    Entries expire after ttl seconds, which bounds how long a change
+    made by another process goes unseen. Writes made through this
+    process update the cache (update) or drop the entry when the new
+    count is unknown (invalidate). Every write bumps a version stamp;
+    a reader takes stamp() before querying the database and passes it
+    to fill(), which ignores the rows if a write happened meanwhile, so
+    a slow read never overwrites a newer value.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Seconds an entry stays valid, 0 disables the cache. Defaults
+        to the VaccineCacheTTL environment variable, or 30.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = float(os.getenv("VaccineCacheTTL", 30)) if ttl is None else ttl
+        self._entries = {}
+        # expiry of the complete catalog, None if only some names are cached
+        self._catalog_expires = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def stamp(self):
+        """
+        Returns the current version stamp, to be passed to fill().
+        """
+        return self._version
+
+    def get(self, name):
+        """
+        Returns the cached dose count of the vaccine called name, or
+        None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def get_all(self):
+        """
+        Returns the cached (name, doses) of every vaccine sorted by
+        name, or None if the complete catalog is not cached.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._catalog_expires is None or self._catalog_expires < now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return sorted((name, doses) for name, (_, doses) in self._entries.items())
+
+    def fill(self, rows, stamp, complete=False):
+        """
+        Caches (name, doses) rows read from the database at version
+        stamp. complete marks rows as the whole Vaccines table.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if stamp != self._version:
+                return
+            expires = time.monotonic() + self.ttl
+            if complete:
+                self._entries = {}
+                self._catalog_expires = expires
+            for name, doses in rows:
+                self._entries[name] = (expires, doses)
+
+    def update(self, name, doses):
+        """
+        Records a committed write that left name with doses.
+        """
+        with self._lock:
+            self._version += 1
+            if self.ttl > 0:
+                expires = self._entries.get(name, (time.monotonic() + self.ttl,))[0]
+                self._entries[name] = (expires, doses)
+
+    def invalidate(self, name=None):
+        """
+        Drops the entry for name, or every entry if name is None.
+        """
+        with self._lock:
+            self._version += 1
+            self._catalog_expires = None
+            if name is None:
+                self._entries = {}
+            else:
+                self._entries.pop(name, None)
 
 
 class Vaccine:
+    # cached vaccine inventory, shared by all Vaccine objects
+    inventory = InventoryCache()
+
     def __init__(self, vaccine_name, available_doses):
         self.vaccine_name = vaccine_name
         self.available_doses = available_doses
 
     # getters
     def get(self):
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor(as_dict=True)
+        doses = Vaccine.inventory.get(self.vaccine_name)
+        if doses is not None:
+            self.available_doses = doses
+            return self
 
-        get_vaccine = "SELECT Name, Doses FROM Vaccines WHERE Name = %s"
+        stamp = Vaccine.inventory.stamp()
         try:
-            cursor.execute(get_vaccine, self.vaccine_name)
-            for row in cursor.fetchall():
-                self.available_doses = row['Doses']
-                return self
-        except pymssql.Error:
+            with ConnectionManager() as conn:
+                cursor = conn.cursor(as_dict=True)
+                cursor.run('vaccine_stock', self.vaccine_name)
+                for row in cursor.fetchall():
+                    self.available_doses = row['Doses']
+                    Vaccine.inventory.fill([(row['Name'], row['Doses'])], stamp)
+                    return self
+        except DBError:
             print("Error occurred when getting Vaccine")
-            cm.close_connection()
-        cm.close_connection()
         return None
 
+    @staticmethod
+    def get_all():
+        """
+        Returns every vaccine, sorted by name, from the inventory cache
+        when it holds the complete catalog.
+
+        Returns
+        -------
+        list of Vaccine
+            The vaccines, or None if the database reported an error.
+        """
+        rows = Vaccine.inventory.get_all()
+        if rows is None:
+            stamp = Vaccine.inventory.stamp()
+            try:
+                with ConnectionManager() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.run('all_vaccine_stock')
+                        rows = [(name, doses) for name, doses in cursor.fetchall()]
+            except DBError:
+                print("Error occurred when getting Vaccines")
+                return None
+            Vaccine.inventory.fill(rows, stamp, complete=True)
+        return [Vaccine(name, doses) for name, doses in rows]
+
     def get_vaccine_name(self):
         return self.vaccine_name
 
@@ -34,59 +170,118 @@ class Vaccine:
         return self.available_doses
 
     def save_to_db(self):
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor()
+        """
+        Inserts the vaccine with its available doses.
 
-        add_doses = "INSERT INTO VACCINES VALUES (%s, %d)"
-        try:
-            cursor.execute(add_doses, (self.vaccine_name, self.available_doses))
+        Raises
+        ------
+        DBError
+            If the database reports an error, e.g. the vaccine exists.
+        """
+        with ConnectionManager() as conn:
+            cursor = conn.cursor()
+            cursor.run('insert_vaccine', (self.vaccine_name, self.available_doses))
             # you must call commit() to persist your data if you don't set autocommit to True
             conn.commit()
-        except pymssql.Error:
-            print("Error occurred when insert Vaccines")
-            cm.close_connection()
-        cm.close_connection()
+        Vaccine.inventory.update(self.vaccine_name, self.available_doses)
 
     # Increment the available doses
     def increase_available_doses(self, num):
-        if num <= 0:
-            ValueError("Argument cannot be negative!")
-        self.available_doses += num
+        """
+        Atomically adds num doses and reads back the new count.
 
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor()
-
-        update_vaccine_availability = "UPDATE vaccines SET Doses = %d WHERE name = %s"
-        try:
-            cursor.execute(update_vaccine_availability, (self.available_doses, self.vaccine_name))
-            # you must call commit() to persist your data if you don't set autocommit to True
-            conn.commit()
-        except pymssql.Error:
-            print("Error occurred when updating vaccine availability")
-            cm.close_connection()
-        cm.close_connection()
+        Raises
+        ------
+        ValueError
+            If num is not positive or the vaccine does not exist.
+        DBError
+            If the database reports an error.
+        """
+        if num <= 0:
+            raise ValueError("Number of doses must be positive!")
+        self.available_doses = Vaccine.change_doses([(self.vaccine_name, num)])[self.vaccine_name]
 
     # Decrement the available doses
     def decrease_available_doses(self, num):
-        if self.available_doses - num < 0:
-            ValueError("Not enough available doses!")
-        self.available_doses -= num
+        """
+        Atomically takes num doses if at least num are left and reads
+        back the new count.
 
-        cm = ConnectionManager()
-        conn = cm.create_connection()
-        cursor = conn.cursor()
+        Raises
+        ------
+        ValueError
+            If num is not positive, the vaccine does not exist or has
+            fewer than num doses.
+        DBError
+            If the database reports an error.
+        """
+        if num <= 0:
+            raise ValueError("Number of doses must be positive!")
+        self.available_doses = Vaccine.change_doses([(self.vaccine_name, -num)])[self.vaccine_name]
 
-        update_vaccine_availability = "UPDATE vaccines SET Doses = %d WHERE name = %s"
-        try:
-            cursor.execute(update_vaccine_availability, (self.available_doses, self.vaccine_name))
-            # you must call commit() to persist your data if you don't set autocommit to True
-            conn.commit()
-        except pymssql.Error:
-            print("Error occurred when updating vaccine availability")
-            cm.close_connection()
-        cm.close_connection()
+    @staticmethod
+    def change_doses(changes, conn=None):
+        """
+        Dose ledger: applies many dose changes with one UPDATE that
+        adds each delta to the stored count server side, so concurrent
+        writers never overwrite each other and no prior read is needed.
+        The changes apply to the vaccines' own rows; doses the row of a
+        vaccine does not have are taken from its shards instead (see
+        DoseAllocator.take_doses). A change that would leave a vaccine
+        with fewer than 0 doses fails; then none of the changes are
+        applied.
+
+        Parameters
+        ----------
+        changes : iterable of (str, int)
+            (vaccine name, delta) pairs, negative deltas take doses.
+            Deltas for the same vaccine are added up.
+        conn : Connection, optional
+            Runs the update inside the caller's transaction on conn
+            instead of in its own one. The caller commits, rolls back
+            after a ValueError and refreshes Vaccine.inventory.
+
+        Returns
+        -------
+        dict
+            The new total stock of each changed vaccine.
+
+        Raises
+        ------
+        ValueError
+            If a vaccine does not exist or does not have enough doses.
+        DBError
+            If the database reports an error.
+        """
+        totals = {}
+        for name, delta in changes:
+            totals[name] = totals.get(name, 0) + delta
+        if len(totals) == 0:
+            return {}
+        values = ", ".join(["(%s, %d)"] * len(totals))
+        params = tuple(value for row in totals.items() for value in row)
+        with ConnectionManager() if conn is None else contextlib.nullcontext(conn) as db:
+            with db.cursor() as cursor:
+                # returns the total stock, shards included
+                cursor.run('change_doses', params, values=values)
+                doses = {name: count for name, count in cursor.fetchall()}
+                short = [name for name in totals if name not in doses]
+                allocator = DoseAllocator.shared()
+                failed = [name for name in short
+                          if totals[name] >= 0 or not allocator.take_doses(cursor, name, -totals[name])]
+                if failed:
+                    if conn is None:
+                        db.rollback()
+                    raise ValueError(f"Vaccine {', '.join(sorted(failed))} does not exist or does not have enough doses!")
+                if short:
+                    cursor.run('vaccine_stock_in', tuple(short), names=", ".join(["%s"] * len(short)))
+                    doses.update(cursor.fetchall())
+            if conn is None:
+                db.commit()
+        if conn is None:
+            for name, count in doses.items():
+                Vaccine.inventory.update(name, count)
+        return doses
 
     def __str__(self):
         return f"(Vaccine Name: {self.vaccine_name}, Available Doses: {self.available_doses})"
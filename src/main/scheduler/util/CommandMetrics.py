@@ -0,0 +1,266 @@
+import atexit
+import bisect
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from db.Backend import add_observer
+from util.TableWriter import TableWriter
+
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384)
+
+# [connect seconds, connections, statements, rows] of the command the
+# current context is running, if any
+_sample = contextvars.ContextVar('command_sample', default=None)
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, like a Prometheus histogram.
+
+    Parameters
+    ----------
+    bounds : tuple of float
+        Increasing upper bounds of the buckets; larger values fall in
+        a last, unbounded bucket.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q quantile,
+        capped at the largest value seen.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank and seen > 0:
+                return min(bound, self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0
+
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': list(self.counts), 'count': self.count,
+                'sum': self.sum, 'max': self.max}
+
+
+class CommandMetrics:
+    """
+    Records, for every command, its wall time, the time spent getting
+    connections, the number of connections, statements and fetched
+    rows, as histograms per command name. The database counts are
+    collected as a db.Backend observer while the command runs.
+
+    The metrics can be printed with the 'stats' command and are
+    written every interval seconds, and at exit, to the JSON file
+    named by the MetricsFile environment variable and to the
+    Prometheus text file named by MetricsPrometheusFile, if set.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON file, defaults to the MetricsFile environment variable.
+    prometheus_path : str, optional
+        Prometheus text file, defaults to the MetricsPrometheusFile
+        environment variable.
+    interval : float, optional
+        Seconds between writes. Defaults to the MetricsInterval
+        environment variable, or 60.
+    """
+
+    # metric name, buckets and help text, in the order of a sample
+    METRICS = (
+        ('seconds', SECONDS_BUCKETS, "Wall time of scheduler commands."),
+        ('connect_seconds', SECONDS_BUCKETS, "Time commands spent getting database connections."),
+        ('connections', COUNT_BUCKETS, "Database connections used per command."),
+        ('statements', COUNT_BUCKETS, "SQL statements executed per command."),
+        ('rows', COUNT_BUCKETS, "Rows fetched per command."),
+    )
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None, prometheus_path=None, interval=None):
+        self.path = path if path is not None else os.getenv("MetricsFile")
+        self.prometheus_path = prometheus_path if prometheus_path is not None else os.getenv("MetricsPrometheusFile")
+        self.interval = interval if interval is not None else float(os.getenv("MetricsInterval", 60))
+        self.commands = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process wide metrics, creating them on first use
+        and registering them as a database observer. The periodic
+        writes begin with start().
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    metrics = cls()
+                    add_observer(metrics)
+                    cls._shared = metrics
+        return cls._shared
+
+    @contextlib.contextmanager
+    def measure(self, command):
+        """
+        Records the block as one run of command. Nested blocks are
+        counted by the outermost one.
+        """
+        if _sample.get() is not None:
+            yield
+            return
+        sample = [0.0, 0, 0, 0]
+        token = _sample.set(sample)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _sample.reset(token)
+            self.record(command, [seconds] + sample)
+
+    def record(self, command, values):
+        """
+        Adds one run of command with the values of METRICS.
+        """
+        with self._lock:
+            histograms = self.commands.get(command)
+            if histograms is None:
+                histograms = [Histogram(bounds) for _, bounds, _ in CommandMetrics.METRICS]
+                self.commands[command] = histograms
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+
+    # db.Backend observer methods
+
+    def connected(self, seconds):
+        sample = _sample.get()
+        if sample is not None:
+            sample[0] += seconds
+            sample[1] += 1
+
+    def executed(self, operation, params, seconds, rowcount):
+        sample = _sample.get()
+        if sample is not None:
+            sample[2] += 1
+
+    def fetched(self, operation, rows):
+        sample = _sample.get()
+        if sample is not None:
+            sample[3] += rows
+
+    def snapshot(self):
+        """
+        Returns the metrics as a dict of command name to a dict of
+        metric name to histogram dict.
+        """
+        with self._lock:
+            return {command: {name: histogram.to_dict()
+                              for (name, _, _), histogram in zip(CommandMetrics.METRICS, histograms)}
+                    for command, histograms in self.commands.items()}
+
+    def print_stats(self):
+        """
+        Prints a summary line per command: runs, wall time quantiles
+        in milliseconds and the mean of the other metrics.
+        """
+        with self._lock:
+            rows = sorted(self.commands.items())
+            if not rows:
+                print("No commands recorded yet")
+                return
+            with TableWriter(['COMMAND', 'RUNS', 'P50 ms', 'P99 ms', 'MAX ms', 'CONNECT ms',
+                              'CONNECTIONS', 'STATEMENTS', 'ROWS']) as table:
+                for command, (seconds, connect, connections, statements, fetched) in rows:
+                    table.write([command, seconds.count, f"{seconds.quantile(0.5) * 1000:.1f}",
+                                 f"{seconds.quantile(0.99) * 1000:.1f}", f"{seconds.max * 1000:.1f}",
+                                 f"{connect.mean() * 1000:.2f}", f"{connections.mean():.1f}",
+                                 f"{statements.mean():.1f}", f"{fetched.mean():.1f}"])
+
+    def prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, _, help in CommandMetrics.METRICS:
+            metric = f"scheduler_command_{name}"
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} histogram")
+            for command, histograms in sorted(snapshot.items()):
+                histogram = histograms[name]
+                cumulative = 0
+                for bound, count in zip(histogram['bounds'] + ['+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{command="{command}"}} {histogram["sum"]}')
+                lines.append(f'{metric}_count{{command="{command}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        Writes the JSON and Prometheus files that are configured.
+        Each file is replaced atomically so readers never see a
+        partial write.
+        """
+        if self.path:
+            import json
+            _replace(self.path, json.dumps({'time': time.time(), 'commands': self.snapshot()}))
+        if self.prometheus_path:
+            _replace(self.prometheus_path, self.prometheus())
+
+    def start(self):
+        """
+        Starts writing the files every interval seconds, if any file
+        is configured.
+        """
+        if not (self.path or self.prometheus_path) or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='command-metrics', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stops the periodic writes and writes the files one last time.
+        """
+        self._stop.set()
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as err:
+                print(f"Could not write command metrics: {err}")
+
+
+def _replace(path, text):
+    temporary = path + ".tmp"
+    with open(temporary, 'w') as f:
+        f.write(text)
+    os.replace(temporary, path)
@@ -0,0 +1,214 @@
+class CommandStatus:
+    """
+    The outcome of a command line, returned by CommandRouter.dispatch.
+    Handlers return one to report a failure; its message has been
+    printed already.
+
+    Parameters
+    ----------
+    error : str or None
+        Why the command failed, None if it succeeded.
+    keep_going : bool
+        False if the command ended the session.
+    """
+
+    def __init__(self, error=None, keep_going=True):
+        self.error = error
+        self.keep_going = keep_going
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @staticmethod
+    def failed(*lines):
+        """
+        Prints the lines explaining why a command failed and returns
+        its status, with the first line as the error.
+        """
+        for line in lines:
+            print(line)
+        return CommandStatus(str(lines[0]))
+
+
+class Command:
+    """
+    A command registered with a CommandRouter.
+
+    Parameters
+    ----------
+    name : str
+        The operation name typed by the user, in lower case.
+    handler : callable
+        Called with the command line tokens once they are validated,
+        each argument replaced by the value its parser returned. A
+        command with options gets the operation name followed by the
+        dict of option values instead. Returning False ends the
+        session, returning a CommandStatus reports a failure.
+    min_args : int
+        Minimum number of arguments after the operation name.
+    max_args : int or None
+        Maximum number of arguments, None for no limit.
+    role : str or None
+        Who may run the command: None for everybody, 'guest' for
+        nobody logged in, 'any' for any logged-in user, 'patient' or
+        'caregiver'.
+    parsers : list of callable
+        Converters of the arguments by position. Each is called with
+        the argument string, returns the value passed to the handler
+        and raises ValueError, with a message for the user, if the
+        argument is invalid. Arguments without a parser are passed on
+        as strings.
+    options : dict or None
+        For commands taking '--name value' pairs instead of positional
+        arguments: maps each option name, without the dashes, to the
+        converter of its value.
+    """
+
+    def __init__(self, name, handler, min_args=0, max_args=0, role=None, parsers=(), options=None):
+        self.name = name
+        self.handler = handler
+        self.min_args = min_args
+        self.max_args = max_args
+        self.role = role
+        self.parsers = list(parsers)
+        self.options = options
+
+
+class CommandRouter:
+    """
+    Maps operation names to their commands. dispatch() looks the
+    operation up, checks the user's role, the number of arguments and
+    the arguments themselves and only then runs the handler, so every
+    front end (the prompt, --script and --serve) validates commands
+    the same way.
+
+    Only the operation name is case insensitive; arguments such as
+    passwords and vaccine names are passed on as typed.
+
+    Parameters
+    ----------
+    get_role : callable
+        Returns the role of the user of the current session:
+        'patient', 'caregiver' or None if nobody is logged in.
+    metrics : CommandMetrics, optional
+        Records every handler run under the command's name.
+    """
+
+    # printed when the current user may not run a command
+    ROLE_ERRORS = {
+        'guest': "Already logged-in!",
+        'any': "Please login first!",
+        'patient': "Please login as a patient",
+        'caregiver': "Please login as caregiver first!",
+    }
+
+    def __init__(self, get_role, metrics=None):
+        self.get_role = get_role
+        self.metrics = metrics
+        self.commands = {}
+
+    def register(self, name, handler, min_args=0, max_args=None, role=None, parsers=(), options=None):
+        """
+        Registers a command, see Command. max_args defaults to
+        min_args.
+        """
+        if max_args is None:
+            max_args = min_args
+        self.commands[name] = Command(name, handler, min_args, max_args, role, parsers, options)
+
+    def allowed(self, role, current_role):
+        if role is None:
+            return True
+        if role == 'guest':
+            return current_role is None
+        if role == 'any':
+            return current_role is not None
+        return role == current_role
+
+    @staticmethod
+    def parse_options(args, options):
+        """
+        Parses the '--name value' pairs of a command's arguments.
+
+        Parameters
+        ----------
+        args : list
+            The arguments, without the operation name.
+        options : dict
+            Maps each accepted option name, without the dashes, to a
+            function converting its value.
+
+        Returns
+        -------
+        dict
+            The converted value of each option given.
+
+        Raises
+        ------
+        ValueError
+            If an option is unknown, repeated, has no value or its
+            value cannot be converted.
+        """
+        values = {}
+        if len(args) % 2 != 0:
+            raise ValueError("Options must be given as --name value")
+        for name, value in zip(args[::2], args[1::2]):
+            if not name.startswith('--') or name[2:] not in options:
+                raise ValueError(f"Unknown option {name}")
+            if name[2:] in values:
+                raise ValueError(f"Option {name} given twice")
+            values[name[2:]] = options[name[2:]](value)
+        return values
+
+    def dispatch(self, line):
+        """
+        Runs one command line. An exception raised by the handler is
+        reported like the handlers' own errors and does not end the
+        session.
+
+        Returns
+        -------
+        CommandStatus
+            Whether the command failed and whether it ended the
+            session.
+        """
+        tokens = line.split()
+        if len(tokens) == 0:
+            return CommandStatus()
+        tokens[0] = tokens[0].lower()
+        command = self.commands.get(tokens[0])
+        if command is None:
+            return CommandStatus.failed("Invalid Argument")
+        if not self.allowed(command.role, self.get_role()):
+            return CommandStatus.failed(CommandRouter.ROLE_ERRORS[command.role])
+        args = len(tokens) - 1
+        if args < command.min_args or (command.max_args is not None and args > command.max_args):
+            if command.min_args == command.max_args:
+                expected = str(command.min_args + 1)
+            elif command.max_args is None:
+                expected = f"at least {command.min_args + 1}"
+            else:
+                expected = f"{command.min_args + 1} to {command.max_args + 1}"
+            return CommandStatus.failed(f"Expected {expected} inputs, received {len(tokens)} inputs",
+                                        "Please try again!")
+        try:
+            if command.options is not None:
+                tokens[1:] = [self.parse_options(tokens[1:], command.options)]
+            else:
+                for position, parser in enumerate(command.parsers[:args], 1):
+                    tokens[position] = parser(tokens[position])
+        except ValueError as err:
+            return CommandStatus.failed(err, "Please try again!")
+        # a failing handler must not end the prompt or a client's session
+        try:
+            if self.metrics is None:
+                result = command.handler(tokens)
+            else:
+                with self.metrics.measure(command.name):
+                    result = command.handler(tokens)
+        except Exception:
+            return CommandStatus.failed(f"Error occurred when running {command.name}")
+        if isinstance(result, CommandStatus):
+            return result
+        return CommandStatus(keep_going=result is not False)
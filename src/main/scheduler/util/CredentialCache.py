@@ -0,0 +1,82 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CredentialCache:
+    """
+    Short lived, size bounded cache of recently verified logins, so a
+    user who re-authenticates within ttl seconds skips the password
+    hash and the database lookup.
+
+    Passwords are never stored; entries keep an HMAC of the password
+    under a per-process random key, together with the stored salt,
+    hash and hash version. A password change made by another process
+    is only seen once the entry expires.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Seconds an entry stays valid, 0 disables the cache. Defaults
+        to the CredentialCacheTTL environment variable, or 60.
+    max_size : int, optional
+        Maximum number of entries, least recently used entries are
+        dropped first. Defaults to the CredentialCacheSize environment
+        variable, or 1024.
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = float(os.getenv("CredentialCacheTTL", 60)) if ttl is None else ttl
+        self.max_size = int(os.getenv("CredentialCacheSize", 1024)) if max_size is None else max_size
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def get(self, username, password):
+        """
+        Returns the cached (salt, hash, hash_version) for username if
+        password was verified for it within the last ttl seconds,
+        otherwise None.
+        """
+        if self.ttl <= 0:
+            return None
+        digest = self._digest(password)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[username]
+                entry = None
+            if entry is None or not hmac.compare_digest(entry[1], digest):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, username, password, salt, hash, hash_version):
+        """
+        Records a successful verification of password for username.
+        """
+        if self.ttl <= 0:
+            return
+        digest = self._digest(password)
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, digest, (salt, hash, hash_version))
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        """
+        Drops the entry for username, if any.
+        """
+        with self._lock:
+            self._entries.pop(username, None)
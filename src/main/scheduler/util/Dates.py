@@ -0,0 +1,54 @@
+import datetime
+import functools
+import re
+
+
+_DATE = re.compile(r"(\d{2})-(\d{2})-(\d{4})")
+
+
+class Dates:
+    """
+    The scheduler's date handling. Dates are typed as 'mm-dd-yyyy',
+    kept as datetime.date everywhere else and bound to queries as
+    datetime.date, which both database drivers accept.
+
+    Parsing and formatting are memoized: commands and listings use a
+    small set of distinct dates over and over, so after the first use
+    each one costs a dictionary lookup.
+    """
+
+    FORMAT = 'mm-dd-yyyy'
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def parse(date_string):
+        """
+        Parses a 'mm-dd-yyyy' date string.
+
+        Returns
+        -------
+        datetime.date
+            The date.
+
+        Raises
+        ------
+        ValueError
+            If date_string is not in the format 'mm-dd-yyyy' or is not
+            a valid date, such as 02-31-2022.
+        """
+        match = _DATE.fullmatch(date_string)
+        if match is None:
+            raise ValueError(f"Invalid date {date_string}, please use format '{Dates.FORMAT}'")
+        month, day, year = match.groups()
+        try:
+            return datetime.date(int(year), int(month), int(day))
+        except ValueError as err:
+            raise ValueError(f"Invalid date {date_string}: {err}") from None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def format(date):
+        """
+        Returns date as a 'mm-dd-yyyy' string.
+        """
+        return f"{date.month:02d}-{date.day:02d}-{date.year:04d}"
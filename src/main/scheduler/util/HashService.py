@@ -0,0 +1,126 @@
+import hmac
+import os
+import threading
+from util.Util import Util
+
+
+class HashService:
+    """
+    Runs Util.generate_hash in a pool of worker processes so password
+    hashing uses every core instead of serializing the caller.
+
+    At most max_pending hashes are queued or running at once; submit()
+    blocks while the queue is full, which pushes back on callers
+    instead of letting a login storm build an unbounded backlog.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of worker processes. 0 hashes inline in the calling
+        thread. Defaults to the HashWorkers environment variable, or
+        the number of CPUs.
+    max_pending : int, optional
+        Maximum number of queued plus running hashes. Defaults to the
+        HashQueueSize environment variable, or 4 per worker.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers=None, max_pending=None):
+        if workers is None:
+            workers = int(os.getenv("HashWorkers", os.cpu_count() or 1))
+        if max_pending is None:
+            max_pending = int(os.getenv("HashQueueSize", 4 * max(workers, 1)))
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        if workers > 0:
+            # imported here, concurrent.futures and multiprocessing are slow to load
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # The pool is usually created on the first login, from a thread
+            # of a process that already runs others (server mode, metrics),
+            # where forking can copy held locks and deadlock the workers
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process wide hashing service, creating it on
+        first use.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def submit(self, password, salt, version=None):
+        """
+        Queues a hash, blocking while max_pending hashes are in flight.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the derived key.
+        """
+        if version is None:
+            version = Util.current_hash_version()
+        if self._executor is None:
+            from concurrent.futures import Future
+            future = Future()
+            try:
+                future.set_result(Util.generate_hash(password, salt, version))
+            except Exception as err:
+                future.set_exception(err)
+            return future
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(Util.generate_hash, password, salt, version)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def generate_hash(self, password, salt, version=None):
+        """
+        Same as Util.generate_hash, computed in a worker process.
+        """
+        return self.submit(password, salt, version).result()
+
+    async def generate_hash_async(self, password, salt, version=None):
+        """
+        Awaitable version of generate_hash. Waiting for a queue slot
+        happens off the event loop.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit, password, salt, version)
+        return await asyncio.wrap_future(future)
+
+    def verify_hash(self, password, salt, hash, version):
+        """
+        Same as Util.verify_hash, computed in a worker process.
+        """
+        return hmac.compare_digest(self.generate_hash(password, salt, version), hash)
+
+    def map(self, items, version=None):
+        """
+        Hashes many (password, salt) pairs, keeping up to max_pending
+        of them in flight.
+
+        Returns
+        -------
+        list of bytes
+            The derived keys, in the order of items.
+        """
+        futures = [self.submit(password, salt, version) for password, salt in items]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -0,0 +1,189 @@
+import datetime
+import os
+import re
+import threading
+from db.Backend import add_observer
+from util.TableWriter import TableWriter
+
+
+# Rewrites turning a statement into its fingerprint, in order
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%[sd]"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    # savepoint names are numbered per transaction
+    (re.compile(r"\b(SAVEPOINT|TRANSACTION)\s+\w+", re.IGNORECASE), r"\1 ?"),
+    (re.compile(r"\s+"), " "),
+    # parameter lists of any length, and multi-row VALUES lists
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),
+    (re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+"), "(?+)"),
+]
+# Distinct statements whose fingerprint is remembered
+_FINGERPRINT_CACHE_SIZE = 4096
+
+
+def fingerprint(operation):
+    """
+    Normalizes a statement so every execution of the same query maps
+    to the same string, whatever its literals, parameters, spacing and
+    the length of its parameter lists.
+    """
+    for pattern, replacement in _FINGERPRINT_RULES:
+        operation = pattern.sub(replacement, operation)
+    return operation.strip()
+
+
+def redact(params):
+    """
+    Replaces the values of bound parameters with their types, so the
+    slow-query log never holds usernames, hashes or other user data.
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: redact(value) for name, value in params.items()}
+    if isinstance(params, (tuple, list)):
+        return [redact(value) for value in params]
+    if isinstance(params, (bytes, bytearray, str)):
+        return f"<{type(params).__name__}:{len(params)}>"
+    return f"<{type(params).__name__}>"
+
+
+class QueryStats:
+    """
+    Totals of one query fingerprint.
+    """
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+
+class QueryProfiler:
+    """
+    Aggregates every statement the scheduler runs by fingerprint: the
+    number of executions, total and maximum latency and rows affected
+    or fetched, so the queries that cost the most under real traffic
+    can be found with the 'queries' command. It is a db.Backend
+    observer.
+
+    Statements slower than the threshold are appended, one JSON line
+    each with their parameters redacted, to the SlowQueryLog file.
+
+    Parameters
+    ----------
+    threshold : float, optional
+        Slow-query threshold in milliseconds. Defaults to the
+        SlowQueryMs environment variable, or 100.
+    log_path : str, optional
+        Slow-query log file, defaults to the SlowQueryLog environment
+        variable. No log is written if it is not set.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, threshold=None, log_path=None):
+        self.threshold = (threshold if threshold is not None else float(os.getenv("SlowQueryMs", 100))) / 1000
+        self.log_path = log_path if log_path is not None else os.getenv("SlowQueryLog")
+        self.queries = {}
+        self.slow = 0
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process wide profiler, creating it and registering
+        it as a database observer on first use.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    profiler = cls()
+                    add_observer(profiler)
+                    cls._shared = profiler
+        return cls._shared
+
+    def _stats(self, operation):
+        key = self._fingerprints.get(operation)
+        if key is None:
+            key = fingerprint(operation)
+            if len(self._fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            self._fingerprints[operation] = key
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = QueryStats(key)
+        return stats
+
+    # db.Backend observer methods
+
+    def connected(self, seconds):
+        pass
+
+    def executed(self, operation, params, seconds, rowcount):
+        slow = seconds >= self.threshold
+        with self._lock:
+            stats = self._stats(operation)
+            stats.calls += 1
+            stats.seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            if rowcount > 0:
+                stats.rows += rowcount
+            if slow:
+                self.slow += 1
+        # the file is written outside the lock so a slow disk does not
+        # hold up the statements of other threads
+        if slow and self.log_path:
+            self._log(stats.fingerprint, operation, params, seconds)
+
+    def fetched(self, operation, rows):
+        with self._lock:
+            self._stats(operation).rows += rows
+
+    def _log(self, key, operation, params, seconds):
+        import json
+        entry = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(seconds * 1000, 3),
+            'fingerprint': key,
+            'statement': " ".join(operation.split()),
+            'params': redact(params),
+        }
+        line = json.dumps(entry) + "\n"
+        try:
+            # one append per line, so concurrent entries do not interleave
+            with open(self.log_path, 'a') as f:
+                f.write(line)
+        except OSError as err:
+            print(f"Could not write the slow-query log: {err}")
+
+    def top(self, limit=20):
+        """
+        Returns the QueryStats of the limit fingerprints with the most
+        total time.
+        """
+        with self._lock:
+            queries = sorted(self.queries.values(), key=lambda stats: stats.seconds, reverse=True)
+        return queries[:limit]
+
+    def print_queries(self, limit=20, width=70):
+        """
+        Prints the fingerprints with the most total time.
+        """
+        queries = self.top(limit)
+        if not queries:
+            print("No queries recorded yet")
+            return
+        with TableWriter(['QUERY', 'CALLS', 'TOTAL ms', 'MEAN ms', 'MAX ms', 'ROWS']) as table:
+            for stats in queries:
+                query = stats.fingerprint if len(stats.fingerprint) <= width else stats.fingerprint[:width - 3] + "..."
+                table.write([query, stats.calls, f"{stats.seconds * 1000:.1f}",
+                             f"{stats.seconds * 1000 / stats.calls:.2f}", f"{stats.max_seconds * 1000:.2f}",
+                             stats.rows])
+        print(f"{self.slow} statements slower than {self.threshold * 1000:g} ms")
@@ -0,0 +1,86 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from util.TableWriter import TableWriter
+
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)\s*$")
+_MARKER = "-- startup profile --"
+
+
+class StartupProfiler:
+    """
+    Measures the cold start of the scheduler: imports module in a
+    fresh interpreter with python -X importtime and reports the total
+    import time against a budget together with the slowest imports.
+
+    Parameters
+    ----------
+    module : str, optional
+        Module whose import is measured, by default 'Scheduler'.
+    budget : float, optional
+        Allowed import time in milliseconds. Defaults to the
+        StartupBudgetMs environment variable, or 150.
+    """
+
+    def __init__(self, module='Scheduler', budget=None):
+        self.module = module
+        self.budget = float(os.getenv("StartupBudgetMs", 150)) if budget is None else budget
+        self.directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+    def run(self):
+        """
+        Imports the module in a new interpreter.
+
+        Returns
+        -------
+        float
+            Wall time of the whole process in milliseconds.
+        list of (str, float, float, int)
+            Module name, self and cumulative import time in
+            milliseconds and nesting depth of every module imported by
+            the module, in the order their imports finished.
+
+        Raises
+        ------
+        RuntimeError
+            If the import fails.
+        """
+        code = f"import sys; sys.stderr.write({_MARKER!r} + '\\n'); import {self.module}"
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                cwd=self.directory, capture_output=True, text=True)
+        wall = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        imports = []
+        lines = result.stderr.splitlines()
+        for line in lines[lines.index(_MARKER) + 1:]:
+            match = _IMPORT_TIME.match(line)
+            if match is not None:
+                depth = len(match.group(3)) // 2
+                imports.append((match.group(4), int(match.group(1)) / 1000, int(match.group(2)) / 1000, depth))
+        return wall, imports
+
+    def report(self, top=15):
+        """
+        Prints the import time of the module, the process wall time
+        and the top slowest imports by cumulative time.
+
+        Returns
+        -------
+        bool
+            True if the import time is within the budget.
+        """
+        wall, imports = self.run()
+        total = sum(cumulative for _, _, cumulative, depth in imports if depth == 0)
+        verdict = "within" if total <= self.budget else "OVER"
+        print(f"Import of {self.module}: {total:.1f} ms ({verdict} the {self.budget:.0f} ms budget), "
+              f"process wall time {wall:.1f} ms")
+        slowest = sorted(imports, key=lambda entry: entry[2], reverse=True)[:top]
+        with TableWriter(['MODULE', 'SELF (ms)', 'CUMULATIVE (ms)']) as table:
+            for name, self_time, cumulative, depth in slowest:
+                table.write([name, f"{self_time:.1f}", f"{cumulative:.1f}"])
+        return total <= self.budget
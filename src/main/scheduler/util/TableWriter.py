@@ -0,0 +1,87 @@
+import sys
+
+
+class TableWriter:
+    """
+    Prints a table in tabulate's "pretty" format while its rows are
+    still being read, so a long listing starts appearing right away
+    and never has to be held in memory.
+
+    Column widths are taken from the headers and the first sample
+    rows; later values that are wider than their column are printed in
+    full and push the rest of their line out of alignment.
+
+    Parameters
+    ----------
+    headers : list of str
+        Column headers.
+    sample : int, optional
+        Number of rows buffered to size the columns, by default 50.
+    out : file, optional
+        Where the table is printed, by default sys.stdout at the time
+        of each write.
+
+    Example
+    -------
+        with TableWriter(['NAME', 'DOSES']) as table:
+            for row in cursor:
+                table.write([row['Name'], row['Doses']])
+    """
+
+    def __init__(self, headers, sample=50, out=None):
+        self.headers = [str(header) for header in headers]
+        self.sample = sample
+        self.out = out
+        self.rows = 0
+        self._buffer = []
+        self._widths = None
+
+    def _print(self, line):
+        print(line, file=self.out or sys.stdout)
+
+    def _line(self, values):
+        cells = [str(value).center(width) for value, width in zip(values, self._widths)]
+        return "| " + " | ".join(cells) + " |"
+
+    def _rule(self):
+        return "+" + "+".join("-" * (width + 2) for width in self._widths) + "+"
+
+    def _start(self):
+        self._widths = [len(header) for header in self.headers]
+        for row in self._buffer:
+            self._widths = [max(width, len(value)) for width, value in zip(self._widths, row)]
+        self._print(self._rule())
+        self._print(self._line(self.headers))
+        self._print(self._rule())
+        for row in self._buffer:
+            self._print(self._line(row))
+        self._buffer = []
+
+    def write(self, row):
+        """
+        Adds a row to the table.
+        """
+        row = [str(value) for value in row]
+        self.rows += 1
+        if self._widths is None:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.sample:
+                self._start()
+        else:
+            self._print(self._line(row))
+
+    def close(self):
+        """
+        Prints the rows still buffered and the bottom rule.
+        """
+        if self._widths is None:
+            self._start()
+        self._print(self._rule())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        return False
@@ -1,8 +1,20 @@
 import hashlib
+import hmac
 import os
 
 
 class Util:
+    # Password hashing schemes by version. A version's parameters must
+    # never change once hashes have been stored with it; add a new
+    # version instead and set the HashVersion environment variable.
+    # Hashes of older versions are upgraded the next time the user
+    # logs in.
+    HASH_SCHEMES = {
+        1: ('pbkdf2_sha256', {'iterations': 100000}),
+        2: ('scrypt', {'n': 2 ** 14, 'r': 8, 'p': 1}),
+        3: ('argon2id', {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}),
+    }
+
     def generate_salt():
         """
         Returns a string of random bytes
@@ -14,7 +26,22 @@ class Util:
         """
         return os.urandom(16)
 
-    def generate_hash(password, salt):
+    def current_hash_version():
+        """
+        Returns the hashing scheme version used for new hashes, set
+        with the HashVersion environment variable (default 1).
+
+        Returns
+        -------
+        int
+            A key of Util.HASH_SCHEMES
+        """
+        version = int(os.getenv("HashVersion", 1))
+        if version not in Util.HASH_SCHEMES:
+            raise ValueError(f"Unknown hash version {version}")
+        return version
+
+    def generate_hash(password, salt, version=None):
         """
         Generates the hashed key for the given
         password and salt.
@@ -26,17 +53,57 @@ class Util:
         salt : Utf-8 encoded string
             Random Utf-8 byte like string object
             used to randomize the password.
+        version : int, optional
+            Hashing scheme version, see Util.HASH_SCHEMES,
+            by default Util.current_hash_version()
+
+        Returns
+        -------
+        bytes
+            16 byte derived key
+        """
+        if version is None:
+            version = Util.current_hash_version()
+        scheme, params = Util.HASH_SCHEMES[version]
+        password = password.encode('utf-8') # encode as bytes like object
+        if scheme == 'pbkdf2_sha256':
+            return hashlib.pbkdf2_hmac(
+                'sha256',
+                password,
+                salt,
+                params['iterations'],
+                dklen=16 # derived key length
+            )
+        if scheme == 'scrypt':
+            return hashlib.scrypt(password, salt=salt, n=params['n'], r=params['r'], p=params['p'], dklen=16)
+        if scheme == 'argon2id':
+            try:
+                from argon2.low_level import Type, hash_secret_raw
+            except ImportError:
+                raise ValueError("Hash version 3 requires the argon2-cffi package")
+            return hash_secret_raw(password, salt, params['time_cost'], params['memory_cost'],
+                                   params['parallelism'], 16, Type.ID)
+        raise ValueError(f"Unknown hashing scheme {scheme}")
+
+    def verify_hash(password, salt, hash, version):
+        """
+        Checks a password against a stored salt and hash in constant
+        time.
+
+        Parameters
+        ----------
+        password : str
+            User inputed password
+        salt : bytes
+            Stored salt
+        hash : bytes
+            Stored hash
+        version : int
+            Hashing scheme version the hash was stored with
 
         Returns
         -------
-        [type]
-            [description]
-        """
-        key = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'), # encode as bytes like object
-            salt,
-            100000,
-            dklen=16 # derived key length
-        )
-        return key
+        bool
+            True if the password matches.
+        """
+        return hmac.compare_digest(Util.generate_hash(password, salt, version), hash)
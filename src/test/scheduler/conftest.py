@@ -0,0 +1,8 @@
+"""
+Makes the scheduler's modules importable by the tests. Run from the
+repository root with python -m pytest src/test.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'main', 'scheduler'))
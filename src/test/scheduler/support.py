@@ -0,0 +1,70 @@
+"""
+Shared set-up of the scheduler tests.
+"""
+import contextlib
+import io
+import unittest
+
+import Scheduler
+from db.Backend import add_observer, remove_observer
+from db.ConnectionManager import ConnectionManager
+from db.SQLiteBackend import SQLiteBackend
+from model.Caregiver import Caregiver
+from model.Patient import Patient
+from model.Vaccine import Vaccine
+from util.CredentialCache import CredentialCache
+from util.HashService import HashService
+
+
+class StatementCounter:
+    """
+    Database observer recording the statements that run.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def connected(self, seconds):
+        pass
+
+    def executed(self, operation, params, seconds, rowcount):
+        self.statements.append(operation)
+
+    def fetched(self, operation, rows):
+        pass
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """
+    Runs each test against a new temporary SQLite database, with
+    passwords hashed inline and nobody logged in.
+    """
+
+    def setUp(self):
+        ConnectionManager.configure(SQLiteBackend())
+        HashService._shared = HashService(workers=0)
+        Patient.credential_cache = CredentialCache()
+        Caregiver.credential_cache = CredentialCache()
+        Vaccine.inventory.invalidate()
+        Scheduler.set_session(Scheduler.Session())
+
+    def run_command(self, line):
+        """
+        Runs a command line and returns what it printed.
+        """
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            Scheduler.run_command(line)
+        return out.getvalue()
+
+    @contextlib.contextmanager
+    def count_statements(self):
+        """
+        Yields the list of the statements run inside the block.
+        """
+        counter = StatementCounter()
+        add_observer(counter)
+        try:
+            yield counter.statements
+        finally:
+            remove_observer(counter)
@@ -0,0 +1,100 @@
+"""
+Account creation, login and password hash upgrades.
+"""
+import contextlib
+import io
+import unittest
+import unittest.mock
+
+import Scheduler
+from db.ConnectionManager import ConnectionManager
+from db.SQLiteBackend import SQLiteBackend
+from model.Patient import Patient
+from util.CredentialCache import CredentialCache
+from util.HashService import HashService
+from util.Util import Util
+
+
+class AccountTest(unittest.TestCase):
+
+    def setUp(self):
+        # a temporary SQLite database per test, passwords hashed inline
+        ConnectionManager.configure(SQLiteBackend())
+        HashService._shared = HashService(workers=0)
+        Patient.credential_cache = CredentialCache()
+        Scheduler.set_session(Scheduler.Session())
+
+    def run_command(self, line):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            Scheduler.run_command(line)
+        return out.getvalue()
+
+    def login(self, username, password):
+        self.run_command("logout")
+        self.run_command(f"login_patient {username} {password}")
+        return Scheduler.get_session().patient is not None
+
+    def stored_hash(self, username):
+        with ConnectionManager() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                cursor.run('account_credentials', username, table='Patients')
+                return cursor.fetchone()
+
+    def insert_legacy(self, username, password, version):
+        # an account stored before passwords were case-sensitive
+        salt = Util.generate_salt()
+        hash = Util.generate_hash(password.lower(), salt, version)
+        Patient(username, salt=salt, hash=hash, hash_version=version).save_to_db()
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE Patients SET LowercasedPassword = 1 WHERE Username = %s", username)
+            conn.commit()
+
+    def test_passwords_are_case_sensitive(self):
+        self.run_command("create_patient alice secret")
+        stored = self.stored_hash("alice")
+        self.assertFalse(self.login("alice", "SECRET"))
+        self.assertEqual(self.stored_hash("alice"), stored)
+        self.assertTrue(self.login("alice", "secret"))
+
+    def test_wrong_password(self):
+        self.run_command("create_patient alice Secret")
+        self.assertFalse(self.login("alice", "secret"))
+        self.assertFalse(self.login("bob", "Secret"))
+        self.assertTrue(self.login("alice", "Secret"))
+
+    def test_legacy_password_in_any_case(self):
+        self.insert_legacy("alice", "Secret", Util.current_hash_version())
+        stored = self.stored_hash("alice")
+        self.assertTrue(self.login("alice", "SECRET"))
+        # the hash is not replaced with one of the case just typed
+        self.assertEqual(self.stored_hash("alice"), stored)
+        Patient.credential_cache = CredentialCache()
+        self.assertTrue(self.login("alice", "secret"))
+        self.assertFalse(self.login("alice", "other"))
+
+    def test_legacy_hash_upgrade_keeps_lowercase(self):
+        old, new = 1, 2
+        with unittest.mock.patch.dict('os.environ', {'HashVersion': str(new)}):
+            self.insert_legacy("alice", "Secret", old)
+            self.assertTrue(self.login("alice", "SECRET"))
+            row = self.stored_hash("alice")
+            self.assertEqual(row['HashVersion'], new)
+            self.assertEqual(row['LowercasedPassword'], 1)
+            Patient.credential_cache = CredentialCache()
+            self.assertTrue(self.login("alice", "secret"))
+
+    def test_hash_upgrade(self):
+        new = 2
+        self.run_command("create_patient alice Secret")
+        with unittest.mock.patch.dict('os.environ', {'HashVersion': str(new)}):
+            self.assertTrue(self.login("alice", "Secret"))
+            self.assertEqual(self.stored_hash("alice")['HashVersion'], new)
+            Patient.credential_cache = CredentialCache()
+            self.assertTrue(self.login("alice", "Secret"))
+            self.assertFalse(self.login("alice", "secret"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+The JSON lines and error count of a batch run.
+"""
+import io
+import json
+import unittest
+
+from Batch import BatchRunner
+from support import SchedulerTestCase
+
+
+class BatchTest(SchedulerTestCase):
+
+    def run_batch(self, script, batch_size=None):
+        out = io.StringIO()
+        runner = BatchRunner(out=out, batch_size=batch_size)
+        errors = runner.run(script.splitlines())
+        return runner, errors, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_failed_commands_are_reported(self):
+        runner, errors, results = self.run_batch("""
+            create_caregiver carol pw
+            login_caregiver carol wrong
+            login_caregiver carol pw
+            upload_availability 01-03-2022
+            add_doses pfizer 1
+            reserve 01-03-2022 pfizer
+            logout
+        """)
+        self.assertEqual([result['line'] for result in results], [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual([result['error'] for result in results], [
+            None, "Invalid username or password", None, None, None, "Please login as a patient", None,
+        ])
+        self.assertEqual(results[1]['output'], ["Invalid username or password", "Please try again!"])
+        self.assertEqual(errors, 2)
+        self.assertEqual((runner.commands, runner.errors), (7, 2))
+
+    def test_failed_command_in_batch(self):
+        runner, errors, results = self.run_batch("""
+            create_patient pat pw
+            create_caregiver carol pw
+            login_patient pat pw
+            reserve 01-03-2022 pfizer
+            reserve 01-04-2022 pfizer
+        """)
+        self.assertEqual(results[3]['error'], "No caregivers available on 01-03-2022")
+        self.assertEqual(results[4]['error'], "No caregivers available on 01-04-2022")
+        self.assertEqual(errors, 2)
+
+    def test_quit_stops_the_run(self):
+        runner, errors, results = self.run_batch("create_patient pat pw\nquit\ncreate_patient pam pw\n")
+        self.assertEqual([result['operation'] for result in results], ['create_patient', 'quit'])
+        self.assertEqual(errors, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
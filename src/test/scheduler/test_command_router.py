@@ -0,0 +1,104 @@
+"""
+Validation done by CommandRouter.dispatch before a handler runs.
+"""
+import contextlib
+import io
+import unittest
+
+from util.CommandRouter import CommandRouter, CommandStatus
+from util.Dates import Dates
+
+
+class CommandRouterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.role = None
+        self.calls = []
+        self.router = CommandRouter(lambda: self.role)
+        self.router.register('create', self.record, 2)
+        self.router.register('login', self.record, 2, role='guest')
+        self.router.register('book', self.record, 2, role='patient', parsers=[Dates.parse])
+        self.router.register('upload', self.record, 1, 3, role='caregiver')
+        self.router.register('list', self.record, 0, 4, role='any', options={'after': int, 'limit': int})
+        self.router.register('broken', self.fail)
+        self.router.register('quit', lambda tokens: False)
+
+    def record(self, tokens):
+        self.calls.append(tokens)
+
+    def fail(self, tokens):
+        raise TypeError("handler bug")
+
+    def dispatch(self, line):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = self.router.dispatch(line)
+        return status.error, out.getvalue().splitlines()
+
+    def test_operation_is_case_insensitive(self):
+        self.assertEqual(self.dispatch("CREATE alice Secret"), (None, []))
+        self.assertEqual(self.calls, [['create', 'alice', 'Secret']])
+
+    def test_unknown_operation(self):
+        self.assertEqual(self.dispatch("frobnicate"), ("Invalid Argument", ["Invalid Argument"]))
+        self.assertEqual(self.dispatch("   "), (None, []))
+
+    def test_argument_count(self):
+        self.assertEqual(self.dispatch("create alice"),
+                         ("Expected 3 inputs, received 2 inputs",
+                          ["Expected 3 inputs, received 2 inputs", "Please try again!"]))
+        self.role = 'caregiver'
+        self.assertEqual(self.dispatch("upload")[1],
+                         ["Expected 2 to 4 inputs, received 1 inputs", "Please try again!"])
+        self.assertEqual(self.dispatch("upload a b c d")[1],
+                         ["Expected 2 to 4 inputs, received 5 inputs", "Please try again!"])
+        self.assertEqual(self.calls, [])
+
+    def test_roles(self):
+        self.assertEqual(self.dispatch("book 01-05-2022 pfizer"),
+                         ("Please login as a patient", ["Please login as a patient"]))
+        self.assertEqual(self.dispatch("list")[1], ["Please login first!"])
+        self.role = 'caregiver'
+        self.assertEqual(self.dispatch("login alice pw")[1], ["Already logged-in!"])
+        self.assertEqual(self.dispatch("book 01-05-2022 pfizer")[1], ["Please login as a patient"])
+        self.assertEqual(self.calls, [])
+        # the role is checked before the arguments
+        self.role = None
+        self.assertEqual(self.dispatch("upload")[1], ["Please login as caregiver first!"])
+
+    def test_parsed_arguments(self):
+        self.role = 'patient'
+        self.dispatch("book 01-05-2022 pfizer")
+        self.assertEqual(self.calls, [['book', Dates.parse("01-05-2022"), 'pfizer']])
+        error, output = self.dispatch("book 13-05-2022 pfizer")
+        self.assertEqual(output, [error, "Please try again!"])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_options(self):
+        self.role = 'patient'
+        self.dispatch("list --limit 5 --after 3")
+        self.dispatch("list")
+        self.assertEqual(self.calls, [['list', {'limit': 5, 'after': 3}], ['list', {}]])
+        self.assertEqual(self.dispatch("list --limit")[1],
+                         ["Options must be given as --name value", "Please try again!"])
+        self.assertEqual(self.dispatch("list --size 5")[1], ["Unknown option --size", "Please try again!"])
+        self.assertEqual(self.dispatch("list --limit 1 --limit 2")[1],
+                         ["Option --limit given twice", "Please try again!"])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_handler_exception_keeps_session(self):
+        self.assertEqual(self.dispatch("broken"),
+                         ("Error occurred when running broken", ["Error occurred when running broken"]))
+
+    def test_handler_status(self):
+        self.router.register('refuse', lambda tokens: CommandStatus.failed("Refused", "Please try again!"))
+        self.assertEqual(self.dispatch("refuse"), ("Refused", ["Refused", "Please try again!"]))
+
+    def test_quit(self):
+        self.assertEqual(self.dispatch("quit"), (None, []))
+        self.assertFalse(self.router.dispatch("quit").keep_going)
+        self.assertTrue(self.router.dispatch("create alice Secret").keep_going)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Checkout, reuse and clean-up of pooled connections.
+"""
+import time
+import unittest
+
+from db.ConnectionManager import ConnectionManager, ConnectionPool
+from support import SchedulerTestCase
+
+
+class FakeConnection:
+
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.dirty = False
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        if not self.alive:
+            raise OSError("connection reset")
+        return FakeCursor()
+
+    def rollback(self):
+        if not self.alive:
+            raise OSError("connection reset")
+        self.rollbacks += 1
+        self.dirty = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+
+    def execute(self, operation):
+        pass
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.connect, max_size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = ConnectionPool(self.connect, max_size=2)
+        first = pool.acquire()
+        pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0.01)
+        pool.release(first)
+        self.assertIs(pool.acquire(timeout=0.01), first)
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def test_dirty_connections_are_rolled_back(self):
+        pool = ConnectionPool(self.connect)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertEqual(conn.rollbacks, 0)
+        conn = pool.acquire()
+        conn.dirty = True
+        pool.release(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(pool.acquire(), conn)
+
+    def test_broken_connections_are_discarded(self):
+        pool = ConnectionPool(self.connect)
+        conn = pool.acquire()
+        conn.dirty = True
+        conn.alive = False
+        pool.release(conn)
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['closed'], 1)
+
+    def test_stale_connections_are_pinged(self):
+        pool = ConnectionPool(self.connect, ping_interval=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.alive = False
+        time.sleep(0.01)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn.closed)
+
+    def test_idle_connections_are_evicted(self):
+        pool = ConnectionPool(self.connect, min_size=1, max_size=3, idle_timeout=0)
+        held = [pool.acquire() for _ in range(3)]
+        for conn in held:
+            pool.release(conn)
+        time.sleep(0.01)
+        pool.acquire()
+        self.assertEqual(pool.stats()['closed'], 2)
+        self.assertEqual(sum(conn.closed for conn in held), 2)
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.connect, min_size=2, max_size=1)
+
+
+class ConnectionManagerTest(SchedulerTestCase):
+
+    def vaccines(self):
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM Vaccines")
+                return cursor.fetchone()[0]
+
+    def test_uncommitted_work_is_rolled_back(self):
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO Vaccines VALUES (%s, %d)", ("pfizer", 1))
+        self.assertEqual(self.vaccines(), 0)
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO Vaccines VALUES (%s, %d)", ("pfizer", 1))
+            conn.commit()
+        self.assertEqual(self.vaccines(), 1)
+
+    def test_connection_returns_to_the_pool(self):
+        self.vaccines()
+        self.vaccines()
+        stats = ConnectionManager.pool_stats()
+        self.assertEqual((stats['created'], stats['in_use']), (1, 0))
+        with self.assertRaises(ZeroDivisionError):
+            with ConnectionManager():
+                1 / 0
+        self.assertEqual(ConnectionManager.pool_stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Bulk account import from CSV and JSON lines files.
+"""
+import io
+import json
+import unittest
+
+from Import import AccountImporter
+from model.Patient import Patient
+from support import SchedulerTestCase
+
+
+class ImportTest(SchedulerTestCase):
+
+    def run_import(self, read, text, batch_size=None):
+        out = io.StringIO()
+        importer = AccountImporter(Patient, out=out, batch_size=batch_size)
+        failed = importer.run(read(io.StringIO(text)))
+        return importer, failed, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_csv(self):
+        self.run_command("create_patient taken pw")
+        importer, failed, reports = self.run_import(AccountImporter.read_csv, (
+            "username,password\n"
+            "alice,secret\n"
+            "taken,pw\n"
+            "bob,\n"
+            "alice,other\n"
+            "carol,pw\n"
+        ), batch_size=2)
+        self.assertEqual(reports, [
+            {'line': 3, 'username': 'taken', 'error': "Username taken"},
+            {'line': 4, 'username': 'bob', 'error': "Username and password must be non-empty strings"},
+            {'line': 5, 'username': 'alice', 'error': "Duplicate username in file"},
+        ])
+        self.assertEqual((importer.rows, importer.created, importer.conflicts, importer.errors), (5, 2, 2, 1))
+        self.assertEqual(failed, 3)
+        self.assertIn("logged in as: alice", self.run_command("login_patient alice secret"))
+        self.run_command("logout")
+        self.assertIn("logged in as: carol", self.run_command("login_patient carol pw"))
+
+    def test_csv_header(self):
+        with self.assertRaises(ValueError):
+            self.run_import(AccountImporter.read_csv, "name,password\nalice,secret\n")
+
+    def test_jsonl_reports_in_line_order(self):
+        importer, failed, reports = self.run_import(AccountImporter.read_jsonl, (
+            '{"username": "alice", "password": "secret"}\n'
+            '\n'
+            '{"username": "alice", "password": "x"}\n'
+            '{"username" "bob"}\n'
+            '["bob", "pw"]\n'
+        ))
+        self.assertEqual([report['line'] for report in reports], [3, 4, 5])
+        self.assertEqual(reports[1], {'line': 4, 'username': None,
+                                      'error': "Invalid JSON on line 4, column 13: Expecting ':' delimiter"})
+        self.assertEqual(reports[2]['error'], "Username and password must be non-empty strings")
+        self.assertEqual((importer.rows, importer.created, failed), (4, 1, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
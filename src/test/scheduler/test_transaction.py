@@ -0,0 +1,69 @@
+"""
+ConnectionManager.transaction() and the savepoints of the
+ConnectionManagers opened inside it.
+"""
+import unittest
+
+from db.Backend import DBError
+from db.ConnectionManager import ConnectionManager
+from support import SchedulerTestCase
+
+
+class TransactionTest(SchedulerTestCase):
+
+    def insert(self, name, commit=True):
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO Vaccines VALUES (%s, %d)", (name, 1))
+            if commit:
+                conn.commit()
+
+    def vaccines(self):
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT Name FROM Vaccines ORDER BY Name")
+                return [name for name, in cursor.fetchall()]
+
+    def test_commits_at_the_end(self):
+        with ConnectionManager.transaction():
+            self.insert("moderna")
+            self.insert("pfizer")
+            self.assertEqual(self.vaccines(), ["moderna", "pfizer"])
+        self.assertEqual(self.vaccines(), ["moderna", "pfizer"])
+
+    def test_uncommitted_work_is_undone_alone(self):
+        with ConnectionManager.transaction():
+            self.insert("moderna")
+            self.insert("janssen", commit=False)
+            self.insert("pfizer")
+        self.assertEqual(self.vaccines(), ["moderna", "pfizer"])
+
+    def test_failed_statement_keeps_the_batch(self):
+        with ConnectionManager.transaction():
+            self.insert("pfizer")
+            with self.assertRaises(DBError):
+                self.insert("pfizer")
+            self.insert("moderna")
+        self.assertEqual(self.vaccines(), ["moderna", "pfizer"])
+
+    def test_error_rolls_back_everything(self):
+        with self.assertRaises(ZeroDivisionError):
+            with ConnectionManager.transaction():
+                self.insert("pfizer")
+                1 / 0
+        self.assertEqual(self.vaccines(), [])
+
+    def test_nested_blocks_join_the_outer_one(self):
+        with ConnectionManager.transaction() as outer:
+            with ConnectionManager.transaction() as inner:
+                self.assertIs(inner, outer)
+                self.insert("pfizer")
+            self.insert("moderna")
+            with ConnectionManager() as conn:
+                self.assertIs(conn.conn, outer)
+        self.assertEqual(self.vaccines(), ["moderna", "pfizer"])
+        self.assertEqual(ConnectionManager.pool_stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
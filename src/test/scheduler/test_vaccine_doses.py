@@ -0,0 +1,125 @@
+"""
+Dose bookkeeping of vaccines whose stock is spread over shards, through
+the paths the commands use: add_doses spreads new doses, reserve takes
+one dose with DoseAllocator.take_dose, cancel gives it back and the
+ledger (Vaccine.change_doses) applies batched changes.
+"""
+import unittest
+
+from db.ConnectionManager import ConnectionManager
+from model.DoseAllocator import DoseAllocator
+from model.Vaccine import Vaccine
+from support import SchedulerTestCase
+
+
+class VaccineDosesTest(SchedulerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.allocator = DoseAllocator.shared()
+        self.shards = self.allocator.shards
+        self.allocator.shards = 4
+        self.run_command("create_caregiver carol pw")
+        self.run_command("create_patient pat pw")
+        self.run_command("login_caregiver carol pw")
+        self.run_command("upload_availability 01-03-2022 01-07-2022")
+        self.run_command("add_doses pfizer 10")
+        self.run_command("logout")
+
+    def tearDown(self):
+        self.allocator.shards = self.shards
+
+    def places(self):
+        # doses of the Vaccines row, then of each shard
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.run('vaccine_row_doses', "pfizer")
+                row, = cursor.fetchone()
+                cursor.execute("SELECT Doses FROM VaccineShards WHERE Name = %s ORDER BY Shard", "pfizer")
+                return [row] + [doses for doses, in cursor.fetchall()]
+
+    def stock(self):
+        Vaccine.inventory.invalidate()
+        return Vaccine("pfizer", None).get().available_doses
+
+    def test_add_doses_spreads_stock(self):
+        self.assertEqual(self.places(), [0, 3, 3, 2, 2])
+        self.assertEqual(self.stock(), 10)
+
+    def test_reserve_and_cancel(self):
+        self.run_command("login_patient pat pw")
+        output = self.run_command("reserve 01-03-2022 pfizer")
+        self.assertIn("Appointment ID", output)
+        self.assertEqual(self.stock(), 9)
+        with self.count_statements() as statements:
+            Vaccine.change_doses([("pfizer", 1)])
+        # the ledger update returns the total stock
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(self.stock(), 10)
+
+    def test_cancel_returns_dose(self):
+        self.run_command("login_patient pat pw")
+        self.run_command("reserve 01-03-2022 pfizer")
+        self.assertIn("successfully", self.run_command("cancel 1"))
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(sum(self.places()), 10)
+
+    def test_reserve_until_out_of_doses(self):
+        self.run_command("login_caregiver carol pw")
+        self.run_command("upload_availability 01-03-2022 01-20-2022")
+        self.run_command("logout")
+        self.run_command("login_patient pat pw")
+        for day in range(3, 13):
+            self.assertIn("Appointment ID", self.run_command(f"reserve 01-{day:02d}-2022 pfizer"))
+        self.assertIn("Not enough available doses", self.run_command("reserve 01-14-2022 pfizer"))
+        self.assertEqual(self.places(), [0, 0, 0, 0, 0])
+
+    def test_decrement_from_one_shard(self):
+        with self.count_statements() as statements:
+            doses = Vaccine.change_doses([("pfizer", -3)])
+        self.assertEqual(doses, {"pfizer": 7})
+        # the ledger, one shard, the new total
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(self.places(), [0, 0, 3, 2, 2])
+
+    def test_decrement_from_row(self):
+        with ConnectionManager() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE Vaccines SET Doses = 5 WHERE Name = %s", "pfizer")
+            conn.commit()
+        with self.count_statements() as statements:
+            doses = Vaccine.change_doses([("pfizer", -4)])
+        self.assertEqual(doses, {"pfizer": 11})
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(self.places(), [1, 3, 3, 2, 2])
+
+    def test_decrement_across_shards(self):
+        vaccine = Vaccine("pfizer", None)
+        vaccine.decrease_available_doses(8)
+        self.assertEqual(vaccine.available_doses, 2)
+        self.assertEqual(sum(self.places()), 2)
+        vaccine.decrease_available_doses(2)
+        self.assertEqual(self.places(), [0, 0, 0, 0, 0])
+
+    def test_decrement_more_than_stock(self):
+        with self.assertRaises(ValueError):
+            Vaccine.change_doses([("pfizer", -11)])
+        self.assertEqual(self.places(), [0, 3, 3, 2, 2])
+        with self.assertRaises(ValueError):
+            Vaccine.change_doses([("moderna", -1)])
+
+    def test_batched_changes(self):
+        # several commands' changes in the caller's transaction
+        with ConnectionManager.transaction() as conn:
+            doses = Vaccine.change_doses([("pfizer", -4), ("pfizer", 1)], conn)
+        self.assertEqual(doses, {"pfizer": 7})
+        self.assertEqual(self.stock(), 7)
+        with self.assertRaises(ValueError):
+            with ConnectionManager.transaction() as conn:
+                Vaccine.change_doses([("pfizer", -7)], conn)
+                Vaccine.change_doses([("pfizer", -1)], conn)
+        self.assertEqual(self.stock(), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()